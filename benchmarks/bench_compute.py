@@ -0,0 +1,106 @@
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+from joule.compute.mechanics import MechanicsEngine
+
+from harness import benchmark
+
+
+# example functions of README
+EXPRESSIONS = {
+    "paraboloid": "0.25 * (x*x + y*y)",
+    "hemisphere": "-sqrt(pi**2 - x*x - y*y) + pi",
+    "gaussian": "-2 * exp(-(x**2 + y**2) / pi) + 2",
+    "cosine_well": "-cos(2 * sqrt(x*x + y*y))",
+}
+
+MESH_SIZES = {"64^2": 64, "256^2": 256, "1024^2": 1024}
+
+BALL_COUNTS = {"1": 1, "1k": 1_000, "100k": 100_000}
+
+
+def _engine(expression):
+    calculus_engine = CalculusEngine()
+    calculus_engine.update_function(expression)
+    return calculus_engine
+
+
+def _mesh(res):
+    x, y = np.meshgrid(np.linspace(-np.pi, np.pi, res), np.linspace(-np.pi, np.pi, res))
+    return np.stack((x.ravel(), y.ravel()), axis=1)
+
+
+@benchmark("calculus.update_function", EXPRESSIONS)
+def update_function(expression):
+    # without cache, parsing and differentiation every call
+    return lambda: CalculusEngine().update_function(expression)
+
+
+@benchmark("calculus.build_values", MESH_SIZES)
+def build_values(res):
+    calculus_engine = _engine(EXPRESSIONS["cosine_well"])
+    point_mesh = _mesh(res)
+
+    return lambda: calculus_engine.build_values(point_mesh)
+
+
+@benchmark("calculus.build_normals", MESH_SIZES)
+def build_normals(res):
+    calculus_engine = _engine(EXPRESSIONS["cosine_well"])
+    point_mesh = _mesh(res)
+
+    return lambda: calculus_engine.build_normals(point_mesh)
+
+
+@benchmark("calculus.build_surface", MESH_SIZES)
+def build_surface(res):
+    calculus_engine = _engine(EXPRESSIONS["cosine_well"])
+    point_mesh = _mesh(res)
+
+    values, normals = np.empty(len(point_mesh)), np.empty((len(point_mesh), 3))
+
+    return lambda: calculus_engine.build_surface(point_mesh, values, normals)
+
+
+@benchmark("mechanics.update", BALL_COUNTS)
+def mechanics_update(n):
+    calculus_engine = _engine(EXPRESSIONS["paraboloid"])
+    mechanics_engine = MechanicsEngine(25.0, 0.2, buffer_size=n)
+
+    # balls at rest on the surface
+    points = np.random.default_rng(0).uniform(-2, 2, (n, 2))
+    z = calculus_engine.build_values(points)
+    mechanics_engine.add_balls(np.column_stack((points, z)), np.full(n, 10.0))
+
+    return lambda: mechanics_engine.update(1 / 120, calculus_engine)
+
+
+@benchmark("mechanics.update_sweep", BALL_COUNTS)
+def mechanics_update_sweep(n):
+    calculus_engine = _engine(EXPRESSIONS["paraboloid"])
+    mechanics_engine = MechanicsEngine(25.0, 0.2, buffer_size=n)
+
+    # one ball per friction value, stepped in a single batch
+    points = np.random.default_rng(0).uniform(-2, 2, (n, 2))
+    z = calculus_engine.build_values(points)
+    mechanics_engine.add_balls(
+        np.column_stack((points, z)), 10.0, friction=np.linspace(0.0, 0.5, n)
+    )
+
+    return lambda: mechanics_engine.update(1 / 120, calculus_engine)
+
+
+@benchmark("mechanics.update_rk45_sweep", BALL_COUNTS)
+def mechanics_update_rk45_sweep(n):
+    calculus_engine = _engine(EXPRESSIONS["cosine_well"])
+    mechanics_engine = MechanicsEngine(9.8, 0.2, buffer_size=n, integrator="rk45")
+
+    # balls spread over the ridges and wells take different numbers
+    # of rk45 substeps, each with its own friction
+    points = np.random.default_rng(0).uniform(-3, 3, (n, 2))
+    z = calculus_engine.build_values(points)
+    mechanics_engine.add_balls(
+        np.column_stack((points, z)), 10.0, friction=np.linspace(0.0, 0.5, n)
+    )
+
+    return lambda: mechanics_engine.update(1 / 60, calculus_engine)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from harness import benchmark
+
+# render preparation is benchmarked without an OpenGL context,
+# only the CPU side of elements is timed
+from joule.graphics.elements.ball import generate_sphere_vertices_fast
+from joule.graphics.elements.surface import Surface
+
+
+SURFACE_RES = {"256": 256, "1024": 1024}
+
+SPHERE_RES = {"4": 4, "8": 8, "16": 16, "25": 25}
+
+
+def _surface(res):
+    # element without its VAO, see Surface.__init__
+    surface = Surface.__new__(Surface)
+    surface.res = res
+    surface._point_mesh = surface._build_point_mesh(res)
+    surface._data = np.ones((res * res, 9), dtype=np.float32)
+
+    return surface
+
+
+@benchmark("surface.build_indices", SURFACE_RES)
+def build_indices(res):
+    surface = _surface(res)
+
+    return lambda: surface._build_indices(res)
+
+
+@benchmark("surface.fill_data", SURFACE_RES)
+def fill_data(res):
+    surface = _surface(res)
+
+    point_mesh = surface.get_point_mesh([-np.pi, np.pi], [-np.pi, np.pi])
+    values = np.sin(point_mesh.sum(axis=1))
+    normals = np.tile([0.0, 0.0, 1.0], (len(point_mesh), 1))
+
+    return lambda: surface._fill_data(point_mesh, values, normals)
+
+
+@benchmark("ball.generate_sphere_vertices", SPHERE_RES)
+def generate_sphere_vertices(res):
+    return lambda: generate_sphere_vertices_fast(1, res)
@@ -0,0 +1,131 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+
+# registered benchmarks: name -> function building the timed callable
+BENCHMARKS = {}
+
+
+def benchmark(name, params=None):
+    """
+    Decorator registering a benchmark
+
+    The decorated function does all of the setup, and returns
+    the callable to time, so that setup is never measured
+
+    :param name: Name of benchmark
+    :param params: Dictionary of label -> argument, one benchmark each
+    """
+
+    def decorator(func):
+        if params is None:
+            BENCHMARKS[name] = func
+        else:
+            for label, value in params.items():
+                BENCHMARKS[f"{name}[{label}]"] = lambda value=value: func(value)
+
+        return func
+
+    return decorator
+
+
+def time_callable(func, min_time=0.2, max_rounds=1000):
+    """
+    Times a callable over enough rounds to be stable
+
+    :param func: Callable without arguments
+    :param min_time: Minimum total time of rounds (s)
+    :param max_rounds: Maximum number of rounds
+    :return: Dictionary of timing statistics (s)
+    """
+
+    # warm up: caches, lazy allocations and compilation
+    func()
+
+    times = []
+    while sum(times) < min_time and len(times) < max_rounds:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    times = np.array(times)
+
+    return {
+        "min": float(times.min()),
+        "median": float(np.median(times)),
+        "mean": float(times.mean()),
+        "rounds": len(times),
+    }
+
+
+def machine_info():
+    """
+    Describes the machine and version benchmarks ran on,
+    so that results are only compared between equals
+
+    :return: Dictionary of machine information
+    """
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(directory, results):
+    """
+    Saves results in a new timestamped JSON file
+
+    :param directory: Results directory
+    :param results: Dictionary of results
+    :return: Path of results file
+    """
+
+    os.makedirs(directory, exist_ok=True)
+
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{stamp}.json")
+
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+    return path
+
+
+def latest_results(directory):
+    """
+    Loads most recent results file
+
+    :param directory: Results directory
+    :return: (path, results), (None, None) if there are none
+    """
+
+    if not os.path.isdir(directory):
+        return None, None
+
+    files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    if not files:
+        return None, None
+
+    path = os.path.join(directory, files[-1])
+    with open(path) as file:
+        return path, json.load(file)
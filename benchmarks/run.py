@@ -0,0 +1,121 @@
+import argparse
+import importlib
+import os
+import sys
+
+from harness import BENCHMARKS, latest_results, machine_info, save_results, time_callable
+
+
+# benchmark modules, registering into harness.BENCHMARKS on import
+MODULES = ["bench_compute", "bench_graphics"]
+
+# optional dependencies whose absence skips a module, any
+# other missing module (ie: joule itself) is an error
+OPTIONAL = {"OpenGL"}
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def load_modules():
+    """
+    Imports benchmark modules, skipping those whose optional
+    dependencies are not installed (ie: OpenGL on servers)
+    """
+
+    for module in MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            if (e.name or "").split(".")[0] not in OPTIONAL:
+                raise
+
+            print(f"skipped {module}: {e}")
+
+
+def compare(name, stats, previous, threshold):
+    """
+    Formats comparison with previous results
+
+    :param name: Name of benchmark
+    :param stats: Timing statistics of benchmark
+    :param previous: Previous results, None if none
+    :param threshold: Slowdown ratio flagged as regression
+    :return: Comparison text
+    """
+
+    if previous is None or name not in previous["benchmarks"]:
+        return ""
+
+    ratio = stats["min"] / previous["benchmarks"][name]["min"]
+    flag = "  REGRESSION" if ratio > threshold else ""
+
+    return f"{ratio:6.2f}x{flag}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Joule benchmarks of compute and render preparation hot paths"
+    )
+    parser.add_argument("-k", default="", help="only run benchmarks containing text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="per benchmark (s)")
+    parser.add_argument(
+        "--compare", help="results file to compare with, latest results by default"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.25, help="slowdown flagged as regression"
+    )
+    parser.add_argument("--no-save", action="store_true", help="do not store results")
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    load_modules()
+
+    # results to compare with
+    if args.compare:
+        import json
+
+        with open(args.compare) as file:
+            previous_path, previous = args.compare, json.load(file)
+    else:
+        previous_path, previous = latest_results(args.results_dir)
+
+    if previous is not None:
+        print(f"comparing with {previous_path} ({previous['machine']['commit']})")
+
+    results = {"machine": machine_info(), "benchmarks": {}}
+    regressions = 0
+
+    print(f"{'benchmark':44s} {'min':>10s} {'median':>10s} {'rounds':>7s}")
+    for name, build in BENCHMARKS.items():
+        if args.k not in name:
+            continue
+
+        stats = time_callable(build(), min_time=args.min_time)
+        results["benchmarks"][name] = stats
+
+        comparison = compare(name, stats, previous, args.threshold)
+        regressions += "REGRESSION" in comparison
+
+        print(
+            f"{name:44s} {stats['min'] * 1e3:8.3f}ms {stats['median'] * 1e3:8.3f}ms"
+            f" {stats['rounds']:7d} {comparison}"
+        )
+
+    # nothing to compare or save, ie: a typo in -k
+    if not results["benchmarks"]:
+        print("no benchmark ran")
+        sys.exit(1)
+
+    if not args.no_save:
+        print(f"saved {save_results(args.results_dir, results)}")
+
+    # non zero exit status on regressions, ie: for CI
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import time
+
+import numpy as np
+
+from joule.compute.mechanics import MechanicsEngine
+
+
+# seeding time of large ball grids should scale linearly
+# with the number of balls, both one by one and in bulk
+
+print(f"{'balls':>8s} {'add_ball':>10s} {'add_balls':>10s}")
+for n in [1_000, 10_000, 100_000]:
+    positions = np.random.default_rng(0).uniform(-1, 1, (n, 3))
+    masses = np.full(n, 10.0)
+
+    engine = MechanicsEngine(25.0, 0.2)
+    start = time.perf_counter()
+    for position, mass in zip(positions, masses):
+        engine.add_ball(position, mass)
+    one_by_one = time.perf_counter() - start
+
+    engine = MechanicsEngine(25.0, 0.2)
+    start = time.perf_counter()
+    engine.add_balls(positions, masses)
+    bulk = time.perf_counter() - start
+
+    print(f"{n:8d} {one_by_one:9.4f}s {bulk:9.4f}s")
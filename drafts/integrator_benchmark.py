@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+from joule.compute.integrators import INTEGRATORS
+from joule.compute.mechanics import MechanicsEngine
+
+
+# frictionless balls on a paraboloid, compared against a
+# converged reference solution (rk4 with a tiny time step)
+EXPRESSION = "0.25 * (x*x + y*y)"
+GRAVITY, MASS = 25.0, 10.0
+DURATION = 4.0
+
+calculus_engine = CalculusEngine()
+calculus_engine.update_function(EXPRESSION)
+
+points = np.random.default_rng(0).uniform(-2, 2, (200, 2))
+
+
+def energy(s, v):
+    # specific energy of the model: tangential gravity
+    # acceleration in MechanicsEngine is gravity / mass
+    return 0.5 * np.sum(v**2, axis=1) + GRAVITY / MASS * s[:, 2]
+
+
+def run(integrator, dt):
+    engine = MechanicsEngine(GRAVITY, 0.0, integrator=integrator)
+
+    z = calculus_engine.build_values(points)
+    for (x, y), z_i in zip(points, z):
+        engine.add_ball((x, y, z_i), MASS)
+
+    start = time.perf_counter()
+    for _ in range(int(round(DURATION / dt))):
+        engine.update(dt, calculus_engine)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, engine.get_render_positions(), engine.get_render_velocities()
+
+
+_, s_ref, v_ref = run("rk4", 1e-3)
+e_ref = energy(s_ref, v_ref)
+
+print(f"{'integrator':20s} {'dt':>8s} {'time':>8s} {'pos err':>10s} {'energy err':>10s}")
+for integrator in INTEGRATORS:
+    for dt in [1 / 600, 1 / 60]:
+        elapsed, s, v = run(integrator, dt)
+
+        pos_err = np.median(np.linalg.norm(s - s_ref, axis=1))
+        energy_err = np.median(np.abs(energy(s, v) - e_ref) / np.abs(e_ref))
+
+        print(
+            f"{integrator:20s} {dt:8.5f} {elapsed:7.3f}s {pos_err:10.2e} {energy_err:10.2e}"
+        )
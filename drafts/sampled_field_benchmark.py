@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+from joule.compute.field import SampledField
+
+
+# per step cost and accuracy of derivative evaluation at ball
+# positions: symbolic lambdas against interpolated tables
+EXPRESSIONS = [
+    "0.25 * (x*x + y*y)",
+    "-cos(2 * sqrt(x*x + y*y))",
+    "sin(x) * cos(y) * exp(-(x**2 + y**2) / 8) + atanh(tanh(x * y / 16))",
+    " + ".join(f"exp(-((x - {i})**2 + (y + {i})**2) / {i + 5})" for i in range(-3, 4)),
+]
+DOMAIN = [-np.pi, np.pi]
+N_BALLS = 100_000
+
+points = np.random.default_rng(0).uniform(*DOMAIN, (N_BALLS, 2)) * 0.95
+
+
+def timed(f, repeat=10):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = f()
+    return (time.perf_counter() - start) / repeat, np.copy(result)
+
+
+for expression in EXPRESSIONS:
+    calculus_engine = CalculusEngine()
+    calculus_engine.update_function(expression)
+
+    print(expression)
+    exact_time, exact = timed(lambda: calculus_engine.build_jet(points))
+    print(f"  {'symbolic':12s} {exact_time * 1e3:8.2f}ms")
+
+    # tables from the 1024 x 1024 surface mesh, every step-th sample
+    res = 1024
+    mesh = np.mgrid[0 : 1 : res * 1j, 0 : 1 : res * 1j].T.reshape((-1, 2))
+    mesh = mesh * np.ptp(DOMAIN) + np.min(DOMAIN)
+
+    for step in [3, 1]:
+        field = SampledField(calculus_engine)
+        field.tabulate(mesh, DOMAIN, DOMAIN, res, step=step)
+
+        for mode in SampledField.MODES:
+            field.set_mode(mode)
+            sampled_time, sampled = timed(lambda: field.build_jet(points))
+
+            # relative error of f, fx, fy, fxx, fyy, fxy
+            scale = np.max(np.abs(exact), axis=1) + 1e-12
+            error = np.max(np.abs(sampled - exact), axis=1) / scale
+            errors = " ".join(f"{e:.1e}" for e in error)
+
+            print(
+                f"  {mode:8s} {res // step:4d} {sampled_time * 1e3:7.2f}ms  max rel err: {errors}"
+            )
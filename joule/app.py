@@ -1,3 +1,6 @@
+import argparse
+import logging
+import os
 import time
 
 import glfw
@@ -15,7 +18,20 @@ from joule.graphics.elements.ball import Ball
 from joule.graphics.elements.surface import Surface
 
 from joule.compute.mechanics import MechanicsEngine
+from joule.compute.cache import ExpressionCache
 from joule.compute.calculus import CalculusEngine
+from joule.compute.jit import NUMBA_AVAILABLE
+from joule.compute.field import SampledField
+from joule.compute.recorder import TrajectoryReader
+from joule.compute.replay import ReplayPlayer
+from joule.compute.scheduler import PhysicsScheduler
+from joule.compute.snapshot import load_snapshot, release_mapping, save_simulation
+from joule.compute.tessellation import AdaptiveMesher
+from joule.compute.worker import BackgroundWorker
+from joule.profiler import PROFILER
+
+
+logger = logging.getLogger(__name__)
 
 
 class App(CameraOrbitControls, ShaderRenderer):
@@ -24,6 +40,8 @@ class App(CameraOrbitControls, ShaderRenderer):
         window_size,
         name,
         *orbit_control_args,
+        replay_path=None,
+        cache_path=None,
     ):
         """
         Joule App: Main class for application
@@ -32,6 +50,9 @@ class App(CameraOrbitControls, ShaderRenderer):
 
         :param window_size: Initial window size (width, height)
         :param name: Initial window name
+        :param replay_path: Recording to play back on start, None to simulate
+        :param cache_path: File persisting differentiated expressions between
+            runs, saved on exit, None to only cache them in memory
         """
 
         # init camera orbit controls and shader renderer
@@ -46,6 +67,13 @@ class App(CameraOrbitControls, ShaderRenderer):
             self.on_evaluate,
             self.on_change_ball_color,
             self.on_change_surface_color,
+            self.on_export_trace,
+            self.on_open_replay,
+            self.on_close_replay,
+            self.on_seek_replay,
+            self.on_save_snapshot,
+            self.on_load_snapshot,
+            self.on_change_physics,
         )
 
         # initialize rendering objects
@@ -63,16 +91,56 @@ class App(CameraOrbitControls, ShaderRenderer):
         )
 
         # initialize computation engines
-        self.calculus_engine = CalculusEngine()
+        # calculus engine and sampled field are swapped
+        # in once a function is compiled, see on_evaluate
+        self.calculus_engine = None
+        self.sampled_field = None
+        self._expression = None
+        self._surface_samples = None
+        self.expression_cache = ExpressionCache(path=cache_path)
+        self.function_worker = BackgroundWorker(on_error=self._compile_failed)
+
+        # sampled field of a function compiled in symbolic mode,
+        # tabulated once field mode is turned on, see get_field_engine
+        self.field_worker = BackgroundWorker()
+        self._field_request = None
+        self.adaptive_mesher = AdaptiveMesher()
         self.mechanics_engine = MechanicsEngine(
             initial_gravity=self.ui.gravity_slider,
             initial_friction=self.ui.friction_slider,
+            integrator=self.ui.integrator,
+            collisions=self.ui.collisions,
+        )
+        self.physics_scheduler = PhysicsScheduler(
+            self.mechanics_engine,
+            step_size=1 / self.ui.physics_rate_slider,
+            max_substeps=self.ui.max_substeps_slider,
         )
 
-        # evaluate initial function to display
+        # playback of a recording, instead of simulation
+        self.replay_player = None
+        self._replay_frame = None
+
+        # snapshot restored once its function is swapped in
+        self._pending_snapshot = None
+
+        # evaluate initial function to display, waiting for
+        # it so that there is always a function to simulate
         self.on_evaluate(
             self.ui.expression_textbox, self.ui.x_domain_slider, self.ui.y_domain_slider
         )
+        compiled = self.function_worker.wait()
+        self._apply_function(compiled)
+
+        # nothing to simulate nor draw without a function
+        if self.calculus_engine is None:
+            glfw.terminate()
+            raise RuntimeError(
+                f"Could not evaluate initial function: {compiled['parser_message']}"
+            )
+
+        if replay_path is not None:
+            self.on_open_replay(replay_path)
 
         # fall into rendering loop
         self.rendering_loop()
@@ -163,28 +231,62 @@ class App(CameraOrbitControls, ShaderRenderer):
 
         # main rendering loop until user quits
         while not self.window_should_close():
+            PROFILER.enabled = self.ui.profiler
+            PROFILER.begin_frame()
+
+            # swap in newly compiled function, if any
+            with PROFILER.scope("apply function"):
+                self._apply_function(self.function_worker.poll())
+
+            # move playback cursor, if replaying
+            if self.replay_player is not None:
+                with PROFILER.scope("replay"):
+                    self._replay_frame = self._advance_replay(dt)
 
             # update engines and ui
             n_bodies = self.mechanics_engine.get_render_n()
+            if self._replay_frame is not None:
+                n_bodies = len(self._replay_frame["ids"])
             buffer_size = self.mechanics_engine.get_render_max()
 
-            self.ui.update_status(dt, n_bodies, buffer_size)
-            self.mechanics_engine.set_gravity(self.ui.gravity_slider)
-            self.mechanics_engine.set_friction(self.ui.friction_slider)
+            substeps = self.physics_scheduler.get_substeps()
 
-            self.mechanics_engine.update(
-                dt, self.calculus_engine, z_correction=self.ui.z_correction
+            self.ui.update_status(
+                dt, n_bodies, buffer_size, substeps, self.function_worker.busy
             )
+            if PROFILER.enabled:
+                self.ui.update_profile(
+                    PROFILER.get_breakdown(), PROFILER.get_frame_times()
+                )
+            self.mechanics_engine.set_collisions(self.ui.collisions)
+            self.mechanics_engine.get_collision_solver().set_restitution(
+                self.ui.restitution_slider
+            )
+
+            # step physics at a fixed rate, independently of frame rate
+            self.physics_scheduler.set_step_size(1 / self.ui.physics_rate_slider)
+            self.physics_scheduler.set_max_substeps(self.ui.max_substeps_slider)
+            # simulation is paused while replaying
+            if self.replay_player is None:
+                with PROFILER.scope("physics"):
+                    self.physics_scheduler.advance(
+                        dt, self.get_field_engine(), z_correction=self.ui.z_correction
+                    )
 
             # call rendering
             self.on_render_frame()
-            self.ui.on_render_ui()
 
-            self.ui.impl.process_inputs()
-            self.ui.impl.render(imgui.get_draw_data())
+            with PROFILER.scope("ui"):
+                self.ui.on_render_ui()
+
+                self.ui.impl.process_inputs()
+                self.ui.impl.render(imgui.get_draw_data())
 
-            glfw.swap_buffers(self.window)
-            glfw.poll_events()
+            with PROFILER.scope("swap buffers"):
+                glfw.swap_buffers(self.window)
+                glfw.poll_events()
+
+            PROFILER.end_frame()
 
             # compute dt for integration
             current = time.time()
@@ -193,6 +295,9 @@ class App(CameraOrbitControls, ShaderRenderer):
 
         glfw.terminate()
 
+        # new expressions are persisted once, on exit
+        self.expression_cache.save()
+
     def on_render_frame(self):
         """
         Render frame event callback
@@ -218,11 +323,22 @@ class App(CameraOrbitControls, ShaderRenderer):
         )
 
         # draw elements
-        self.surface.draw()
-
-        positions = self.mechanics_engine.get_render_positions()
-        masses = self.mechanics_engine.get_render_masses()
-        self.balls.draw(positions, masses, self.calculus_engine)
+        with PROFILER.scope("surface draw"):
+            self.surface.draw()
+
+        if self._replay_frame is not None:
+            positions = self._replay_frame["positions"]
+            masses = self._replay_frame["masses"]
+        else:
+            positions = self.physics_scheduler.get_render_positions()
+            masses = self.mechanics_engine.get_render_masses()
+        with PROFILER.scope("ball draw"):
+            self.balls.draw(
+                positions,
+                masses,
+                self.calculus_engine,
+                pixels_per_unit=self.get_pixels_per_unit(),
+            )
 
         if self.ui.show_axes:
             self.axes.draw()
@@ -234,6 +350,10 @@ class App(CameraOrbitControls, ShaderRenderer):
         :param window: glfw window
         """
 
+        # recorded balls cannot be added to
+        if self.replay_player is not None:
+            return
+
         # get 3D click coordinates
         rh = self.get_right_handed()
         x, y, _ = self.get_click_point(window, rh)
@@ -253,39 +373,184 @@ class App(CameraOrbitControls, ShaderRenderer):
 
         # add ball at coordinates
         self.mechanics_engine.add_ball((x, y, z), self.ui.mass_slider)
+        self.physics_scheduler.invalidate()
 
     def on_evaluate(self, expression, x_domain, y_domain):
-        # update calculus engine with new function
-        parser_message = self.calculus_engine.update_function(expression)
-        self.mechanics_engine.clear()
+        """
+        Evaluate function event callback
 
-        # update axes
-        ranges = self.axes.compute_ranges(x_domain, y_domain)
-        self.axes.update_domain(*ranges)
+        Differentiation and sampling of the new function run on
+        a background thread, superseding any previous evaluation,
+        while the current function keeps simulating
 
-        # update surface
-        point_mesh = self.surface.get_point_mesh(x_domain, y_domain)
-        self.surface.update_function(
-            point_mesh,
-            self.calculus_engine.build_values(point_mesh),
-            self.calculus_engine.build_normals(point_mesh),
+        :param expression: Textual expression of function
+        :param x_domain: x domain of surface (min, max)
+        :param y_domain: y domain of surface (min, max)
+        """
+
+        # same expression: only the domain changed, reuse the
+        # current function instead of parsing and differentiating
+        # (on a copy, the current engine keeps simulating)
+        domain_only = (
+            self.calculus_engine is not None and expression == self._expression
         )
 
-        # acquire all functions for ui
-        f = self.calculus_engine.get_function(symbolic=True)
-        x, y = self.calculus_engine.x, self.calculus_engine.y
-        fx = self.calculus_engine.get_partial(x, 1, symbolic=True)
-        fxx = self.calculus_engine.get_partial(x, 2, symbolic=True)
-        fy = self.calculus_engine.get_partial(y, 1, symbolic=True)
-        fyy = self.calculus_engine.get_partial(y, 2, symbolic=True)
-        fxy = self.calculus_engine.get_mixed_partial(symbolic=True)
+        self.function_worker.submit(
+            self._compile_function,
+            expression,
+            list(x_domain),
+            list(y_domain),
+            self.ui.field_mode,
+            self.ui.adaptive_mesh,
+            self.calculus_engine.copy() if domain_only else None,
+            self._surface_samples if domain_only else None,
+        )
 
-        p = self.calculus_engine.pretty_print
+    def _compile_function(
+        self,
+        is_stale,
+        expression,
+        x_domain,
+        y_domain,
+        field_mode,
+        adaptive_mesh,
+        calculus_engine=None,
+        previous_samples=None,
+    ):
+        """
+        Background task: differentiates and samples a new function
+        on fresh engines, without touching the current ones
+
+        No OpenGL calls can be made from here, the surface is
+        uploaded by _apply_function on the main thread
+
+        :param is_stale: Returns True once a newer evaluation was submitted
+        :param expression: Textual expression of function
+        :param x_domain: x domain of surface (min, max)
+        :param y_domain: y domain of surface (min, max)
+        :param field_mode: Field evaluation mode of ui
+        :param adaptive_mesh: Tessellate surface adaptively instead of uniformly
+        :param calculus_engine: Engine of the same function, only resample if given
+        :param previous_samples: Uniform surface (domain, values, normals) of the same function
+        :return: Dictionary of compiled function, None if stale
+        """
 
-        # update ui
-        self.ui.update_differentiation(
-            parser_message,
-            {
+        domain_only = calculus_engine is not None
+
+        if domain_only:
+            parser_message = "Parsed sucessfully"
+        else:
+            # compiled kernels when numba is installed, the compilation
+            # cost is hidden by the background worker
+            calculus_engine = CalculusEngine(
+                cache=self.expression_cache,
+                backend="numba" if NUMBA_AVAILABLE else "numpy",
+            )
+
+            # update calculus engine with new function
+            parser_message = calculus_engine.update_function(expression, is_stale)
+
+            if is_stale():
+                return None
+
+            # keep current function on failure
+            if parser_message != "Parsed sucessfully":
+                return {"parser_message": parser_message, "calculus_engine": None}
+
+        sampled_field = SampledField(calculus_engine)
+
+        if is_stale():
+            return None
+
+        # uniform surface of the same function: move the domain by
+        # whole samples of the previous one, so that its samples
+        # can be reused (off by less than half a sample)
+        reuse_samples = (
+            previous_samples is not None
+            and not adaptive_mesh
+            and field_mode == "symbolic"
+        )
+        if reuse_samples:
+            previous_domain, *previous = previous_samples
+            x_domain, y_domain = self.surface.snap_range(
+                previous_domain, (x_domain, y_domain)
+            )
+
+        # sample surface
+        point_mesh = self.surface.get_point_mesh(x_domain, y_domain)
+
+        n = len(point_mesh)
+        values, normals = np.empty(n), np.empty((n, 3))
+
+        if adaptive_mesh:
+            # sampled field tables still need the uniform grid, but
+            # not its values and normals: the mesher samples its own
+            # (on a copy, so that the engine does not keep a jet
+            # buffer the size of the grid)
+            if field_mode != "symbolic":
+                jet = calculus_engine.copy().build_jet(point_mesh)
+                self._tabulate_field(sampled_field, jet, x_domain, y_domain)
+
+                if is_stale():
+                    return None
+
+            surface = self.adaptive_mesher.build(calculus_engine, x_domain, y_domain)
+        elif field_mode == "symbolic":
+            # new grid overlapping the previous one: copy shared
+            # samples, and only evaluate the newly exposed ones
+            shift = None
+            if reuse_samples:
+                shift = self.surface.get_grid_shift(
+                    previous_domain, (x_domain, y_domain)
+                )
+
+            if shift is None:
+                calculus_engine.build_surface(point_mesh, values, normals)
+            else:
+                exposed = self.surface.shift_samples(shift, previous, (values, normals))
+                exposed = np.flatnonzero(exposed)
+
+                exposed_values = np.empty(len(exposed))
+                exposed_normals = np.empty((len(exposed), 3))
+                calculus_engine.build_surface(
+                    point_mesh[exposed], exposed_values, exposed_normals
+                )
+
+                values[exposed], normals[exposed] = exposed_values, exposed_normals
+
+            surface = point_mesh, values, normals
+        else:
+            # all derivatives are needed to tabulate the sampled
+            # field, values and normals of surface come along
+            jet = np.empty((6, n))
+            calculus_engine.build_surface(point_mesh, values, normals, jet=jet)
+
+            self._tabulate_field(sampled_field, jet, x_domain, y_domain)
+            surface = point_mesh, values, normals
+
+        if is_stale():
+            return None
+
+        # acquire all functions for ui
+        f = calculus_engine.get_function(symbolic=True)
+        x, y = calculus_engine.x, calculus_engine.y
+        fx = calculus_engine.get_partial(x, 1, symbolic=True)
+        fxx = calculus_engine.get_partial(x, 2, symbolic=True)
+        fy = calculus_engine.get_partial(y, 1, symbolic=True)
+        fyy = calculus_engine.get_partial(y, 2, symbolic=True)
+        fxy = calculus_engine.get_mixed_partial(symbolic=True)
+
+        p = calculus_engine.pretty_print
+
+        return {
+            "expression": expression,
+            "domain_only": domain_only,
+            "parser_message": parser_message,
+            "calculus_engine": calculus_engine,
+            "sampled_field": sampled_field,
+            "domain": (x_domain, y_domain),
+            "surface": surface,
+            "function_texts": {
                 "f(x,y) =": p(f),
                 "df/dx =": p(fx),
                 "df/dy =": p(fy),
@@ -293,8 +558,346 @@ class App(CameraOrbitControls, ShaderRenderer):
                 "d2f/dy2 =": p(fyy),
                 "d2f/dxdy =": p(fxy),
             },
+        }
+
+    def _compile_failed(self, exception):
+        """
+        Result of _compile_function raising, shown as a parser message
+        while the current function is kept
+
+        :param exception: Exception raised by _compile_function
+        :return: Dictionary of failed compilation
+        """
+
+        return {
+            "parser_message": f"Evaluation failed:\n{exception}",
+            "calculus_engine": None,
+        }
+
+    def _apply_function(self, compiled):
+        """
+        Swaps in a function compiled by _compile_function
+
+        :param compiled: Dictionary of compiled function, None if nothing to apply
+        """
+
+        if compiled is None:
+            return
+
+        # parsing or differentiation failed, keep current function
+        if compiled["calculus_engine"] is None:
+            self.ui.update_differentiation(
+                compiled["parser_message"], self.ui.function_texts
+            )
+            return
+
+        # swap engines all at once
+        self.calculus_engine = compiled["calculus_engine"]
+        self.sampled_field = compiled["sampled_field"]
+        self._field_domain = compiled["domain"]
+        self._expression = compiled["expression"]
+
+        # balls stay on the same function when only the domain changed
+        if not compiled["domain_only"]:
+            self.mechanics_engine.clear()
+            self.physics_scheduler.invalidate()
+
+        # balls of a snapshot simulated on this function
+        if self._pending_snapshot is not None:
+            expression, arrays, parameters = self._pending_snapshot
+            self._pending_snapshot = None
+
+            if expression == self._expression:
+                self.mechanics_engine.set_state(arrays, parameters)
+                self.physics_scheduler.invalidate()
+
+        # update axes
+        ranges = self.axes.compute_ranges(*self._field_domain)
+        self.axes.update_domain(*ranges)
+
+        # update surface, uniform (points, values, normals)
+        # or adaptive (points, values, normals, triangles)
+        if len(compiled["surface"]) == 4:
+            self.surface.update_mesh(*compiled["surface"])
+            self._surface_samples = None
+        else:
+            self.surface.update_function(*compiled["surface"])
+
+            # kept to reuse samples when only the domain changes
+            _, values, normals = compiled["surface"]
+            self._surface_samples = self._field_domain, values, normals
+
+        # update ui
+        self.ui.update_differentiation(
+            compiled["parser_message"], compiled["function_texts"]
+        )
+
+    def _tabulate_field(self, sampled_field, jet, x_domain, y_domain):
+        """
+        Tabulate sampled field over surface mesh
+
+        :param sampled_field: SampledField instance to tabulate
+        :param jet: Jet evaluations over surface mesh
+        :param x_domain: x domain of surface mesh (min, max)
+        :param y_domain: y domain of surface mesh (min, max)
+        """
+
+        # about every 4th sample of the surface mesh, so that tables
+        # stay small enough to be cached during interpolation
+        # see drafts/sampled_field_benchmark.py, the step divides
+        # the sample intervals so that the domain's edges are kept
+        # (every 3rd sample for a resolution of 1024)
+        res = self.surface.res
+        step = max(k for k in range(1, 5) if (res - 1) % k == 0)
+
+        sampled_field.set_tables(jet, x_domain, y_domain, res, step=step)
+
+    def get_field_engine(self):
+        """
+        Returns engine evaluating derivatives for physics: either
+        the symbolic calculus engine, or the sampled field once
+        its tables are ready
+
+        :return: CalculusEngine or SampledField instance
+        """
+
+        if self.ui.field_mode == "symbolic":
+            return self.calculus_engine
+
+        # field mode turned on after evaluation: tables are tabulated
+        # in the background, the symbolic engine simulates meanwhile
+        if not self.sampled_field.ready:
+            tabulated = self.field_worker.poll()
+
+            if tabulated is not None and tabulated[0] is self.calculus_engine:
+                self.sampled_field = tabulated[1]
+            else:
+                if self._field_request is not self.calculus_engine:
+                    self._field_request = self.calculus_engine
+                    self.field_worker.submit(
+                        self._tabulate_sampled_field,
+                        self.calculus_engine,
+                        self._field_domain,
+                    )
+
+                return self.calculus_engine
+
+        self.sampled_field.set_mode(self.ui.field_mode)
+        return self.sampled_field
+
+    def _tabulate_sampled_field(self, is_stale, calculus_engine, domain):
+        """
+        Background task: tabulates a new sampled field of a function
+        over the surface mesh, swapped in by get_field_engine
+
+        :param is_stale: Returns True once a newer tabulation was submitted
+        :param calculus_engine: Engine of the function
+        :param domain: Domain of surface mesh (x domain, y domain)
+        :return: (calculus_engine, SampledField instance), None if stale
+        """
+
+        x_domain, y_domain = domain
+        point_mesh = self.surface.get_point_mesh(x_domain, y_domain)
+
+        # on a copy, so that the engine does not keep a jet
+        # buffer the size of the grid, nor share it across threads
+        jet = calculus_engine.copy().build_jet(point_mesh)
+
+        if is_stale():
+            return None
+
+        sampled_field = SampledField(calculus_engine)
+        self._tabulate_field(sampled_field, jet, x_domain, y_domain)
+
+        return calculus_engine, sampled_field
+
+    def on_open_replay(self, path):
+        """
+        Open recording event callback: plays back a recording
+        of python -m joule.sim --record, on its own surface
+
+        :param path: Recording directory
+        """
+
+        try:
+            reader = TrajectoryReader(path)
+            player = ReplayPlayer(reader)
+        except (OSError, KeyError, ValueError) as e:
+            self.ui.update_replay(f"Could not open recording:\n{str(e)}")
+            return
+
+        self.on_close_replay()
+        self.replay_player = player
+        self._replay_frame = None
+
+        # evaluate function the recording was simulated on
+        metadata = reader.get_metadata()
+        if "expression" in metadata:
+            self.ui.expression_textbox = metadata["expression"]
+            self.ui.x_domain_slider = list(metadata["x_domain"])
+            self.ui.y_domain_slider = list(metadata["y_domain"])
+
+            self.on_evaluate(
+                self.ui.expression_textbox,
+                self.ui.x_domain_slider,
+                self.ui.y_domain_slider,
+            )
+
+        self.ui.update_replay(
+            f"{len(reader)} frames",
+            player.get_time(),
+            (player.get_start(), player.get_end()),
+            player.is_playing(),
+        )
+
+    def on_close_replay(self):
+        """
+        Close recording event callback: resumes simulation
+        """
+
+        if self.replay_player is None:
+            return
+
+        self.replay_player.close()
+        self.replay_player = None
+        self._replay_frame = None
+
+        self.physics_scheduler.invalidate()
+        self.ui.update_replay("")
+
+    def on_seek_replay(self, time):
+        """
+        Scrub recording event callback
+
+        :param time: Time of playback cursor (s)
+        """
+
+        if self.replay_player is not None:
+            self.replay_player.seek(time)
+
+    def _advance_replay(self, dt):
+        """
+        Moves playback cursor by frame time, with the playback
+        settings of the ui
+
+        :param dt: Time taken for frame render (s)
+        :return: Dictionary of recorded balls at the cursor
+        """
+
+        player = self.replay_player
+
+        player.set_speed(self.ui.replay_speed)
+        player.set_playing(self.ui.replay_playing)
+        player.advance(dt)
+
+        self.ui.update_replay(
+            self.ui.replay_message,
+            player.get_time(),
+            (player.get_start(), player.get_end()),
+            player.is_playing(),
         )
 
+        return player.get_frame()
+
+    def _snapshot_path(self, slot):
+        """
+        Returns file of a quick save slot
+
+        :param slot: Slot number
+        :return: Snapshot file
+        """
+
+        return os.path.join(
+            os.path.expanduser("~"), ".joule", "snapshots", f"slot{slot}.snap"
+        )
+
+    def on_save_snapshot(self, slot):
+        """
+        Save snapshot event callback: saves simulation,
+        with its function and domain
+
+        :param slot: Slot number
+        """
+
+        x_domain, y_domain = self._field_domain
+        path = self._snapshot_path(slot)
+
+        # a snapshot of this slot waiting for its function
+        # keeps the file mapped
+        if self._pending_snapshot is not None:
+            expression, arrays, parameters = self._pending_snapshot
+            arrays = release_mapping(arrays, path)
+            self._pending_snapshot = expression, arrays, parameters
+
+        try:
+            save_simulation(
+                path,
+                self.mechanics_engine,
+                expression=self._expression,
+                x_domain=[float(v) for v in x_domain],
+                y_domain=[float(v) for v in y_domain],
+            )
+        except OSError as e:
+            self.ui.update_snapshot(f"Could not save slot {slot}:\n{str(e)}")
+            return
+
+        self.ui.update_snapshot(f"Saved slot {slot}")
+
+    def on_load_snapshot(self, slot):
+        """
+        Load snapshot event callback: restores simulation, on
+        its function and domain
+
+        Balls are mapped from the snapshot file without copying
+
+        :param slot: Slot number
+        """
+
+        try:
+            arrays, metadata = load_snapshot(self._snapshot_path(slot))
+        except (OSError, KeyError, ValueError) as e:
+            self.ui.update_snapshot(f"Could not load slot {slot}:\n{str(e)}")
+            return
+
+        parameters = metadata["mechanics"]
+
+        # sliders show the snapshot's defaults, without
+        # overwriting the per ball values of its balls
+        self.ui.update_physics(
+            parameters["gravity"],
+            parameters["friction"],
+            parameters["integrator"],
+            parameters["collisions"],
+            parameters["restitution"],
+        )
+        self.mechanics_engine.set_default_gravity(parameters["gravity"])
+        self.mechanics_engine.set_default_friction(parameters["friction"])
+        self.mechanics_engine.set_default_integrator(parameters["integrator"])
+
+        x_domain, y_domain = metadata["x_domain"], metadata["y_domain"]
+        same_function = metadata["expression"] == self._expression and (
+            np.allclose(self._field_domain, (x_domain, y_domain))
+        )
+
+        if same_function:
+            self.mechanics_engine.set_state(arrays, parameters)
+            self.physics_scheduler.invalidate()
+        else:
+            # function is compiled first, which clears the balls
+            self._pending_snapshot = metadata["expression"], arrays, parameters
+
+            self.ui.expression_textbox = metadata["expression"]
+            self.ui.x_domain_slider = list(x_domain)
+            self.ui.y_domain_slider = list(y_domain)
+
+            self.on_evaluate(
+                self.ui.expression_textbox,
+                self.ui.x_domain_slider,
+                self.ui.y_domain_slider,
+            )
+
+        self.ui.update_snapshot(f"Loaded slot {slot}")
+
     def on_change_ball_color(self, color):
         """
         Change balls color
@@ -313,7 +916,62 @@ class App(CameraOrbitControls, ShaderRenderer):
 
         self.surface.set_color(color)
 
+    def on_change_physics(self, parameter, value):
+        """
+        Change physics parameter of all balls, and of balls added later
+
+        :param parameter: Parameter name: gravity, friction, integrator
+        :param value: New value of parameter
+        """
+
+        if parameter == "gravity":
+            self.mechanics_engine.set_gravity(value)
+        elif parameter == "friction":
+            self.mechanics_engine.set_friction(value)
+        elif parameter == "integrator":
+            self.mechanics_engine.set_integrator(value)
+
+    def on_export_trace(self):
+        """
+        Export profiled frames as a Chrome trace
+        """
+
+        PROFILER.export_chrome_trace("joule_trace.json")
+        logger.info("exported profiler trace to joule_trace.json")
+
+
+def run(argv=None):
+    """
+    Application entrypoint called by python -m joule
+
+    :param argv: Arguments, defaults to sys.argv
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m joule", description="Joule")
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="play back a recording of python -m joule.sim --record",
+    )
+    parser.add_argument(
+        "--expression-cache",
+        metavar="FILE",
+        help="persist differentiated expressions between runs, "
+        "ie: ~/.joule/expressions.pkl",
+    )
+    args = parser.parse_args(argv)
+
+    # messages of joule modules (ie: exported traces, failed tasks)
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
+
+    cache_path = args.expression_cache
+    if cache_path is not None:
+        cache_path = os.path.expanduser(cache_path)
 
-def run():
     # run the app
-    App((1280, 720), "Joule")
+    App(
+        (1280, 720),
+        "Joule",
+        replay_path=args.replay,
+        cache_path=cache_path,
+    )
@@ -0,0 +1,142 @@
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpressionCache:
+    def __init__(self, max_size=32, path=None):
+        """
+        Expression Cache: Least recently used cache of differentiated
+        expressions and their compiled kernels, keyed by the canonical
+        form of the parsed expression (sympy srepr)
+
+        Symbolic derivatives are optionally persisted to disk, so that
+        the expensive simplification survives restarts. Compiled kernels
+        cannot be serialized, and are only cached in memory. New entries
+        are only written by save, ie: once on exit
+
+        :param max_size: Maximum number of cached expressions
+        :param path: File to persist symbolic derivatives, None for memory only
+
+        :return: ExpressionCache instance
+        """
+
+        self._max_size = max_size
+        self._path = path
+
+        # key -> [symbolic functions, compiled kernels or None]
+        # ordered from least to most recently used
+        self._entries = OrderedDict()
+
+        # whether entries were added since the last save
+        self._dirty = False
+
+        # expressions may be compiled on background threads
+        self._lock = threading.RLock()
+
+        if path is not None:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _load(self):
+        """
+        Load persisted symbolic derivatives from disk
+        """
+
+        if not os.path.exists(self._path):
+            return
+
+        # a corrupt or incompatible cache file is only a
+        # missed optimization: start from an empty cache
+        try:
+            with open(self._path, "rb") as file:
+                persisted = pickle.load(file)
+        except Exception as e:
+            logger.warning("could not load %s: %s", self._path, e)
+            return
+
+        for key, functions in list(persisted.items())[-self._max_size :]:
+            self._entries[key] = [functions, None]
+
+    def save(self):
+        """
+        Persist symbolic derivatives to disk, if entries were added
+        """
+
+        if self._path is None:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+
+            persisted = {
+                key: functions for key, (functions, _) in self._entries.items()
+            }
+
+            # write to a temporary file first, then swap, so that an
+            # interrupted write never leaves a truncated cache
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            temporary = f"{self._path}.tmp"
+
+            with open(temporary, "wb") as file:
+                pickle.dump(persisted, file)
+            os.replace(temporary, self._path)
+
+            self._dirty = False
+
+    def get(self, key):
+        """
+        Returns cached entry, marking it as most recently used
+
+        :param key: Canonical form of expression
+        :return: (symbolic functions, compiled kernels or None), None if missing
+        """
+
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+
+            self._entries.move_to_end(key)
+            return tuple(entry)
+
+    def put(self, key, functions, kernels):
+        """
+        Inserts entry, evicting least recently used entries
+        above the maximum size
+
+        :param key: Canonical form of expression
+        :param functions: Dictionary of symbolic functions
+        :param kernels: Dictionary of compiled kernels
+        """
+
+        with self._lock:
+            # only symbolic functions are persisted, which did not
+            # change if the entry was already there
+            self._dirty |= key not in self._entries
+
+            self._entries[key] = [functions, kernels]
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Empties cache, and its persisted file
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+            self.save()
@@ -1,21 +1,52 @@
 import numpy as np
 import sympy as sp
 
+from joule.compute.cache import ExpressionCache
 from joule.compute.linalg import normalize
+from joule.compute.parallel import parallel_chunks
 
 
 class CalculusEngine:
-    def __init__(self):
+    # rows of the jet evaluator, in order
+    JET_ROWS = ["f", "fx", "fy", "fxx", "fyy", "fxy"]
+
+    # backends compiling symbolic functions into lambdas
+    BACKENDS = ["numpy", "numba"]
+
+    def __init__(self, cache: ExpressionCache = None, backend="numpy"):
         """
         Calculus Engine: Handling all math computations
         of application, and differentiation of functions
 
+        :param cache: Instance of joule.cache.ExpressionCache, None to disable caching
+        :param backend: Lambda backend: numpy, numba (falls back to numpy if not installed)
+
         :return: CalculusEngine instance
         """
 
+        # bounds the backend
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        # numba is only imported when used, as its import alone
+        # takes a quarter of a second (ie: in every ensemble worker)
+        if backend == "numba":
+            from joule.compute.jit import NUMBA_AVAILABLE
+
+            if not NUMBA_AVAILABLE:
+                print("calculus: numba not installed, falling back to numpy backend")
+                backend = "numpy"
+
+        self._cache = cache
+        self._backend = backend
+
         # create sympy symbols x and y for functions
         self._x, self._y = sp.symbols("x y")
 
+        # preallocated output buffer of the jet evaluator
+        # rows: f, fx, fy, fxx, fyy, fxy
+        self._jet_buffer = np.empty((6, 0))
+
     def _function_lambda(self, variables, function):
         """
         Turn sympy symbolic representation of function
@@ -45,33 +76,125 @@ class CalculusEngine:
         # return wrapper function
         return constant_safe
 
-    def _partial_derivative_lambda(
-        self,
-        variables,
-        function,
-        to_differentiate,
-    ):
+    def _jet_lambda(self, variables, functions):
+        """
+        Turn sympy symbolic representations of the base function
+        and its derivatives into a single executable lambda that
+        evaluates all of them in one pass
+
+        Common subexpressions (ie: sin(x + y) shared between f
+        and its derivatives) are eliminated, so that they are
+        only computed once per call
+
+        :param variables: Symbols implicated in functions
+        :param functions: List of sympy symbolic functions
+        :return: Lambda writing evaluations into an output buffer
+        """
+
+        # turn into a single lambda compatible with numpy
+        # with common subexpression elimination
+        lambdified = sp.lambdify(variables, functions, "numpy", cse=True)
+
+        def jet(*values, out):
+            """
+            Constant-safe jet evaluator
+
+            :param *values: Variables of functions
+            :param out: Output buffer of shape (len(functions), n)
+            :return: Output buffer
+            """
+
+            # assigning into the preallocated rows broadcasts
+            # constant results over the shape of values
+            for buffer, evaluated in zip(out, lambdified(*values)):
+                buffer[:] = evaluated
+
+            return out
+
+        return jet
+
+    def _partial_derivative(self, function, to_differentiate):
         """
         Compute symbolic partial derivative of function
-        and turn into executable lambda that can be
-        evaluated at different points
 
-        :param variables: Symbols implicated in function
         :param function: Sympy symbolic function
         :param to_differentiate: Array of variables to differentiate
-        :return: Lambda representation of partial derivative
+        :return: Symbolic partial derivative
         """
 
         # differentiate symbolically with respect to variables
         d_ds = sp.diff(function, *to_differentiate)
 
         # symbolically simplify expression
-        d_ds = sp.simplify(d_ds)
+        return sp.simplify(d_ds)
+
+    def _derive(self, function, is_stale=None):
+        """
+        Compute symbolic first and second order partial
+        derivatives of base function
+
+        :param function: Sympy symbolic base function
+        :param is_stale: Returns True to abandon differentiation, checked
+            between derivatives as each one is simplified
+        :return: Dictionary of symbolic functions f, fx, fy, fxx, fyy, fxy,
+            None if abandoned
+        """
+
+        # derivative name -> (derivative it is taken of, variables)
+        derivatives = {
+            "fx": ("f", [self.x]),
+            "fy": ("f", [self.y]),
+            "fxx": ("fx", [self.x]),
+            "fyy": ("fy", [self.y]),
+            "fxy": ("fy", [self.x, self.y]),
+        }
+
+        functions = {"f": function}
+        for name, (of, variables) in derivatives.items():
+            if is_stale is not None and is_stale():
+                return None
+
+            functions[name] = self._partial_derivative(functions[of], variables)
+
+        return functions
+
+    def _compile(self, functions):
+        """
+        Turn symbolic base function and derivatives into
+        executable lambdas
+
+        :param functions: Dictionary of symbolic functions from _derive
+        :return: Dictionary of lambdas, with the fused evaluator under jet
+        """
 
-        # turn into executable lambda
-        d_ds_lambda = self._function_lambda(variables, d_ds)
+        symbols = self.x, self.y
+        rows = [functions[name] for name in self.JET_ROWS]
+
+        if self._backend == "numba":
+            from joule.compute.jit import numba_function_lambda, numba_jet_lambda
+
+            # numba only supports part of the math module, fall
+            # back to numpy for functions it cannot compile
+            try:
+                kernels = {
+                    name: numba_function_lambda(symbols, function)
+                    for name, function in functions.items()
+                }
+                kernels["jet"] = numba_jet_lambda(symbols, rows)
+
+                return kernels
+            except Exception as e:
+                print(f"calculus: numba compilation failed, using numpy: {e}")
+
+        kernels = {
+            name: self._function_lambda(symbols, function)
+            for name, function in functions.items()
+        }
+
+        # fused evaluator of base function and derivatives
+        kernels["jet"] = self._jet_lambda(symbols, rows)
 
-        return d_ds_lambda, d_ds
+        return kernels
 
     @property
     def x(self):
@@ -181,6 +304,18 @@ class CalculusEngine:
         # computes derivative values at points
         fx_val, fy_val = self._fx_l(*point_mesh.T), self._fy_l(*point_mesh.T)
 
+        return self.normals_from_partials(fx_val, fy_val)
+
+    def normals_from_partials(self, fx_val, fy_val):
+        """
+        Computes normal vectors to surface given the values
+        of first order partial derivatives
+
+        :param fx_val: Values of df/dx of shape (n,)
+        :param fy_val: Values of df/dy of shape (n,)
+        :return: Normal vectors of shape (n, 3)
+        """
+
         # build vectors tangent to surface with
         # respect to x and y
         fx_vec, fy_vec = self._tangent_vec(fx_val, 0), self._tangent_vec(fy_val, 1)
@@ -203,6 +338,58 @@ class CalculusEngine:
         # compute z = f(x, y) for all points
         return self._f_l(*point_mesh.T)
 
+    def build_jet(self, point_mesh):
+        """
+        Evaluates base function and all of its first and
+        second order derivatives at given points in one call
+
+        The returned rows are views into a buffer that is
+        reused by the next call
+
+        :param point_mesh: Array of points of shape (n, 2)
+        :return: Rows f, fx, fy, fxx, fyy, fxy each of shape (n,)
+        """
+
+        n = len(point_mesh)
+
+        # grow preallocated buffer if it is too small
+        if self._jet_buffer.shape[1] < n:
+            self._jet_buffer = np.empty((6, max(n, 2 * self._jet_buffer.shape[1])))
+
+        # evaluate everything into the buffer
+        return self._jet_l(*point_mesh.T, out=self._jet_buffer[:, :n])
+
+    def build_surface(self, point_mesh, values, normals, jet=None, chunk_size=65536):
+        """
+        Evaluates base function and normals over a large mesh
+        (ie: the surface), in chunks spread over all cores
+
+        Chunks write straight into disjoint slices of the given
+        output buffers
+
+        :param point_mesh: Array of points of shape (n, 2)
+        :param values: Output buffer of function values of shape (n,)
+        :param normals: Output buffer of normal vectors of shape (n, 3)
+        :param jet: Output buffer of all derivatives of shape (6, n), None to skip
+        :param chunk_size: Points evaluated per chunk
+        """
+
+        def evaluate(start, end):
+            x, y = point_mesh[start:end].T
+
+            if jet is None:
+                values[start:end] = self._f_l(x, y)
+                fx_val, fy_val = self._fx_l(x, y), self._fy_l(x, y)
+            else:
+                # all derivatives, ie: to tabulate a sampled field
+                rows = self._jet_l(x, y, out=jet[:, start:end])
+                values[start:end] = rows[0]
+                fx_val, fy_val = rows[1], rows[2]
+
+            normals[start:end] = self.normals_from_partials(fx_val, fy_val)
+
+        parallel_chunks(evaluate, len(point_mesh), chunk_size)
+
     def _build_hessian(self, point_mesh):
         """
         Computes Hessian matrices at given points
@@ -293,28 +480,42 @@ class CalculusEngine:
             rational=True,
         )
 
-    def update_function(self, equation):
+    def canonical_form(self, equation):
+        """
+        Returns canonical form of a textual expression (sympy srepr),
+        equal for equivalent texts (ie: "x*y" and "y * x")
+
+        :param equation: Textual expression of function
+        :return: Canonical form, None if the expression cannot be parsed
+        """
+
+        try:
+            return sp.srepr(self._parse_function(equation))
+        except Exception:
+            return None
+
+    def update_function(self, equation, is_stale=None):
         """
         Updates internal base function and derivatives
 
         :param equation: Textual expression of function
+        :param is_stale: Returns True to abandon differentiation, ie:
+            once a newer function was submitted to a background worker
         :return: Parser message
         """
 
-        symbols = self.x, self.y
-
         # catch all possible exceptions thrown by parser
         # not best practice, but I didn't have time to
         # look through the documentation to find which
         # specific ones sp.sympify can throw
         try:
-            self._f = self._parse_function(equation)
+            function = self._parse_function(equation)
         except Exception as e:
             return f"Parsing failed:\n{str(e)}"
 
         # check if expression is written with respect to
         # x and y before differentiation
-        expr_symbols = set(self._f.free_symbols)
+        expr_symbols = set(function.free_symbols)
         allowed_symbols = set({self.x, self.y})
 
         if not expr_symbols.issubset(allowed_symbols):
@@ -324,42 +525,74 @@ class CalculusEngine:
 
             return f"{error_string}\n{disallowed}"
 
+        # canonical form of the parsed expression, equivalent
+        # texts (ie: "x*y" and "y * x") share the same key,
+        # prefixed by backend as kernels differ between them
+        key = f"{self._backend}:{sp.srepr(function)}"
+
+        functions, kernels = None, None
+        if self._cache is not None and (entry := self._cache.get(key)) is not None:
+            functions, kernels = entry
+
         # compute symbolic and lambda equivalent
         # of base function and its derivatives
-
         try:
-            self._f_l = self._function_lambda(symbols, self._f)
-
-            self._fx_l, self._fx = self._partial_derivative_lambda(
-                symbols,
-                self._f,
-                [self.x],
-            )
-            self._fxx_l, self._fxx = self._partial_derivative_lambda(
-                symbols,
-                self._fx,
-                [self.x],
-            )
-
-            self._fy_l, self._fy = self._partial_derivative_lambda(
-                symbols,
-                self._f,
-                [self.y],
-            )
-            self._fyy_l, self._fyy = self._partial_derivative_lambda(
-                symbols,
-                self._fy,
-                [self.y],
-            )
-
-            self._fxy_l, self._fxy = self._partial_derivative_lambda(
-                symbols, self._fy, [self.x, self.y]
-            )
+            if functions is None:
+                functions = self._derive(function, is_stale)
+
+                # nothing cached or set for an abandoned function
+                if functions is None:
+                    return "Differentiation abandoned"
+
+            # kernels are not persisted, recompile those of
+            # entries loaded from disk
+            if kernels is None:
+                kernels = self._compile(functions)
+
+                if self._cache is not None:
+                    self._cache.put(key, functions, kernels)
         except Exception as e:
             return f"Derivation failed:\n{str(e)}"
 
+        self._set_functions(functions, kernels)
+
         return "Parsed sucessfully"
 
+    def _set_functions(self, functions, kernels):
+        """
+        Sets internal base function and derivatives
+
+        :param functions: Dictionary of symbolic functions from _derive
+        :param kernels: Dictionary of lambdas from _compile
+        """
+
+        self._functions, self._kernels = functions, kernels
+
+        self._f, self._f_l = functions["f"], kernels["f"]
+        self._fx, self._fx_l = functions["fx"], kernels["fx"]
+        self._fy, self._fy_l = functions["fy"], kernels["fy"]
+        self._fxx, self._fxx_l = functions["fxx"], kernels["fxx"]
+        self._fyy, self._fyy_l = functions["fyy"], kernels["fyy"]
+        self._fxy, self._fxy_l = functions["fxy"], kernels["fxy"]
+
+        self._jet_l = kernels["jet"]
+
+    def copy(self):
+        """
+        Returns an engine sharing base function, derivatives and
+        compiled lambdas, without parsing or differentiating again
+
+        Preallocated buffers are not shared, so that the copy
+        can evaluate on another thread
+
+        :return: CalculusEngine instance
+        """
+
+        engine = CalculusEngine(cache=self._cache, backend=self._backend)
+        engine._set_functions(self._functions, self._kernels)
+
+        return engine
+
     def pretty_print(self, function):
         """
         Returns a string of a symbolic function
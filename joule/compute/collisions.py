@@ -0,0 +1,128 @@
+import numpy as np
+
+from joule.compute.linalg import column_wise
+from joule.compute.spatial import SpatialGrid
+
+
+def ball_radii(masses):
+    """
+    Computes radius of balls from their masses,
+    based on uniform density
+
+    :param masses: Masses of shape (n,) (kg)
+    :return: Radii of shape (n,) (m)
+    """
+
+    # V=4pi r^3/3
+    return np.cbrt(3 * masses / (4 * np.pi)) * 0.08
+
+
+class CollisionSolver:
+    def __init__(self, restitution=0.5, correction=0.8):
+        """
+        Collision Solver: Detects and resolves ball-ball collisions
+
+        Broad phase: spatial hash of ball positions, with cells as
+        large as the largest ball's diameter, so that only balls in
+        the same or adjacent cells can be touching
+
+        Narrow phase: batched impulse resolution of all contacts
+
+        :param restitution: Coefficient of restitution, 0: inelastic, 1: elastic
+        :param correction: Fraction of overlap corrected per step
+
+        :return: CollisionSolver instance
+        """
+
+        self._restitution = restitution
+        self._correction = correction
+
+        self._grid = SpatialGrid()
+
+        # number of contacts of last step
+        self._n_contacts = 0
+
+    def get_restitution(self):
+        """
+        Returns coefficient of restitution
+
+        :return: restitution
+        """
+
+        return self._restitution
+
+    def set_restitution(self, restitution):
+        """
+        Sets coefficient of restitution
+
+        :param restitution: 0: inelastic, 1: elastic
+        """
+
+        self._restitution = restitution
+
+    def get_n_contacts(self):
+        """
+        Returns number of contacts resolved on last step
+
+        :return: Number of contacts
+        """
+
+        return self._n_contacts
+
+    def resolve(self, pos, vel, mass):
+        """
+        Detects and resolves collisions, in place
+
+        :param pos: Positions of shape (n, 3)
+        :param vel: Velocities of shape (n, 3)
+        :param mass: Masses of shape (n,)
+        """
+
+        self._n_contacts = 0
+
+        if len(pos) < 2:
+            return
+
+        radii = ball_radii(mass)
+
+        # broad phase: candidate pairs of neighbouring cells
+        self._grid.build(pos, cell_size=2 * np.max(radii))
+        i, j = self._grid.candidate_pairs()
+
+        # narrow phase: keep overlapping pairs
+        delta = pos[j] - pos[i]
+        distance = np.linalg.norm(delta, axis=1)
+        overlap = radii[i] + radii[j] - distance
+
+        contact = (overlap > 0) & (distance > 0)
+        i, j = i[contact], j[contact]
+        delta, distance, overlap = delta[contact], distance[contact], overlap[contact]
+
+        self._n_contacts = len(i)
+        if not self._n_contacts:
+            return
+
+        # contact normal from ball i to ball j
+        normal = delta / column_wise(distance)
+
+        inv_m_i, inv_m_j = 1 / mass[i], 1 / mass[j]
+        inv_m_sum = inv_m_i + inv_m_j
+
+        # relative velocity along normal
+        v_n = np.vecdot(vel[j] - vel[i], normal)
+
+        # only separate balls moving towards each other
+        approaching = v_n < 0
+        impulse = np.where(
+            approaching, -(1 + self._restitution) * v_n / inv_m_sum, 0
+        )
+        impulse = column_wise(impulse) * normal
+
+        # accumulate impulses of every contact of a ball
+        np.add.at(vel, i, -impulse * column_wise(inv_m_i))
+        np.add.at(vel, j, impulse * column_wise(inv_m_j))
+
+        # push overlapping balls apart in proportion to inverse mass
+        push = column_wise(self._correction * overlap / inv_m_sum) * normal
+        np.add.at(pos, i, -push * column_wise(inv_m_i))
+        np.add.at(pos, j, push * column_wise(inv_m_j))
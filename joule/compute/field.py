@@ -0,0 +1,242 @@
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+
+
+def _cubic_weights(t):
+    """
+    Catmull-Rom cubic convolution weights of the four
+    samples surrounding a fractional position
+
+    :param t: Fractional position within cell of shape (n,)
+    :return: Weights of samples -1, 0, 1, 2 of shape (4, n)
+    """
+
+    # formulas from
+    # https://en.wikipedia.org/wiki/Bicubic_interpolation
+    # (bicubic convolution algorithm, with a = -0.5)
+    t2, t3 = t * t, t * t * t
+
+    return np.array(
+        [
+            -0.5 * t3 + t2 - 0.5 * t,
+            1.5 * t3 - 2.5 * t2 + 1,
+            -1.5 * t3 + 2 * t2 + 0.5 * t,
+            0.5 * t3 - 0.5 * t2,
+        ]
+    )
+
+
+def _linear_weights(t):
+    """
+    Linear interpolation weights of the two samples
+    surrounding a fractional position
+
+    :param t: Fractional position within cell of shape (n,)
+    :return: Weights of samples 0, 1 of shape (2, n)
+    """
+
+    return np.array([1 - t, t])
+
+
+class SampledField:
+    # interpolation modes: (first sample offset, weights)
+    MODES = {
+        "bilinear": (0, _linear_weights),
+        "bicubic": (-1, _cubic_weights),
+    }
+
+    def __init__(self, calculus_engine: CalculusEngine, mode="bicubic"):
+        """
+        Sampled Field: Base function and its derivatives tabulated
+        on a uniform grid, and interpolated at arbitrary points
+
+        Has the same evaluation interface as CalculusEngine, so that
+        it can be used by MechanicsEngine in place of the symbolic
+        lambdas, making the cost of every step independent of
+        the expression's complexity
+
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :param mode: Interpolation mode: bilinear, bicubic
+
+        :return: SampledField instance
+        """
+
+        self._calculus_engine = calculus_engine
+        self.set_mode(mode)
+
+        # tables of f, fx, fy, fxx, fyy, fxy of shape (6, res_y, res_x)
+        self._tables = None
+
+        self._origin = np.zeros(2)
+        self._spacing = np.ones(2)
+
+        # preallocated output buffer, rows: f, fx, fy, fxx, fyy, fxy
+        self._jet_buffer = np.empty((6, 0))
+
+    @property
+    def ready(self):
+        return self._tables is not None
+
+    def get_mode(self):
+        """
+        Returns interpolation mode
+
+        :return: Interpolation mode name
+        """
+
+        return self._mode
+
+    def set_mode(self, mode):
+        """
+        Sets interpolation mode
+
+        :param mode: Interpolation mode: bilinear, bicubic
+        """
+
+        # bounds the mode
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown interpolation mode: {mode}")
+
+        self._mode = mode
+
+    def set_tables(self, jet, x_domain, y_domain, res, step=1):
+        """
+        Sets tables from jet evaluations on a uniform grid
+
+        Grid is in the layout of Surface.get_point_mesh: row major
+        with x varying fastest, including domain endpoints
+
+        :param jet: Rows f, fx, fy, fxx, fyy, fxy of shape (6, res * res)
+        :param x_domain: x domain of grid (min, max)
+        :param y_domain: y domain of grid (min, max)
+        :param res: Number of samples per axis
+        :param step: Keep every step-th sample, smaller tables stay in cache,
+            must divide res - 1 so that the last sample is kept
+        """
+
+        # otherwise the tables stop short of the domain's end, and
+        # points near it read the padding
+        if (res - 1) % step:
+            raise ValueError(f"Step {step} does not divide {res - 1} sample intervals")
+
+        tables = np.reshape(jet, (6, res, res))[:, ::step, ::step]
+        sub_res = tables.shape[-1]
+
+        # pad tables by replicating the boundary, one sample before
+        # and two after, so that the interpolation neighbourhood
+        # never needs to be clamped
+        tables = np.pad(tables, ((0, 0), (1, 2), (1, 2)), mode="edge")
+
+        # flatten grid, so that neighbours are found with
+        # constant offsets in a single gather
+        self._res = sub_res
+        self._stride = sub_res + 3
+        self._tables = tables.reshape((6, -1)).astype(np.float64)
+
+        self._origin = np.array([np.min(x_domain), np.min(y_domain)])
+        extent = np.array([np.ptp(x_domain), np.ptp(y_domain)])
+        self._spacing = extent / (res - 1) * step
+
+    def tabulate(self, point_mesh, x_domain, y_domain, res, step=1):
+        """
+        Evaluates base function and derivatives on a uniform
+        grid and stores them as tables
+
+        :param point_mesh: Grid points of shape (res * res, 2)
+        :param x_domain: x domain of grid (min, max)
+        :param y_domain: y domain of grid (min, max)
+        :param res: Number of samples per axis
+        :param step: Keep every step-th sample, smaller tables stay in cache,
+            must divide res - 1 so that the last sample is kept
+        """
+
+        jet = self._calculus_engine.build_jet(point_mesh)
+        self.set_tables(jet, x_domain, y_domain, res, step=step)
+
+    def _interpolate(self, point_mesh, out):
+        """
+        Interpolates all tables at given points
+
+        :param point_mesh: Array of points of shape (n, 2)
+        :param out: Output buffer of shape (6, n)
+        """
+
+        offset, weights = self.MODES[self._mode]
+
+        # fractional grid coordinates of points
+        u = (point_mesh - self._origin) / self._spacing
+        u = np.nan_to_num(u)
+
+        # clamp to grid so that points outside of the
+        # domain take the value at the boundary
+        u = np.clip(u, 0, self._res - 1)
+
+        cell = np.minimum(np.floor(u).astype(np.int64), self._res - 2)
+        t = u - cell
+
+        w_x, w_y = weights(t[:, 0]), weights(t[:, 1])
+        k = len(w_x)
+
+        # weights of every sample of the k * k neighbourhood
+        w = (w_y[:, np.newaxis] * w_x[np.newaxis]).reshape((k * k, -1))
+
+        # flat indices of the neighbourhood, in the padded tables
+        corner = cell + 1 + offset
+        base = corner[:, 1] * self._stride + corner[:, 0]
+        offsets = (np.arange(k)[:, np.newaxis] * self._stride + np.arange(k)).ravel()
+
+        # gather samples of all tables at once
+        samples = np.take(self._tables, offsets[:, np.newaxis] + base, axis=1)
+
+        # weighted sum over neighbourhood
+        np.einsum("ckn,kn->cn", samples, w, out=out)
+
+    def build_jet(self, point_mesh, chunk_size=8192):
+        """
+        Interpolates base function and all of its first and
+        second order derivatives at given points
+
+        The returned rows are views into a buffer that is
+        reused by the next call
+
+        :param point_mesh: Array of points of shape (n, 2)
+        :param chunk_size: Points interpolated at once, bounds temporaries
+        :return: Rows f, fx, fy, fxx, fyy, fxy each of shape (n,)
+        """
+
+        n = len(point_mesh)
+
+        # grow preallocated buffer if it is too small
+        if self._jet_buffer.shape[1] < n:
+            self._jet_buffer = np.empty((6, max(n, 2 * self._jet_buffer.shape[1])))
+
+        out = self._jet_buffer[:, :n]
+
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            self._interpolate(point_mesh[start:end], out[:, start:end])
+
+        return out
+
+    def build_values(self, point_mesh):
+        """
+        Interpolates base function at given points
+
+        :param point_mesh: Array of points of shape (n, 2)
+        :return: Value of function of shape (n,)
+        """
+
+        return np.copy(self.build_jet(point_mesh)[0])
+
+    def normals_from_partials(self, fx_val, fy_val):
+        """
+        Computes normal vectors to surface given the values
+        of first order partial derivatives
+
+        :param fx_val: Values of df/dx of shape (n,)
+        :param fy_val: Values of df/dy of shape (n,)
+        :return: Normal vectors of shape (n, 3)
+        """
+
+        return self._calculus_engine.normals_from_partials(fx_val, fy_val)
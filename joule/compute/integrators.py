@@ -0,0 +1,257 @@
+import numpy as np
+
+
+# all integrators share the same signature
+#   integrator(s, v, m, p, dt, acceleration) -> (s, v)
+# with
+#   s: positions of shape (n, 3)
+#   v: velocities of shape (n, 3)
+#   m: masses of shape (n,)
+#   p: other per ball parameters of shape (n, k), ie: gravity, friction
+#   dt: time delta to integrate
+#   acceleration: lambda (s, v, m, p) -> accelerations of shape (n, 3)
+# integrators that step a subset of balls (rk45) index m and p
+# with the same subset as s and v
+
+
+def explicit_euler(s, v, m, p, dt, acceleration):
+    """
+    Explicit (forward) Euler integration, first order
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param dt: Time delta to integrate
+    :param acceleration: Lambda computing accelerations
+    :return: Integrated positions and velocities
+    """
+
+    a = acceleration(s, v, m, p)
+
+    return s + v * dt, v + a * dt
+
+
+def semi_implicit_euler(s, v, m, p, dt, acceleration):
+    """
+    Semi-implicit (symplectic) Euler integration, first order:
+    position is integrated with the updated velocity
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param dt: Time delta to integrate
+    :param acceleration: Lambda computing accelerations
+    :return: Integrated positions and velocities
+    """
+
+    a = acceleration(s, v, m, p)
+    v = v + a * dt
+
+    return s + v * dt, v
+
+
+def velocity_verlet(s, v, m, p, dt, acceleration):
+    """
+    Velocity Verlet integration, second order, and symplectic
+    for position dependent forces
+
+    Velocity dependent forces (friction, centripetal) are
+    evaluated at the end of the step with a predicted velocity,
+    which keeps the second order
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param dt: Time delta to integrate
+    :param acceleration: Lambda computing accelerations
+    :return: Integrated positions and velocities
+    """
+
+    a = acceleration(s, v, m, p)
+
+    # half kick, then drift
+    v_half = v + a * (dt / 2)
+    s = s + v_half * dt
+
+    # second half kick with acceleration at new position, and
+    # velocity predicted at the end of the step
+    v_predicted = v_half + a * (dt / 2)
+    a_new = acceleration(s, v_predicted, m, p)
+
+    return s, v_half + a_new * (dt / 2)
+
+
+def rk4(s, v, m, p, dt, acceleration):
+    """
+    Classic fourth order Runge-Kutta integration
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param dt: Time delta to integrate
+    :param acceleration: Lambda computing accelerations
+    :return: Integrated positions and velocities
+    """
+
+    # formulas from
+    # https://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+    # with state y = (s, v) and y' = (v, a)
+    k1_s, k1_v = v, acceleration(s, v, m, p)
+
+    k2_s = v + k1_v * (dt / 2)
+    k2_v = acceleration(s + k1_s * (dt / 2), k2_s, m, p)
+
+    k3_s = v + k2_v * (dt / 2)
+    k3_v = acceleration(s + k2_s * (dt / 2), k3_s, m, p)
+
+    k4_s = v + k3_v * dt
+    k4_v = acceleration(s + k3_s * dt, k4_s, m, p)
+
+    s = s + (k1_s + 2 * k2_s + 2 * k3_s + k4_s) * (dt / 6)
+    v = v + (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6)
+
+    return s, v
+
+
+# Dormand-Prince 5(4) Butcher tableau
+# https://en.wikipedia.org/wiki/Dormand%E2%80%93Prince_method
+_DP_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+# fifth order weights (same as last row, first same as last)
+_DP_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+# difference between fifth and fourth order weights
+_DP_E = _DP_B - np.array(
+    [5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40]
+)
+
+
+def _dormand_prince_step(s, v, m, p, h, acceleration):
+    """
+    Single Dormand-Prince 5(4) step with per ball step sizes
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param h: Step sizes of shape (n, 1)
+    :param acceleration: Lambda computing accelerations
+    :return: Fifth order positions and velocities, error estimate of shape (n,)
+    """
+
+    k_s, k_v = [], []
+
+    for a_row in _DP_A:
+        # stage state from previous stages
+        s_i, v_i = s, v
+        for a_ij, ks_j, kv_j in zip(a_row, k_s, k_v):
+            if a_ij:
+                s_i = s_i + ks_j * (a_ij * h)
+                v_i = v_i + kv_j * (a_ij * h)
+
+        k_s.append(v_i)
+        k_v.append(acceleration(s_i, v_i, m, p))
+
+    # fifth order solution
+    s_5 = s + h * sum(b * k for b, k in zip(_DP_B, k_s) if b)
+    v_5 = v + h * sum(b * k for b, k in zip(_DP_B, k_v) if b)
+
+    # local error estimate against fourth order solution
+    err_s = h * sum(e * k for e, k in zip(_DP_E, k_s) if e)
+    err_v = h * sum(e * k for e, k in zip(_DP_E, k_v) if e)
+
+    return s_5, v_5, err_s, err_v
+
+
+def rk45(s, v, m, p, dt, acceleration, rtol=1e-5, atol=1e-7, max_iterations=64):
+    """
+    Adaptive Dormand-Prince 5(4) integration with per ball
+    error control: each ball takes as many substeps as its
+    own local error requires to cover dt
+
+    :param s: Positions of shape (n, 3)
+    :param v: Velocities of shape (n, 3)
+    :param m: Masses of shape (n,)
+    :param p: Per ball parameters of shape (n, k)
+    :param dt: Time delta to integrate
+    :param acceleration: Lambda computing accelerations
+    :param rtol: Relative error tolerance
+    :param atol: Absolute error tolerance
+    :param max_iterations: Maximum number of attempted substeps, balls
+        left unfinished take a last step over the remaining time
+    :return: Integrated positions and velocities
+    """
+
+    s, v = np.copy(s), np.copy(v)
+
+    # time integrated and current step size of every ball
+    t = np.zeros(len(s))
+    h = np.full(len(s), dt)
+
+    for _ in range(max_iterations):
+        # balls that still need to be integrated
+        active = np.flatnonzero(t < dt * (1 - 1e-9))
+        if not len(active):
+            break
+
+        # do not step past dt
+        h_a = np.minimum(h[active], dt - t[active])
+        s_a, v_a, m_a, p_a = s[active], v[active], m[active], p[active]
+
+        s_5, v_5, err_s, err_v = _dormand_prince_step(
+            s_a, v_a, m_a, p_a, h_a[:, np.newaxis], acceleration
+        )
+
+        # scaled error norm of every ball
+        scale_s = atol + rtol * np.maximum(np.abs(s_a), np.abs(s_5))
+        scale_v = atol + rtol * np.maximum(np.abs(v_a), np.abs(v_5))
+        err = np.sqrt(
+            (np.sum((err_s / scale_s) ** 2, axis=1) + np.sum((err_v / scale_v) ** 2, axis=1))
+            / 6
+        )
+
+        # non finite steps (ie: ball left the domain of f) are
+        # rejected, and retried with a smaller step size
+        err[~np.isfinite(err)] = np.inf
+
+        # accept balls within tolerance
+        accepted = err <= 1
+        idx = active[accepted]
+        s[idx], v[idx] = s_5[accepted], v_5[accepted]
+        t[idx] += h_a[accepted]
+
+        # grow or shrink step size, with safety factor
+        with np.errstate(divide="ignore"):
+            factor = 0.9 * err ** (-1 / 5)
+        h[active] = h_a * np.clip(factor, 0.2, 5.0)
+
+    # balls out of iterations finish the rest of dt with a single
+    # step without error control, so that all balls cover dt
+    active = np.flatnonzero(t < dt * (1 - 1e-9))
+    if len(active):
+        h_a = (dt - t[active])[:, np.newaxis]
+        s[active], v[active], _, _ = _dormand_prince_step(
+            s[active], v[active], m[active], p[active], h_a, acceleration
+        )
+
+    return s, v
+
+
+# integrators selectable by name
+INTEGRATORS = {
+    "semi_implicit_euler": semi_implicit_euler,
+    "explicit_euler": explicit_euler,
+    "velocity_verlet": velocity_verlet,
+    "rk4": rk4,
+    "rk45": rk45,
+}
@@ -0,0 +1,103 @@
+import importlib.util
+
+import numpy as np
+import sympy as sp
+
+# numba is an optional dependency: without it, functions
+# are only lambdified to numpy
+NUMBA_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+if NUMBA_AVAILABLE:
+    import numba
+
+
+def _float_constants(functions):
+    """
+    Turn constant functions into floats, so that every
+    compiled kernel returns the same type
+
+    :param functions: List of sympy symbolic functions
+    :return: List of sympy symbolic functions
+    """
+
+    return [sp.Float(f) if f.is_number else f for f in functions]
+
+
+def numba_function_lambda(variables, function):
+    """
+    Turn sympy symbolic representation of function into a
+    compiled elementwise kernel: the whole expression tree is
+    evaluated in one pass, without temporary arrays per operator
+
+    The kernel is a numpy ufunc, so constant functions are
+    broadcast over the shape of values like any other
+
+    :param variables: Symbols implicated in function
+    :param function: Sympy symbolic function
+    :return: Compiled lambda representation of function
+    """
+
+    # scalar function of math module, with the numpy error
+    # model: division by zero gives inf and invalid operations
+    # give nan, like the numpy backend
+    (function,) = _float_constants([function])
+    scalar = numba.njit(error_model="numpy", nogil=True)(
+        sp.lambdify(variables, function, "math")
+    )
+
+    # elementwise kernel, compiled eagerly for float64
+    # so that unsupported functions fail here
+    @numba.vectorize(["float64(float64, float64)"], nopython=True)
+    def kernel(x, y):
+        return scalar(x, y)
+
+    return kernel
+
+
+def numba_jet_lambda(variables, functions):
+    """
+    Turn sympy symbolic representations of the base function and
+    its derivatives into a single compiled kernel evaluating all
+    of them in one pass over points, with common subexpressions
+    eliminated
+
+    :param variables: Symbols implicated in functions
+    :param functions: List of sympy symbolic functions
+    :return: Compiled lambda writing evaluations into an output buffer
+    """
+
+    # scalar function returning a tuple of floats
+    functions = tuple(_float_constants(functions))
+    scalar = numba.njit(error_model="numpy", nogil=True)(
+        sp.lambdify(variables, functions, "math", cse=True)
+    )
+
+    # loop over points, evaluating every function at once
+    # compiled eagerly, so that unsupported functions fail here
+    # instead of on first evaluation, without the GIL so that
+    # chunks can be evaluated in parallel
+    @numba.njit(
+        "void(float64[:], float64[:], float64[:, :])", error_model="numpy", nogil=True
+    )
+    def fill(x, y, out):
+        for i in range(x.shape[0]):
+            row = scalar(x[i], y[i])
+
+            for k in range(out.shape[0]):
+                out[k, i] = row[k]
+
+    def jet(*values, out):
+        """
+        Compiled jet evaluator
+
+        :param *values: Variables of functions
+        :param out: Output buffer of shape (len(functions), n)
+        :return: Output buffer
+        """
+
+        values = [np.asarray(v, dtype=np.float64) for v in values]
+        fill(*values, out)
+
+        return out
+
+    return jet
@@ -1,33 +1,52 @@
 import numpy as np
 
 from joule.compute.calculus import CalculusEngine
+from joule.compute.collisions import CollisionSolver
+from joule.compute.integrators import INTEGRATORS
 from joule.compute.linalg import (
     column_wise,
     magnitude,
     normalize,
     vec_dot,
 )
+from joule.compute.spatial import SpatialGrid
+from joule.profiler import PROFILER
 
 
 class MechanicsEngine:
-    def __init__(self, initial_gravity, initial_friction, buffer_size=32):
+    # per ball integrators are stored as indices into this list
+    INTEGRATOR_NAMES = list(INTEGRATORS)
+
+    def __init__(
+        self,
+        initial_gravity,
+        initial_friction,
+        buffer_size=32,
+        integrator="semi_implicit_euler",
+        collisions=False,
+    ):
         """
         Mechanics Engine: Handling all physics computations
-        of application, and Euler integration for ball positions
+        of application, and integration for ball positions
+
+        Gravity, friction and integration options are stored per ball,
+        so that balls of a parameter sweep are stepped in one batch;
+        the engine's values are the defaults of newly added balls
 
         :param initial_gravity: Initial gravity (m/s^2)
         :param initial_friction: Initial friction (kinetic)
-        :param buffer_size: Physics computation buffer size
+        :param buffer_size: Initial physics computation buffer size
+        :param integrator: Name of integrator in joule.compute.integrators.INTEGRATORS
+        :param collisions: Resolve ball-ball collisions
 
         :return: MechanicsEngine instance
         """
         # preallocate buffers for physics computation
         # to optimize and vectorize all calculations
-        self._buffer_increment = buffer_size
-
-        # boolean mask of indices where computation is needed
-        # True: calculates physics, False: does not
-        self._compute_state = np.zeros(buffer_size, dtype=bool)
+        # number of balls where computation is needed
+        # live balls are packed at the front of the buffers
+        # [:n]: calculates physics, [n:]: free
+        self._n = 0
 
         # s: position buffer (m)
         # v: velocity buffer (m/s)
@@ -36,12 +55,40 @@ class MechanicsEngine:
         # m: masses (kg)
         self._m = np.zeros(buffer_size)
 
+        # per ball parameters
+        # g: gravity (m/s^2)
+        # mu: friction (kinetic)
+        # integrators: index in INTEGRATOR_NAMES
+        # zc: vertical deviation correction
+        self._g, self._mu = np.zeros((2, buffer_size))
+        self._integrators = np.zeros(buffer_size, dtype=np.int8)
+        self._zc = np.ones(buffer_size, dtype=bool)
+
+        # stable ball ids, which do not change when
+        # balls are moved around in the buffers
+        # ids: buffer index -> ball id
+        # slots: ball id -> buffer index, -1 if removed
+        self._ids = np.zeros(buffer_size, dtype=np.int64)
+        self._slots = np.full(buffer_size, -1, dtype=np.int64)
+        self._next_id = 0
+
+        # spatial index over live ball positions, rebuilt
+        # lazily on query when balls have moved
+        self._index = SpatialGrid()
+        self._index_dirty = True
+
         self._gravity = initial_gravity
         self._friction = initial_friction
+        self._integrator_name = self._integrator_index(integrator)[0]
+        self._z_correction = True
+
+        # ball-ball collisions
+        self._collision_solver = CollisionSolver()
+        self._collisions = collisions
 
     def get_gravity(self):
         """
-        Returns gravity
+        Returns default gravity
 
         :return: gravity (m/s^2)
         """
@@ -50,17 +97,26 @@ class MechanicsEngine:
 
     def set_gravity(self, gravity):
         """
-        Sets internal gravity vector
+        Sets gravity of all balls, and of balls added later
 
         :param: gravity (m/s^2)
         """
 
-        # convert to internal vec3
-        self._gravity = np.array([0, 0, -gravity])
+        self._g[: self._n] = gravity
+        self._gravity = gravity
+
+    def set_default_gravity(self, gravity):
+        """
+        Sets gravity of balls added later only
+
+        :param: gravity (m/s^2)
+        """
+
+        self._gravity = gravity
 
     def get_friction(self):
         """
-        Returns kinetic friction
+        Returns default kinetic friction
 
         :return: friction
         """
@@ -69,13 +125,185 @@ class MechanicsEngine:
 
     def set_friction(self, friction):
         """
-        Sets internal friction constant
+        Sets friction of all balls, and of balls added later
 
         :param: friction (kinetic)
         """
 
+        self._mu[: self._n] = friction
         self._friction = friction
 
+    def set_default_friction(self, friction):
+        """
+        Sets friction of balls added later only
+
+        :param: friction (kinetic)
+        """
+
+        self._friction = friction
+
+    def get_integrator(self):
+        """
+        Returns name of default integrator
+
+        :return: Integrator name
+        """
+
+        return self._integrator_name
+
+    def set_integrator(self, name):
+        """
+        Sets integrator of all balls, and of balls added later
+
+        :param name: Name of integrator in joule.compute.integrators.INTEGRATORS
+        """
+
+        name, index = self._integrator_index(name)
+
+        self._integrators[: self._n] = index
+        self._integrator_name = name
+
+    def set_default_integrator(self, name):
+        """
+        Sets integrator of balls added later only
+
+        :param name: Name of integrator in joule.compute.integrators.INTEGRATORS
+        """
+
+        self._integrator_name = self._integrator_index(name)[0]
+
+    def _integrator_index(self, name):
+        """
+        Bounds an integrator name
+
+        :param name: Name of integrator in joule.compute.integrators.INTEGRATORS
+        :return: (name, index in INTEGRATOR_NAMES)
+        """
+
+        if name not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator: {name}")
+
+        return name, self.INTEGRATOR_NAMES.index(name)
+
+    def set_ball_parameters(
+        self, ball_ids, gravity=None, friction=None, integrator=None, z_correction=None
+    ):
+        """
+        Sets parameters of individual balls, None keeps the current ones
+
+        :param ball_ids: Ball ids of shape (k,)
+        :param gravity: Gravities of shape (k,) or scalar (m/s^2)
+        :param friction: Frictions of shape (k,) or scalar (kinetic)
+        :param integrator: Names of integrators of shape (k,) or single name
+        :param z_correction: Vertical deviation corrections of shape (k,) or scalar
+        """
+
+        ball_ids = np.atleast_1d(ball_ids)
+
+        # bounds the ids
+        if len(ball_ids) and (
+            ball_ids.min() < 0
+            or ball_ids.max() >= self._next_id
+            or (self._slots[ball_ids] < 0).any()
+        ):
+            raise ValueError(f"Unknown ball ids: {ball_ids}")
+
+        self._set_parameters(
+            self._slots[ball_ids], gravity, friction, integrator, z_correction
+        )
+
+    def _set_parameters(self, i, gravity, friction, integrator, z_correction):
+        """
+        Sets parameters of balls at buffer indices, None keeps the current ones
+
+        :param i: Buffer indices, or slice
+        :param gravity: Gravities or scalar (m/s^2)
+        :param friction: Frictions or scalar (kinetic)
+        :param integrator: Names of integrators or single name
+        :param z_correction: Vertical deviation corrections or scalar
+        """
+
+        if gravity is not None:
+            self._g[i] = gravity
+        if friction is not None:
+            self._mu[i] = friction
+        if isinstance(integrator, str):
+            self._integrators[i] = self._integrator_index(integrator)[1]
+        elif integrator is not None:
+            self._integrators[i] = [self._integrator_index(k)[1] for k in integrator]
+        if z_correction is not None:
+            self._zc[i] = z_correction
+
+    def get_collisions(self):
+        """
+        Returns if ball-ball collisions are resolved
+
+        :return: Collisions enabled
+        """
+
+        return self._collisions
+
+    def set_collisions(self, collisions):
+        """
+        Enables or disables ball-ball collisions
+
+        :param collisions: Collisions enabled
+        """
+
+        self._collisions = collisions
+
+    def get_collision_solver(self):
+        """
+        Returns collision solver
+
+        :return: joule.compute.collisions.CollisionSolver instance
+        """
+
+        return self._collision_solver
+
+    def _reallocate(self, new_size):
+        """
+        Reallocates computation buffers to a new size,
+        keeping live balls
+
+        :param new_size: New buffer size
+        """
+
+        old_size = len(self._s)
+
+        # reallocate position, velocity, masses, parameters and ids
+        (s, v), m = np.zeros((2, new_size, 3)), np.zeros(new_size)
+        g, mu = np.zeros((2, new_size))
+        integrators = np.zeros(new_size, dtype=np.int8)
+        zc = np.ones(new_size, dtype=bool)
+        ids = np.zeros(new_size, dtype=np.int64)
+
+        # copy old values into new buffer
+        n = min(old_size, new_size)
+        s[:n], v[:n], m[:n] = self._s[:n], self._v[:n], self._m[:n]
+        g[:n], mu[:n] = self._g[:n], self._mu[:n]
+        integrators[:n], zc[:n] = self._integrators[:n], self._zc[:n]
+        ids[:n] = self._ids[:n]
+        self._s, self._v, self._m, self._ids = s, v, m, ids
+        self._g, self._mu, self._integrators, self._zc = g, mu, integrators, zc
+
+    def reserve(self, n):
+        """
+        Ensures computation buffers can hold at least n balls
+        without reallocation
+
+        Buffers grow geometrically so that adding balls one
+        by one has an amortized constant cost
+
+        :param n: Number of balls
+        """
+
+        old_size = len(self._s)
+
+        if n > old_size:
+            # at least double buffer size
+            self._reallocate(max(n, 2 * old_size))
+
     def _get_available_compute_spot(self):
         """
         Acquire index of the first free location in
@@ -86,57 +314,213 @@ class MechanicsEngine:
         :return: index < buffer_size
         """
 
-        # get first location where buffer is False
-        # ie, not currently used
-        i = np.argmin(self._compute_state)
+        # make sure there is room for one more ball
+        self.reserve(self._n + 1)
+
+        # first free location is right after
+        # the last live ball
+        return self._n
 
-        # if location is True
-        # implies: every spot in buffer is used because
-        # argmin could not find a minimum
-        if self._compute_state[i]:
-            # increment new buffer size
-            old_size = len(self._compute_state)
-            new_size = old_size + self._buffer_increment
+    def _get_new_ids(self, n=1):
+        """
+        Acquire new stable ball ids
 
-            print(f"mechanics: reallocate, from {old_size} to {new_size}")
+        Reallocates indirection table if full to prevent overflow
 
-            # reallocate compute buffer state
-            compute_state = np.zeros(new_size, dtype=bool)
-            # copy old values into new buffer
-            compute_state[:old_size] = self._compute_state
-            self._compute_state = compute_state
+        :param n: Number of ids
+        :return: Ball ids of shape (n,)
+        """
 
-            # reallocate position, velocity and masses
-            (s, v), m = np.zeros((2, new_size, 3)), np.zeros(new_size)
-            # copy old values into new buffer
-            s[:old_size], v[:old_size], m[:old_size] = self._s, self._v, self._m
-            self._s, self._v, self._m = s, v, m
+        ball_ids = np.arange(self._next_id, self._next_id + n)
+        self._next_id += n
 
-            # returns the first available spot
-            # which is the one after the last index
-            # of the previous buffer
-            i = old_size
+        # indirection table is full, grow geometrically
+        if self._next_id > len(self._slots):
+            size = max(self._next_id, 2 * len(self._slots))
+            slots = np.full(size, -1, dtype=np.int64)
+            slots[: len(self._slots)] = self._slots
+            self._slots = slots
 
-        return i
+        return ball_ids
 
-    def add_ball(self, position, mass):
+    def _remove_index(self, i):
+        """
+        Removes ball at buffer index by swapping the
+        last live ball into its place
+
+        :param i: Buffer index of ball
+        """
+
+        last = self._n - 1
+        removed_id = self._ids[i]
+
+        # move last ball into the hole
+        self._s[i], self._v[i], self._m[i] = self._s[last], self._v[last], self._m[last]
+        self._g[i], self._mu[i] = self._g[last], self._mu[last]
+        self._integrators[i], self._zc[i] = self._integrators[last], self._zc[last]
+        self._ids[i] = self._ids[last]
+        self._slots[self._ids[i]] = i
+
+        # turn off computation of removed ball
+        self._slots[removed_id] = -1
+        self._n = last
+
+        self._index_dirty = True
+
+    def add_ball(
+        self,
+        position,
+        mass,
+        gravity=None,
+        friction=None,
+        integrator=None,
+        z_correction=None,
+    ):
         """
         Adds ball with mass at given position into
         compute buffer
 
         :param position: Vector of position (m)
         :param mass: Scalar of mass (kg)
+        :param gravity: Gravity (m/s^2), None for the default
+        :param friction: Friction (kinetic), None for the default
+        :param integrator: Name of integrator, None for the default
+        :param z_correction: Vertical deviation correction, None for the default
+        :return: Ball id
         """
 
         i = self._get_available_compute_spot()
+        (ball_id,) = self._get_new_ids()
 
         # (re)set parameters
         self._s[i] = position
         self._v[i] = 0
         self._m[i] = mass
+        self._set_defaults(i, gravity, friction, integrator, z_correction)
 
         # turn on computation at index
-        self._compute_state[i] = True
+        self._ids[i] = ball_id
+        self._slots[ball_id] = i
+        self._n += 1
+
+        self._index_dirty = True
+
+        return ball_id
+
+    def add_balls(
+        self,
+        positions,
+        masses,
+        gravity=None,
+        friction=None,
+        integrator=None,
+        z_correction=None,
+    ):
+        """
+        Adds balls with masses at given positions into
+        compute buffer in one call
+
+        :param positions: Array of position vectors of shape (n, 3) (m)
+        :param masses: Array of masses of shape (n,) or scalar (kg)
+        :param gravity: Gravities of shape (n,) or scalar (m/s^2), None for the default
+        :param friction: Frictions of shape (n,) or scalar (kinetic), None for the default
+        :param integrator: Names of integrators or single name, None for the default
+        :param z_correction: Vertical deviation corrections, None for the default
+        :return: Ball ids of shape (n,)
+        """
+
+        k = len(positions)
+        start, end = self._n, self._n + k
+
+        # single reallocation for all balls
+        self.reserve(end)
+        ball_ids = self._get_new_ids(k)
+
+        # (re)set parameters
+        self._s[start:end] = positions
+        self._v[start:end] = 0
+        self._m[start:end] = masses
+        self._set_defaults(
+            slice(start, end), gravity, friction, integrator, z_correction
+        )
+
+        # turn on computation at indices
+        self._ids[start:end] = ball_ids
+        self._slots[ball_ids] = np.arange(start, end)
+        self._n = end
+
+        self._index_dirty = True
+
+        return ball_ids
+
+    def _set_defaults(self, i, gravity, friction, integrator, z_correction):
+        """
+        Sets parameters of new balls at buffer indices, None for the defaults
+
+        :param i: Buffer index, or slice
+        :param gravity: Gravities or scalar (m/s^2)
+        :param friction: Frictions or scalar (kinetic)
+        :param integrator: Names of integrators or single name
+        :param z_correction: Vertical deviation corrections or scalar
+        """
+
+        self._set_parameters(
+            i,
+            self._gravity if gravity is None else gravity,
+            self._friction if friction is None else friction,
+            self._integrator_name if integrator is None else integrator,
+            self._z_correction if z_correction is None else z_correction,
+        )
+
+    def _get_index(self):
+        """
+        Returns spatial index over live balls, rebuilding
+        it if balls have changed since the last query
+
+        :return: joule.compute.spatial.SpatialGrid instance
+        """
+
+        if self._index_dirty:
+            self._index.build(self._s[: self._n])
+            self._index_dirty = False
+
+        return self._index
+
+    def select_nearest(self, select_position):
+        """
+        Finds ball closest to given position
+
+        :param select_position: Vector of position (m), xy or xyz
+        :return: Ball id, None if there are no balls
+        """
+
+        i = self._get_index().nearest(select_position)
+
+        if i is None:
+            return None
+        return self._ids[i]
+
+    def select_radius(self, select_position, radius):
+        """
+        Finds balls within radius of given position
+
+        :param select_position: Vector of position (m), xy or xyz
+        :param radius: Radius of selection (m)
+        :return: Ball ids of shape (k,)
+        """
+
+        return self._ids[self._get_index().query_radius(select_position, radius)]
+
+    def select_box(self, xy_min, xy_max):
+        """
+        Finds balls whose xy position lies within a box
+
+        :param xy_min: Lowest corner of box (m)
+        :param xy_max: Highest corner of box (m)
+        :return: Ball ids of shape (k,)
+        """
+
+        return self._ids[self._get_index().query_box(xy_min, xy_max)]
 
     def remove_ball(self, select_position):
         """
@@ -144,18 +528,51 @@ class MechanicsEngine:
         from compute buffer
 
         :param select_position: Vector of position (m)
+        :return: Removed ball id, None if there are no balls
+        """
+
+        # find closest ball with spatial index
+        ball_id = self.select_nearest(select_position)
+
+        if ball_id is not None:
+            self.remove_ball_id(ball_id)
+
+        return ball_id
+
+    def remove_ball_id(self, ball_id):
+        """
+        Removes ball with given id from compute buffer
+
+        :param ball_id: Ball id
         """
 
-        # compute distances from select position
-        # each of the balls
-        distances_to_select = np.linalg.norm(select_position - self._s, axis=1)
+        # bounds the id
+        if not 0 <= ball_id < self._next_id or self._slots[ball_id] < 0:
+            raise ValueError(f"Unknown ball id: {ball_id}")
+
+        self._remove_index(self._slots[ball_id])
 
-        # find minimum distance (closest)
-        i = np.argmin(distances_to_select)
+    def remove_ball_ids(self, ball_ids):
+        """
+        Removes balls with given ids from compute buffer,
+        ie: from a region selection
 
-        # deactivate computation at index
-        self._compute_state[i] = False
+        :param ball_ids: Ball ids of shape (k,)
+        """
 
+        for ball_id in ball_ids:
+            self.remove_ball_id(ball_id)
+
+    def get_ball_index(self, ball_id):
+        """
+        Returns buffer index of ball with given id,
+        which is only valid until the next removal
+
+        :param ball_id: Ball id
+        :return: Buffer index, -1 if removed
+        """
+
+        return self._slots[ball_id]
 
     def clear(self):
         """
@@ -163,40 +580,114 @@ class MechanicsEngine:
         """
 
         # stop computation for all indices
-        self._compute_state[:] = False
+        self._slots[self._ids[: self._n]] = -1
+        self._n = 0
 
-    def update(self, dt, calculus_engine: CalculusEngine, z_correction=True):
+        self._index_dirty = True
+
+    def get_state(self):
         """
-        Step through Euler integration for dt
+        Returns full state of the simulation, ie: for snapshots
 
-        :param dt: Time delta to integrate
-        :param calculus_engine: Instance of joule.calculus.CalculusEngine
-        :param z_correction: Correct for vertical deviation over time
+        Arrays are views of the live balls, not copies
+
+        :return: (dictionary of name -> array, dictionary of parameters)
         """
 
-        # sum returns the number of True values
-        # in compute state
-        # if no computation is required, skip
-        if not self._compute_state.sum():
-            return
+        n = self._n
+
+        arrays = {
+            "s": self._s[:n],
+            "v": self._v[:n],
+            "m": self._m[:n],
+            "g": self._g[:n],
+            "mu": self._mu[:n],
+            "integrators": self._integrators[:n],
+            "zc": self._zc[:n],
+            "ids": self._ids[:n],
+            "slots": self._slots[: self._next_id],
+        }
+
+        parameters = {
+            "gravity": float(self._gravity),
+            "friction": float(self._friction),
+            "integrator": self._integrator_name,
+            "integrator_names": self.INTEGRATOR_NAMES,
+            "collisions": bool(self._collisions),
+            "restitution": float(self._collision_solver.get_restitution()),
+        }
+
+        return arrays, parameters
+
+    def set_state(self, arrays, parameters):
+        """
+        Restores state from get_state
+
+        Arrays are adopted as the computation buffers without
+        copying (ie: memory-mapped from a snapshot), they are
+        only copied once the buffers grow
 
-        # acquire position and velocity of indices
-        # that need to be computed
-        pos = self._s[self._compute_state]
-        vel = self._v[self._compute_state]
+        :param arrays: Dictionary of name -> array
+        :param parameters: Dictionary of parameters
+        """
+
+        # integrators are stored by index, which changes
+        # if integrators were added since
+        names = parameters["integrator_names"]
+        if names != self.INTEGRATOR_NAMES:
+            lookup = np.array(
+                [self.INTEGRATOR_NAMES.index(name) for name in names], dtype=np.int8
+            )
+            arrays = {**arrays, "integrators": lookup[arrays["integrators"]]}
+
+        self._s, self._v, self._m = arrays["s"], arrays["v"], arrays["m"]
+        self._g, self._mu = arrays["g"], arrays["mu"]
+        self._integrators, self._zc = arrays["integrators"], arrays["zc"]
+        self._ids, self._slots = arrays["ids"], arrays["slots"]
+
+        self._n = len(self._s)
+        self._next_id = len(self._slots)
+        self._index_dirty = True
+
+        self._gravity = parameters["gravity"]
+        self._friction = parameters["friction"]
+        self._integrator_name = self._integrator_index(parameters["integrator"])[0]
+        self._collisions = parameters["collisions"]
+        self._collision_solver.set_restitution(parameters["restitution"])
+
+    def _acceleration(
+        self, pos, vel, mass, gravity, friction, calculus_engine: CalculusEngine
+    ):
+        """
+        Computes accelerations of balls rolling on surface
+
+        :param pos: Positions of shape (n, 3)
+        :param vel: Velocities of shape (n, 3)
+        :param mass: Masses of shape (n,)
+        :param gravity: Gravities of shape (n,)
+        :param friction: Frictions of shape (n,)
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :return: Accelerations of shape (n, 3)
+        """
 
         # isolate x and y of position
         point_mesh = pos[:, :2]
+
+        # evaluate function and all of its derivatives
+        # at x and y in a single pass
+        with PROFILER.scope("derivatives"):
+            f, fx, fy, fxx, fyy, fxy = calculus_engine.build_jet(point_mesh)
+
         # build normals at x and y
-        normal = calculus_engine.build_normals(point_mesh)
+        normal = calculus_engine.normals_from_partials(fx, fy)
 
         # build reference frame of the ball
         Z = normalize(normal)
         # X = normalize(Fg_x)
         # Y = vec_cross(Z, X)
-        
+
         # project vertical component of gravity
-        Fg_net = self.get_gravity()
+        Fg_net = column_wise(gravity) * np.array([0, 0, -1])
         Fg_z = vec_dot(Fg_net, Z)
 
         # acquire horizontal component of gravity
@@ -210,43 +701,25 @@ class MechanicsEngine:
         # find direction of velocity
         vel_dir = normalize(vel)
 
-        # mask for gradient computation if velocity
-        # is non-zero for numerical stability
-        grad_mask = magnitude(vel_dir) != 0
-
-        # preallocate buffer for curvature computation
-        curvature = np.zeros(len(grad_mask))
-
-        # if gradient is needed to be computed
-        if grad_mask.sum():
-            # isolate x and y of velocity
-            point_mesh_vel = vel_dir[grad_mask, :2]
-
-            # compute first order gradient of surface
-            grad_1 = calculus_engine.build_gradient_first(point_mesh_vel)
-
-            # compute second order gradient of surface
-            grad_2 = calculus_engine.build_gradient_second(point_mesh_vel)
+        # isolate x and y of velocity direction
+        u_x, u_y = vel_dir[:, 0], vel_dir[:, 1]
 
-            # project first and second order gradients
-            # onto velocity direction, effectively
-            # calculating the directional gradient that
-            # is aligned to velocity
-            slope_1 = np.vecdot(grad_1, point_mesh_vel)
-            slope_2 = np.vecdot(grad_2, point_mesh_vel)
+        # project first and second order gradients
+        # at the position of the balls onto velocity
+        # direction, effectively calculating the
+        # directional gradient that is aligned to velocity
+        # (zero velocity yields zero slopes)
+        slope_1 = fx * u_x + fy * u_y
+        slope_2 = fxx * u_x**2 + 2 * fxy * u_x * u_y + fyy * u_y**2
 
-            # formulas from
-            # https://en.wikipedia.org/wiki/Radius_of_curvature
-            # with 
-            # https://en.wikipedia.org/wiki/Directional_derivative
+        # formulas from
+        # https://en.wikipedia.org/wiki/Radius_of_curvature
+        # with
+        # https://en.wikipedia.org/wiki/Directional_derivative
 
-            # calculate curvature according to directional
-            # derivatives
-            curvature[grad_mask] = np.abs(slope_2) / (1 + slope_1**2) ** (3 / 2)
-
-        # acquire masses of indices
-        # that need to be computed
-        mass = self._m[self._compute_state]
+        # calculate curvature according to directional
+        # derivatives
+        curvature = np.abs(slope_2) / (1 + slope_1**2) ** (3 / 2)
 
         # calculates radial net force
         # curvature: k = 1/r
@@ -261,7 +734,7 @@ class MechanicsEngine:
 
         # using normal force, calculate friction vector
         # with direction opposite to velocity
-        fk_xy = -vel_dir * column_wise(self.get_friction() * N)
+        fk_xy = -vel_dir * column_wise(friction * N)
 
         # sum of forces horizontal
         Fnet_xy = Fg_x + fk_xy
@@ -272,22 +745,102 @@ class MechanicsEngine:
         # sum of accelerations
         a_net = a_z + a_xy
 
-        # integrate acceleration with respect to time
-        # to get velocity
-        self._v[self._compute_state] = a_net * dt + vel
-        v_net = self._v[self._compute_state]
+        return a_net
+
+    def _integrate(self, k, pos, vel, mass, gravity, friction, dt, calculus_engine):
+        """
+        Integrates balls sharing an integrator
+
+        :param k: Index of integrator in INTEGRATOR_NAMES
+        :param pos: Positions of shape (n, 3)
+        :param vel: Velocities of shape (n, 3)
+        :param mass: Masses of shape (n,)
+        :param gravity: Gravities of shape (n,)
+        :param friction: Frictions of shape (n,)
+        :param dt: Time delta to integrate
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :return: Integrated positions and velocities
+        """
+
+        integrator = INTEGRATORS[self.INTEGRATOR_NAMES[k]]
+
+        # gravity and friction are passed through the integrator,
+        # which indexes them with the balls it steps (ie: rk45
+        # substeps only the balls that need it)
+        params = np.column_stack((gravity, friction))
+
+        return integrator(
+            pos,
+            vel,
+            mass,
+            params,
+            dt,
+            lambda s, v, m, p: self._acceleration(
+                s, v, m, p[:, 0], p[:, 1], calculus_engine
+            ),
+        )
+
+    def update(self, dt, calculus_engine: CalculusEngine, z_correction=True):
+        """
+        Step through integration for dt
+
+        :param dt: Time delta to integrate
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :param z_correction: Correct for vertical deviation over time
+        """
+
+        # if no computation is required, skip
+        if not self._n:
+            return
 
-        # integrate velocity with respect to time
-        # to get position
-        self._s[self._compute_state] = v_net * dt + pos
+        # acquire views of position, velocity, masses and
+        # parameters of live balls, packed at the front of
+        # the buffers
+        n = self._n
+        pos, vel, mass = self._s[:n], self._v[:n], self._m[:n]
+        gravity, friction = self._g[:n], self._mu[:n]
+
+        # integrate accelerations with respect to time
+        # to get velocity, and velocity to get position,
+        # in one batch per integrator (usually a single one)
+        integrators = self._integrators[:n]
+        if (integrators == integrators[0]).all():
+            pos, vel = self._integrate(
+                integrators[0], pos, vel, mass, gravity, friction, dt, calculus_engine
+            )
+        else:
+            pos, vel = np.copy(pos), np.copy(vel)
+            for k in np.unique(integrators):
+                i = integrators == k
+                pos[i], vel[i] = self._integrate(
+                    k,
+                    pos[i],
+                    vel[i],
+                    mass[i],
+                    gravity[i],
+                    friction[i],
+                    dt,
+                    calculus_engine,
+                )
+
+        # if ball-ball collisions are activated
+        if self._collisions:
+            self._collision_solver.resolve(pos, vel, mass)
 
         # if vertical integration correction is activated
         if z_correction:
-            # computes actual z position of balls
-            z = calculus_engine.build_values(point_mesh)
-
             # sets z position of balls to surface
-            self._s[self._compute_state, 2] = z
+            zc = self._zc[:n]
+            if zc.all():
+                pos[:, 2] = calculus_engine.build_values(pos[:, :2])
+            elif zc.any():
+                pos[zc, 2] = calculus_engine.build_values(pos[zc, :2])
+
+        self._s[:n] = pos
+        self._v[:n] = vel
+
+        # balls have moved
+        self._index_dirty = True
 
     def get_render_positions(self):
         """
@@ -296,7 +849,25 @@ class MechanicsEngine:
         :return: Position vectors of shape (n, 3)
         """
 
-        return self._s[self._compute_state]
+        return self._s[: self._n]
+
+    def get_render_velocities(self):
+        """
+        Returns velocities where physics is computed
+
+        :return: Velocity vectors of shape (n, 3)
+        """
+
+        return self._v[: self._n]
+
+    def get_render_ids(self):
+        """
+        Returns ids of balls where physics is computed
+
+        :return: Ball ids of shape (n,)
+        """
+
+        return self._ids[: self._n]
 
     def get_render_masses(self):
         """
@@ -305,7 +876,25 @@ class MechanicsEngine:
         :return: Masses of shape (n,)
         """
 
-        return self._m[self._compute_state]
+        return self._m[: self._n]
+
+    def get_render_gravity(self):
+        """
+        Returns gravities where physics is computed
+
+        :return: Gravities of shape (n,)
+        """
+
+        return self._g[: self._n]
+
+    def get_render_friction(self):
+        """
+        Returns frictions where physics is computed
+
+        :return: Frictions of shape (n,)
+        """
+
+        return self._mu[: self._n]
 
     def get_render_n(self):
         """
@@ -315,7 +904,7 @@ class MechanicsEngine:
         :return: Number of balls
         """
 
-        return self._compute_state.sum()
+        return self._n
 
     def get_render_max(self):
         """
@@ -325,4 +914,4 @@ class MechanicsEngine:
         :return: Buffer size
         """
 
-        return len(self._compute_state)
+        return len(self._s)
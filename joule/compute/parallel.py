@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+# shared pool, created on first use
+_pool = None
+
+
+def get_pool():
+    """
+    Returns thread pool shared by all chunked evaluations,
+    with one thread per core
+
+    Threads are enough: numpy and compiled kernels release the
+    GIL while looping over arrays, and the outputs are written
+    in place without copies between processes
+
+    :return: ThreadPoolExecutor instance
+    """
+
+    global _pool
+
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1, thread_name_prefix="joule-chunk"
+        )
+
+    return _pool
+
+
+def chunk_ranges(n, chunk_size):
+    """
+    Splits range(n) into contiguous chunks
+
+    :param n: Number of elements
+    :param chunk_size: Maximum number of elements per chunk
+    :return: List of (start, end) of chunks
+    """
+
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+def parallel_chunks(function, n, chunk_size=65536):
+    """
+    Calls function(start, end) over contiguous chunks of range(n)
+    on the shared thread pool, and waits for all of them
+
+    Chunks are expected to write their results into disjoint
+    slices of preallocated output buffers
+
+    :param function: Function of chunk (start, end)
+    :param n: Number of elements
+    :param chunk_size: Maximum number of elements per chunk
+    """
+
+    chunks = chunk_ranges(n, chunk_size)
+
+    # not worth the scheduling overhead
+    if len(chunks) <= 1 or (os.cpu_count() or 1) == 1:
+        for start, end in chunks:
+            function(start, end)
+        return
+
+    futures = [get_pool().submit(function, start, end) for start, end in chunks]
+
+    # re-raise exceptions of chunks
+    for future in futures:
+        future.result()
@@ -0,0 +1,365 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from joule.compute.mechanics import MechanicsEngine
+
+
+# version of the on-disk format
+FORMAT_VERSION = 1
+
+# frame index record: step, simulated time, offset of the frame's
+# first ball in the ball files, and number of balls
+INDEX_DTYPE = np.dtype(
+    [("step", np.int64), ("time", np.float64), ("offset", np.int64), ("n", np.int64)]
+)
+
+# ball files: name -> shape of one ball's record
+FIELDS = {
+    "positions": (3,),
+    "velocities": (3,),
+    "masses": (),
+    "ids": (),
+}
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, every=1, dtype=np.float64, max_queue=8, metadata=None):
+        """
+        Trajectory Recorder: Appends the state of live balls every
+        n steps into a directory of raw, append-only files, one per
+        field, and a frame index
+
+        Frames are copied and queued on the step loop, and written
+        by a background thread, so that the history is never held
+        in memory. The queue is bounded: if the disk cannot keep up,
+        recording blocks until a frame is written
+
+        :param path: Output directory
+        :param every: Record every n steps
+        :param dtype: Float type of positions, velocities and masses
+        :param max_queue: Maximum number of frames waiting to be written
+        :param metadata: JSON serializable description (ie: expression, domain)
+
+        :return: TrajectoryRecorder instance
+        """
+
+        self._path = path
+        self._every = every
+        self._dtype = np.dtype(dtype)
+        self._metadata = metadata or {}
+
+        os.makedirs(path, exist_ok=True)
+
+        self._files = {
+            name: open(os.path.join(path, f"{name}.bin"), "wb") for name in FIELDS
+        }
+        self._index = open(os.path.join(path, "index.bin"), "wb")
+
+        # number of balls written, offset of the next frame
+        self._offset = 0
+        self._n_frames = 0
+
+        self._write_header(complete=False)
+
+        # frames waiting to be written, None stops the writer
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._error = None
+
+        self._writer = threading.Thread(target=self._write_frames, daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write_header(self, complete):
+        """
+        Writes description of the recording
+
+        :param complete: Whether the recording was closed
+        """
+
+        header = {
+            "version": FORMAT_VERSION,
+            "every": self._every,
+            "dtype": self._dtype.str,
+            "n_frames": self._n_frames,
+            "complete": complete,
+            "metadata": self._metadata,
+        }
+
+        with open(os.path.join(self._path, "header.json"), "w") as file:
+            json.dump(header, file, indent=2)
+
+    def _write_frames(self):
+        """
+        Writer thread target: appends queued frames to the files
+        """
+
+        while (frame := self._queue.get()) is not None:
+            try:
+                if self._error is None:
+                    self._write_frame(*frame)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+        self._queue.task_done()
+
+    def _write_frame(self, step, time, arrays):
+        """
+        Appends a frame to the files
+
+        :param step: Integration step
+        :param time: Simulated time (s)
+        :param arrays: Dictionary of field name -> array
+        """
+
+        for name, array in arrays.items():
+            array.tofile(self._files[name])
+
+        # index last, so that the index never points
+        # past the written balls
+        n = len(arrays["ids"])
+        record = np.array([(step, time, self._offset, n)], dtype=INDEX_DTYPE)
+        record.tofile(self._index)
+
+        self._offset += n
+        self._n_frames += 1
+
+    def record(self, step, time, mechanics_engine: MechanicsEngine):
+        """
+        Records state of live balls, if step is a multiple of every
+
+        :param step: Integration step
+        :param time: Simulated time (s)
+        :param mechanics_engine: Instance of joule.compute.mechanics.MechanicsEngine
+        """
+
+        if step % self._every:
+            return
+
+        # re-raise failures of writer thread on the step loop
+        if self._error is not None:
+            raise self._error
+
+        # copies, as engine buffers are modified by the next step
+        arrays = {
+            "positions": mechanics_engine.get_render_positions().astype(self._dtype),
+            "velocities": mechanics_engine.get_render_velocities().astype(self._dtype),
+            "masses": mechanics_engine.get_render_masses().astype(self._dtype),
+            "ids": mechanics_engine.get_render_ids().astype(np.int64),
+        }
+
+        self._queue.put((step, time, arrays))
+
+    def flush(self):
+        """
+        Blocks until queued frames are written, and flushes them to disk,
+        ie: for a reader of the same recording
+        """
+
+        self._queue.join()
+
+        for file in (*self._files.values(), self._index):
+            file.flush()
+
+    def close(self):
+        """
+        Writes remaining frames, and completes the recording
+        """
+
+        if self._writer is None:
+            return
+
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+        for file in (*self._files.values(), self._index):
+            file.close()
+
+        self._write_header(complete=True)
+
+        if self._error is not None:
+            raise self._error
+
+
+class TrajectoryReader:
+    def __init__(self, path):
+        """
+        Trajectory Reader: Memory-maps a recording of joule.compute.
+        recorder.TrajectoryRecorder, so that frames are only read
+        from disk when accessed
+
+        Recordings may still be written to, see refresh
+
+        :param path: Recording directory
+
+        :return: TrajectoryReader instance
+        """
+
+        self._path = path
+
+        with open(os.path.join(path, "header.json")) as file:
+            header = json.load(file)
+
+        if header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unknown recording version: {header['version']}")
+
+        self._every = header["every"]
+        self._dtype = np.dtype(header["dtype"])
+        self._metadata = header["metadata"]
+
+        self.refresh()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _map(self, name, dtype, shape):
+        """
+        Memory-maps whole records of a file
+
+        :param name: File name
+        :param dtype: Type of records
+        :param shape: Shape of one record
+        :return: Read only memmap of shape (k, *shape)
+        """
+
+        path = os.path.join(self._path, name)
+        record_size = dtype.itemsize * int(np.prod(shape))
+        k = os.path.getsize(path) // record_size
+
+        # memmap cannot map empty files
+        if not k:
+            return np.empty((0, *shape), dtype=dtype)
+
+        return np.memmap(path, dtype=dtype, mode="r", shape=(k, *shape))
+
+    def refresh(self):
+        """
+        Maps frames written since the reader was opened
+        """
+
+        index = self._map("index.bin", INDEX_DTYPE, ())
+
+        self._arrays = {}
+        for name, shape in FIELDS.items():
+            dtype = np.dtype(np.int64) if name == "ids" else self._dtype
+            self._arrays[name] = self._map(f"{name}.bin", dtype, shape)
+
+        # frames whose balls are all written, as files are
+        # flushed independently while recording
+        end = index["offset"] + index["n"]
+        written = min(len(array) for array in self._arrays.values())
+        self._index = index[: np.searchsorted(end, written, side="right")]
+
+    def get_every(self):
+        """
+        Returns recording interval
+
+        :return: Steps between frames
+        """
+
+        return self._every
+
+    def get_metadata(self):
+        """
+        Returns description given to the recorder
+
+        :return: Dictionary of metadata
+        """
+
+        return self._metadata
+
+    def get_times(self):
+        """
+        Returns simulated time of every frame
+
+        :return: Times of shape (n_frames,) (s)
+        """
+
+        return self._index["time"]
+
+    def get_steps(self):
+        """
+        Returns integration step of every frame
+
+        :return: Steps of shape (n_frames,)
+        """
+
+        return self._index["step"]
+
+    def get_ball_counts(self):
+        """
+        Returns number of balls of every frame
+
+        :return: Ball counts of shape (n_frames,)
+        """
+
+        return self._index["n"]
+
+    def get_frame(self, i):
+        """
+        Returns state of balls on a frame, as views of the mapped files
+
+        :param i: Frame index
+        :return: Dictionary of positions (n, 3), velocities (n, 3), masses (n,), ids (n,)
+        """
+
+        offset, n = self._index[i]["offset"], self._index[i]["n"]
+
+        end = offset + n
+        return {name: array[offset:end] for name, array in self._arrays.items()}
+
+    def get_frames(self, start, end):
+        """
+        Reads consecutive frames into memory in one contiguous read
+
+        :param start: First frame index
+        :param end: Last frame index (exclusive)
+        :return: (index records with offsets relative to the first frame,
+            dictionary of field name -> array of all balls of the frames)
+        """
+
+        records = np.array(self._index[start:end])
+
+        if not len(records):
+            return records, {name: array[:0] for name, array in self._arrays.items()}
+
+        lo = records["offset"][0]
+        hi = records["offset"][-1] + records["n"][-1]
+        records["offset"] -= lo
+
+        # copies, which read the mapped pages from disk
+        arrays = {name: np.array(array[lo:hi]) for name, array in self._arrays.items()}
+
+        return records, arrays
+
+    def get_ball(self, ball_id, name="positions"):
+        """
+        Returns a field of one ball over the frames it is live in
+
+        :param ball_id: Ball id
+        :param name: Field name: positions, velocities, masses
+        :return: (frame indices (k,), values (k, ...))
+        """
+
+        frames, values = [], []
+
+        for i in range(len(self)):
+            frame = self.get_frame(i)
+            j = np.flatnonzero(frame["ids"] == ball_id)
+
+            if len(j):
+                frames.append(i)
+                values.append(frame[name][j[0]])
+
+        return np.array(frames, dtype=np.int64), np.array(values)
@@ -0,0 +1,349 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from joule.compute.recorder import TrajectoryReader
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayPlayer:
+    def __init__(
+        self,
+        reader: TrajectoryReader,
+        chunk_bytes=32 * 2**20,
+        max_bytes=256 * 2**20,
+        prefetch=2,
+    ):
+        """
+        Replay Player: Plays back a recording, with a time cursor
+        moved by frame time and playback speed, or by scrubbing
+
+        Frames are read from the memory-mapped recording by chunks
+        of consecutive frames, and the chunks following the cursor
+        (in the direction of playback) are read ahead on a background
+        thread, so that playback does not stall on disk reads. Chunks
+        are sized in bytes, from the largest frame of the recording,
+        and only a bounded number of bytes is kept in memory at once
+
+        :param reader: Instance of joule.compute.recorder.TrajectoryReader
+        :param chunk_bytes: Approximate size of a chunk, at least one frame
+        :param max_bytes: Maximum size of chunks kept in memory, at least
+            the chunk at the cursor and those read ahead
+        :param prefetch: Number of chunks read ahead of the cursor
+
+        :return: ReplayPlayer instance
+        """
+
+        if not len(reader):
+            raise ValueError("Recording has no frames")
+
+        self._reader = reader
+        self._prefetch = prefetch
+
+        # frames per chunk, from the size of the largest frame
+        # (ie: a frame of 100k balls is about 6 MB)
+        frame = reader.get_frame(0)
+        ball_bytes = sum(
+            array.itemsize * int(np.prod(array.shape[1:])) for array in frame.values()
+        )
+        frame_bytes = max(int(np.max(reader.get_ball_counts())) * ball_bytes, 1)
+
+        self._chunk_frames = max(chunk_bytes // frame_bytes, 1)
+        self._max_bytes = max(
+            max_bytes, (prefetch + 2) * self._chunk_frames * frame_bytes
+        )
+
+        # simulated time of frames, small enough to hold in memory
+        self._times = np.array(reader.get_times())
+
+        self._time = self._times[0]
+        self._speed = 1.0
+        self._playing = True
+
+        # chunk number -> (index records, arrays), least recently used first
+        self._chunks = OrderedDict()
+        self._cached_bytes = 0
+
+        # chunks requested from, and being read by the prefetch thread
+        self._wanted = []
+        self._loading = set()
+
+        self._condition = threading.Condition()
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._prefetch_chunks, daemon=True)
+        self._thread.start()
+
+    def get_reader(self):
+        """
+        Returns reader of recording
+
+        :return: joule.compute.recorder.TrajectoryReader instance
+        """
+
+        return self._reader
+
+    def get_start(self):
+        """
+        Returns time of first frame
+
+        :return: Time (s)
+        """
+
+        return self._times[0]
+
+    def get_end(self):
+        """
+        Returns time of last frame
+
+        :return: Time (s)
+        """
+
+        return self._times[-1]
+
+    def get_time(self):
+        """
+        Returns time of cursor
+
+        :return: Time (s)
+        """
+
+        return self._time
+
+    def get_speed(self):
+        """
+        Returns playback speed
+
+        :return: Simulated time per real time, negative to play backwards
+        """
+
+        return self._speed
+
+    def set_speed(self, speed):
+        """
+        Sets playback speed
+
+        :param speed: Simulated time per real time, negative to play backwards
+        """
+
+        self._speed = speed
+
+    def is_playing(self):
+        """
+        Returns whether cursor moves with time
+
+        :return: True if playing
+        """
+
+        return self._playing
+
+    def set_playing(self, playing):
+        """
+        Plays or pauses playback, playing from the end of the
+        recording (in the direction of playback) restarts it
+
+        :param playing: True to play
+        """
+
+        if playing and not self._playing:
+            if self._speed >= 0 and self._time >= self._times[-1]:
+                self._time = self._times[0]
+            elif self._speed < 0 and self._time <= self._times[0]:
+                self._time = self._times[-1]
+
+        self._playing = playing
+
+    def seek(self, time):
+        """
+        Moves cursor, ie: when scrubbing
+
+        :param time: Time (s), clamped to the recording
+        """
+
+        self._time = np.clip(time, self._times[0], self._times[-1])
+
+    def advance(self, dt):
+        """
+        Moves cursor by frame time, pausing at either end of the recording
+
+        :param dt: Time taken for frame render (s)
+        """
+
+        if not self._playing:
+            return
+
+        self.seek(self._time + dt * self._speed)
+
+        if self._time in (self._times[0], self._times[-1]):
+            self._playing = False
+
+    def get_frame_index(self):
+        """
+        Returns index of last frame at or before the cursor
+
+        :return: Frame index
+        """
+
+        i = np.searchsorted(self._times, self._time, side="right") - 1
+        return max(i, 0)
+
+    def get_frame(self):
+        """
+        Returns state of balls at the cursor, and reads ahead
+        the following chunks
+
+        :return: Dictionary of positions (n, 3), velocities (n, 3), masses (n,), ids (n,)
+        """
+
+        i = self.get_frame_index()
+        chunk = i // self._chunk_frames
+
+        records, arrays = self._get_chunk(chunk)
+
+        # read ahead in the direction of playback
+        step = -1 if self._speed < 0 else 1
+        self._request([chunk + step * k for k in range(1, self._prefetch + 1)])
+
+        record = records[i % self._chunk_frames]
+        offset, end = record["offset"], record["offset"] + record["n"]
+
+        return {name: array[offset:end] for name, array in arrays.items()}
+
+    def _read_chunk(self, chunk):
+        """
+        Reads chunk from the recording
+
+        :param chunk: Chunk number
+        :return: (index records, arrays) of joule.compute.recorder.TrajectoryReader.get_frames
+        """
+
+        start = chunk * self._chunk_frames
+        return self._reader.get_frames(start, start + self._chunk_frames)
+
+    def _chunk_size(self, data):
+        """
+        Returns size of a chunk in memory
+
+        :param data: (index records, arrays) of chunk
+        :return: Size (bytes)
+        """
+
+        records, arrays = data
+        return records.nbytes + sum(array.nbytes for array in arrays.values())
+
+    def _load_chunk(self, chunk):
+        """
+        Reads chunk marked as loading, and inserts it, evicting
+        least recently used chunks
+
+        :param chunk: Chunk number
+        :return: (index records, arrays) of chunk
+        """
+
+        try:
+            data = self._read_chunk(chunk)
+        except Exception:
+            # waiting readers are woken up on failure as well,
+            # and read the chunk themselves
+            with self._condition:
+                self._loading.discard(chunk)
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._chunks[chunk] = data
+            self._chunks.move_to_end(chunk)
+            self._cached_bytes += self._chunk_size(data)
+
+            while self._cached_bytes > self._max_bytes and len(self._chunks) > 1:
+                _, evicted = self._chunks.popitem(last=False)
+                self._cached_bytes -= self._chunk_size(evicted)
+
+            self._loading.discard(chunk)
+            self._condition.notify_all()
+
+        return data
+
+    def _get_chunk(self, chunk):
+        """
+        Returns chunk, reading it now if it was not read ahead
+
+        :param chunk: Chunk number
+        :return: (index records, arrays) of chunk
+        """
+
+        with self._condition:
+            # being read ahead: wait for it rather than read twice
+            while chunk in self._loading:
+                self._condition.wait()
+
+            if (data := self._chunks.get(chunk)) is not None:
+                self._chunks.move_to_end(chunk)
+                return data
+
+            self._loading.add(chunk)
+
+        return self._load_chunk(chunk)
+
+    def _request(self, chunks):
+        """
+        Requests chunks to be read ahead
+
+        :param chunks: Chunk numbers, in order of priority
+        """
+
+        n_chunks = -(-len(self._times) // self._chunk_frames)
+
+        with self._condition:
+            self._wanted = [
+                chunk
+                for chunk in chunks
+                if 0 <= chunk < n_chunks
+                and chunk not in self._chunks
+                and chunk not in self._loading
+            ]
+
+            if self._wanted:
+                self._condition.notify_all()
+
+    def _prefetch_chunks(self):
+        """
+        Prefetch thread target: reads requested chunks
+        """
+
+        while True:
+            with self._condition:
+                while not self._stopped and not self._wanted:
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+                chunk = self._wanted.pop(0)
+                if chunk in self._chunks or chunk in self._loading:
+                    continue
+
+                self._loading.add(chunk)
+
+            # failures are only missed read aheads
+            try:
+                self._load_chunk(chunk)
+            except Exception as e:
+                logger.warning("could not read chunk %d: %s", chunk, e)
+
+    def close(self):
+        """
+        Stops prefetch thread, and releases read chunks
+        """
+
+        with self._condition:
+            self._stopped = True
+            self._chunks.clear()
+            self._cached_bytes = 0
+            self._condition.notify_all()
+
+        self._thread.join()
@@ -0,0 +1,148 @@
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+from joule.compute.mechanics import MechanicsEngine
+
+
+class PhysicsScheduler:
+    def __init__(
+        self,
+        mechanics_engine: MechanicsEngine,
+        step_size=1 / 120,
+        max_substeps=8,
+    ):
+        """
+        Physics Scheduler: Steps the mechanics engine with a fixed
+        time step, decoupled from the frame rate, and interpolates
+        rendered positions between the last two physics states
+
+        :param mechanics_engine: Instance of joule.compute.mechanics.MechanicsEngine
+        :param step_size: Fixed integration time step (s)
+        :param max_substeps: Maximum number of physics steps per frame
+
+        :return: PhysicsScheduler instance
+        """
+
+        self._mechanics_engine = mechanics_engine
+
+        self._step_size = step_size
+        self._max_substeps = max_substeps
+
+        # simulation time not yet integrated (s)
+        self._accumulator = 0.0
+
+        # positions before the last physics step
+        # None when there is nothing to interpolate from
+        self._prev_s = None
+
+        # number of physics steps taken on last frame
+        self._substeps = 0
+
+    def get_step_size(self):
+        """
+        Returns fixed integration time step
+
+        :return: Time step (s)
+        """
+
+        return self._step_size
+
+    def set_step_size(self, step_size):
+        """
+        Sets fixed integration time step
+
+        :param step_size: Time step (s)
+        """
+
+        self._step_size = step_size
+
+    def set_max_substeps(self, max_substeps):
+        """
+        Sets maximum number of physics steps per frame
+
+        :param max_substeps: Maximum number of steps
+        """
+
+        self._max_substeps = max_substeps
+
+    def get_substeps(self):
+        """
+        Returns number of physics steps taken on last frame
+
+        :return: Number of steps
+        """
+
+        return self._substeps
+
+    def get_alpha(self):
+        """
+        Returns interpolation factor between the previous
+        and current physics states
+
+        :return: Factor in [0, 1)
+        """
+
+        return self._accumulator / self._step_size
+
+    def invalidate(self):
+        """
+        Discards the previous physics state, ie: when balls
+        are added or removed and states no longer match
+        """
+
+        self._prev_s = None
+
+    def advance(self, frame_dt, calculus_engine: CalculusEngine, z_correction=True):
+        """
+        Advance simulation by the wall-clock duration of a frame,
+        in fixed steps
+
+        :param frame_dt: Time taken for frame render (s)
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :param z_correction: Correct for vertical deviation over time
+        :return: Number of physics steps taken
+        """
+
+        self._accumulator += frame_dt
+
+        # number of whole steps available in accumulator
+        n = int(self._accumulator // self._step_size)
+
+        # on a slow frame, cap the number of steps and drop
+        # the time that cannot be caught up on, so that the
+        # simulation slows down instead of spiraling
+        if n > self._max_substeps:
+            n = self._max_substeps
+            self._accumulator = n * self._step_size
+
+        for i in range(n):
+            # keep state before the last step for interpolation
+            if i == n - 1:
+                self._prev_s = np.copy(self._mechanics_engine.get_render_positions())
+
+            self._mechanics_engine.update(
+                self._step_size, calculus_engine, z_correction=z_correction
+            )
+
+        self._accumulator -= n * self._step_size
+        self._substeps = n
+
+        return n
+
+    def get_render_positions(self):
+        """
+        Returns positions interpolated between the previous
+        and current physics states
+
+        :return: Position vectors of shape (n, 3)
+        """
+
+        current = self._mechanics_engine.get_render_positions()
+
+        # nothing to interpolate from
+        if self._prev_s is None or self._prev_s.shape != current.shape:
+            return current
+
+        # linear interpolation with accumulated remainder
+        alpha = self.get_alpha()
+        return self._prev_s + (current - self._prev_s) * alpha
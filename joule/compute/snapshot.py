@@ -0,0 +1,183 @@
+import json
+import os
+
+import numpy as np
+
+from joule.compute.mechanics import MechanicsEngine
+
+
+# file signature and version of the format
+MAGIC = b"JOULESNP"
+FORMAT_VERSION = 1
+
+# arrays start on multiples of this, so that they can be mapped
+# and read with aligned loads
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+    """
+    Rounds offset up to the next multiple of ALIGNMENT
+
+    :param offset: Byte offset
+    :return: Aligned byte offset
+    """
+
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_snapshot(path, arrays, metadata):
+    """
+    Writes arrays and metadata into a snapshot file
+
+    Layout: signature, length of header (uint64), JSON header
+    describing metadata and arrays, then raw arrays, each
+    aligned to ALIGNMENT bytes
+
+    :param path: Snapshot file
+    :param arrays: Dictionary of name -> array
+    :param metadata: JSON serializable dictionary
+    """
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # header length depends on offsets, which depend on header
+    # length: offsets are relative to the first array instead
+    descriptions, offset = {}, 0
+    for name, array in arrays.items():
+        descriptions[name] = {
+            "dtype": array.dtype.str,
+            "shape": array.shape,
+            "offset": offset,
+        }
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps(
+        {"version": FORMAT_VERSION, "metadata": metadata, "arrays": descriptions}
+    ).encode()
+
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    # write to a temporary file first, then swap, so that an
+    # interrupted write never leaves a truncated snapshot
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temporary = f"{path}.tmp"
+
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header)).tobytes())
+        file.write(header)
+
+        for name, array in arrays.items():
+            file.seek(data_start + descriptions[name]["offset"])
+            array.tofile(file)
+
+        # pad last array, so that the file is as long as the layout
+        file.truncate(data_start + offset)
+
+    os.replace(temporary, path)
+
+
+def load_snapshot(path, mode="c"):
+    """
+    Maps arrays of a snapshot file, without reading or copying them
+
+    :param path: Snapshot file
+    :param mode: Memmap mode: "c" for writable arrays that leave the
+        file untouched (copy-on-write), "r" for read only arrays
+    :return: (dictionary of name -> memmap, metadata)
+    """
+
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a snapshot: {path}")
+
+        (length,) = np.frombuffer(file.read(8), dtype=np.uint64)
+        header = json.loads(file.read(int(length)))
+
+    if header["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unknown snapshot version: {header['version']}")
+
+    data_start = _aligned(len(MAGIC) + 8 + int(length))
+
+    arrays = {}
+    for name, description in header["arrays"].items():
+        dtype = np.dtype(description["dtype"])
+        shape = tuple(description["shape"])
+
+        # memmap cannot map empty arrays
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, dtype=dtype)
+            continue
+
+        arrays[name] = np.memmap(
+            path,
+            dtype=dtype,
+            mode=mode,
+            offset=data_start + description["offset"],
+            shape=shape,
+        )
+
+    return arrays, header["metadata"]
+
+
+def release_mapping(arrays, path):
+    """
+    Copies arrays into memory if any of them is mapped from a file,
+    so that the file can be overwritten (mapped files cannot be
+    replaced on Windows)
+
+    :param arrays: Dictionary of name -> array
+    :param path: File about to be overwritten
+    :return: Dictionary of name -> array, the same one if nothing is mapped
+    """
+
+    path = os.path.abspath(path)
+
+    mapped = any(
+        isinstance(array, np.memmap) and array.filename == path
+        for array in arrays.values()
+    )
+    if not mapped:
+        return arrays
+
+    return {name: np.array(array) for name, array in arrays.items()}
+
+
+def save_simulation(path, mechanics_engine: MechanicsEngine, **metadata):
+    """
+    Writes state of a mechanics engine into a snapshot file
+
+    Buffers of the engine mapped from the same file (ie: resumed
+    from it with load_simulation) are copied into memory first
+
+    :param path: Snapshot file
+    :param mechanics_engine: Instance of joule.compute.mechanics.MechanicsEngine
+    :param **metadata: JSON serializable values (ie: expression, domain)
+    """
+
+    arrays, parameters = mechanics_engine.get_state()
+
+    released = release_mapping(arrays, path)
+    if released is not arrays:
+        # drop the mapped buffers, only the copies stay referenced
+        mechanics_engine.set_state(released, parameters)
+        arrays, parameters = mechanics_engine.get_state()
+
+    save_snapshot(path, arrays, {**metadata, "mechanics": parameters})
+
+
+def load_simulation(path, mechanics_engine: MechanicsEngine):
+    """
+    Restores state of a mechanics engine from a snapshot file,
+    with its buffers mapped copy-on-write from the file
+
+    :param path: Snapshot file
+    :param mechanics_engine: Instance of joule.compute.mechanics.MechanicsEngine
+    :return: Metadata given to save_simulation
+    """
+
+    arrays, metadata = load_snapshot(path, mode="c")
+    mechanics_engine.set_state(arrays, metadata.pop("mechanics"))
+
+    return metadata
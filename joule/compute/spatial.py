@@ -0,0 +1,403 @@
+import numpy as np
+
+
+# offset so that negative cell coordinates pack into positive keys
+_CELL_OFFSET = 2**30
+_CELL_SHIFT = 2**31
+
+
+def concat_ranges(starts, ends):
+    """
+    Vectorized concatenation of integer ranges, equivalent to
+    np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+    :param starts: Range starts of shape (k,)
+    :param ends: Range ends (exclusive) of shape (k,)
+    :return: Concatenated ranges of shape (sum(ends - starts),)
+    """
+
+    lengths = ends - starts
+    total = lengths.sum()
+
+    # position of the first element of every range in output
+    offsets = np.cumsum(lengths) - lengths
+
+    # every element is its range start, plus its position
+    # within the range
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+
+class SpatialGrid:
+    def __init__(self, balls_per_cell=4):
+        """
+        Spatial Grid: Uniform grid index over the xy positions of
+        balls, for sublinear nearest neighbour, radius and box queries
+
+        Balls are sorted by cell, so that the balls of every cell
+        are contiguous. The sort order is kept between builds, as
+        balls rarely change cell between steps, the sort of the
+        nearly sorted keys is close to linear
+
+        :param balls_per_cell: Average number of balls per cell
+
+        :return: SpatialGrid instance
+        """
+
+        self._balls_per_cell = balls_per_cell
+
+        self._cell_size = 1.0
+
+        # ball indices sorted by cell key
+        self._order = np.zeros(0, dtype=np.int64)
+
+        # unique occupied cell keys, and the start and end of
+        # each cell's balls within self._order
+        self._cells = np.zeros(0, dtype=np.int64)
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._ends = np.zeros(0, dtype=np.int64)
+
+        # extent of occupied cell coordinates
+        self._cell_min = np.zeros(2, dtype=np.int64)
+        self._cell_max = np.zeros(2, dtype=np.int64)
+
+        self._positions = np.zeros((0, 3))
+
+    @property
+    def cell_size(self):
+        """
+        Returns size of grid cells
+
+        :return: Cell size (m)
+        """
+
+        return self._cell_size
+
+    def _cell_coordinates(self, xy):
+        """
+        Computes integer cell coordinates of xy points
+
+        :param xy: Points of shape (n, 2)
+        :return: Cell coordinates of shape (n, 2)
+        """
+
+        return np.floor(xy / self._cell_size).astype(np.int64)
+
+    def _cell_keys(self, cell_coordinates):
+        """
+        Packs integer cell coordinates into sortable keys
+
+        :param cell_coordinates: Cell coordinates of shape (n, 2)
+        :return: Cell keys of shape (n,)
+        """
+
+        c = cell_coordinates + _CELL_OFFSET
+        return c[..., 0] * _CELL_SHIFT + c[..., 1]
+
+    def _choose_cell_size(self, xy):
+        """
+        Choose cell size from the density of points, rounded to
+        a power of two so that it stays stable between builds
+
+        :param xy: Points of shape (n, 2)
+        :return: Cell size
+        """
+
+        extent = np.ptp(xy, axis=0)
+        area = max(extent[0] * extent[1], np.max(extent) ** 2 * 1e-3, 1e-12)
+
+        # side of a square holding balls_per_cell balls on average
+        size = np.sqrt(area * self._balls_per_cell / len(xy))
+
+        return 2.0 ** np.round(np.log2(size))
+
+    def build(self, positions, cell_size=None):
+        """
+        (Re)builds index over positions
+
+        :param positions: Ball positions of shape (n, 3)
+        :param cell_size: Fixed cell size, chosen from density if None
+        """
+
+        self._positions = positions
+        n = len(positions)
+
+        # non finite positions (ie: balls that left the domain
+        # of f) are not indexed
+        finite = np.isfinite(positions).all(axis=1)
+        if not finite.all():
+            indices = np.flatnonzero(finite)
+        else:
+            indices = None
+
+        xy = positions[:, :2] if indices is None else positions[indices, :2]
+
+        if not len(xy):
+            self._order = np.zeros(0, dtype=np.int64)
+            self._cells = self._starts = self._ends = self._order
+            return
+
+        previous_size = self._cell_size
+        self._cell_size = cell_size or self._choose_cell_size(xy)
+
+        cell_coordinates = self._cell_coordinates(xy)
+        keys = self._cell_keys(cell_coordinates)
+
+        # reuse previous order as a starting point when possible
+        # so that the stable sort runs on nearly sorted keys
+        order = self._order
+        reuse = (
+            indices is None and len(order) == n and self._cell_size == previous_size
+        )
+        if not reuse:
+            order = np.arange(len(xy))
+
+        order = order[np.argsort(keys[order], kind="stable")]
+        sorted_keys = keys[order]
+
+        # translate back to ball indices
+        self._order = order if indices is None else indices[order]
+
+        # contiguous ranges of balls for every occupied cell
+        self._cells, self._starts = np.unique(sorted_keys, return_index=True)
+        self._ends = np.append(self._starts[1:], len(sorted_keys))
+
+        self._cell_min = cell_coordinates.min(axis=0)
+        self._cell_max = cell_coordinates.max(axis=0)
+
+    def _gather_cells(self, cell_coordinates):
+        """
+        Gathers indices of balls within given cells
+
+        :param cell_coordinates: Cell coordinates of shape (k, 2)
+        :return: Ball indices
+        """
+
+        keys = self._cell_keys(cell_coordinates)
+
+        # find which of the cells are occupied
+        found = np.searchsorted(self._cells, keys)
+        valid = found < len(self._cells)
+        found, keys = found[valid], keys[valid]
+        found = found[self._cells[found] == keys]
+
+        return self._order[concat_ranges(self._starts[found], self._ends[found])]
+
+    def _gather_block(self, cell_lo, cell_hi):
+        """
+        Gathers indices of balls within a block of cells
+
+        :param cell_lo: Lowest cell coordinates of block (2,)
+        :param cell_hi: Highest cell coordinates of block, inclusive (2,)
+        :return: Ball indices
+        """
+
+        # clip block to occupied extent
+        cell_lo = np.maximum(cell_lo, self._cell_min)
+        cell_hi = np.minimum(cell_hi, self._cell_max)
+
+        if np.any(cell_hi < cell_lo):
+            return np.zeros(0, dtype=np.int64)
+
+        n_block = np.prod(cell_hi - cell_lo + 1)
+
+        # enumerate the block's cells if there are fewer
+        # of them than occupied cells
+        if n_block <= len(self._cells):
+            cx, cy = np.mgrid[cell_lo[0] : cell_hi[0] + 1, cell_lo[1] : cell_hi[1] + 1]
+            return self._gather_cells(np.stack((cx.ravel(), cy.ravel()), axis=1))
+
+        # otherwise filter occupied cells
+        c = self._cells
+        cx = c // _CELL_SHIFT - _CELL_OFFSET
+        cy = c % _CELL_SHIFT - _CELL_OFFSET
+        inside = (
+            (cell_lo[0] <= cx) & (cx <= cell_hi[0]) & (cell_lo[1] <= cy) & (cy <= cell_hi[1])
+        )
+
+        return self._order[concat_ranges(self._starts[inside], self._ends[inside])]
+
+    def _ring_cells(self, center, ring):
+        """
+        Cell coordinates at a Chebyshev distance of ring from center
+
+        :param center: Center cell coordinates (2,)
+        :param ring: Distance in cells
+        :return: Cell coordinates of shape (k, 2)
+        """
+
+        if not ring:
+            return center[np.newaxis]
+
+        side = np.arange(-ring, ring + 1)
+        inner = side[1:-1]
+
+        # top and bottom rows, then left and right columns
+        offsets = np.concatenate(
+            (
+                np.stack((side, np.full_like(side, ring)), axis=1),
+                np.stack((side, np.full_like(side, -ring)), axis=1),
+                np.stack((np.full_like(inner, ring), inner), axis=1),
+                np.stack((np.full_like(inner, -ring), inner), axis=1),
+            )
+        )
+
+        return center + offsets
+
+    def candidate_pairs(self):
+        """
+        Finds all pairs of balls lying in the same or in adjacent
+        cells, ie: every pair closer than the cell size
+
+        :return: Ball indices i, j of pairs of shape (k,), with i != j
+        """
+
+        if not len(self._cells):
+            return np.zeros((2, 0), dtype=np.int64)
+
+        cx = self._cells // _CELL_SHIFT - _CELL_OFFSET
+        cy = self._cells % _CELL_SHIFT - _CELL_OFFSET
+        counts = self._ends - self._starts
+
+        pairs = []
+
+        # same cell, then half of the neighbours so that
+        # every pair of cells is only visited once
+        for dx, dy in [(0, 0), (1, -1), (1, 0), (1, 1), (0, 1)]:
+            neighbour_keys = self._cell_keys(np.stack((cx + dx, cy + dy), axis=1))
+
+            # match cells with their occupied neighbour
+            a = np.arange(len(self._cells))
+            b = np.searchsorted(self._cells, neighbour_keys)
+            valid = b < len(self._cells)
+            a, b = a[valid], b[valid]
+            matched = self._cells[b] == neighbour_keys[valid]
+            a, b = a[matched], b[matched]
+
+            # every combination of balls between cell a and b
+            n_a, n_b = counts[a], counts[b]
+            n_pairs = n_a * n_b
+            offsets = np.cumsum(n_pairs) - n_pairs
+
+            p = np.repeat(np.arange(len(a)), n_pairs)
+            k = np.arange(n_pairs.sum()) - offsets[p]
+
+            i = self._starts[a][p] + k // n_b[p]
+            j = self._starts[b][p] + k % n_b[p]
+
+            # within the same cell, keep each pair once
+            if not dx and not dy:
+                keep = i < j
+                i, j = i[keep], j[keep]
+
+            pairs.append((self._order[i], self._order[j]))
+
+        i, j = zip(*pairs)
+        return np.concatenate(i), np.concatenate(j)
+
+    def _distances(self, indices, point):
+        """
+        Distances of balls to a point, in xy if the point is 2D
+
+        :param indices: Ball indices
+        :param point: Point of shape (2,) or (3,)
+        :return: Distances of shape (k,)
+        """
+
+        k = len(point)
+        return np.linalg.norm(self._positions[indices, :k] - point, axis=1)
+
+    def nearest(self, point):
+        """
+        Finds ball nearest to point
+
+        :param point: Point of shape (2,) or (3,)
+        :return: Ball index, None if index is empty
+        """
+
+        if not len(self._order):
+            return None
+
+        point = np.asarray(point, dtype=float)
+        (center,) = self._cell_coordinates(point[np.newaxis, :2])
+
+        # maximum ring needed to cover every occupied cell
+        max_ring = np.max(
+            np.maximum(np.abs(self._cell_max - center), np.abs(center - self._cell_min))
+        )
+
+        # rings closer than the occupied extent are empty
+        min_ring = np.max(
+            np.maximum(np.maximum(self._cell_min - center, center - self._cell_max), 0)
+        )
+
+        best, best_distance = None, np.inf
+
+        for ring in range(min_ring, max_ring + 1):
+            # rings of more cells than there are indexed balls (ie:
+            # a single ball, or co-located balls, far from the point
+            # with a tiny cell size): measuring every ball is cheaper
+            if 8 * ring > len(self._order):
+                candidates = self._order
+                distances = self._distances(candidates, point)
+                i = np.argmin(distances)
+
+                return candidates[i] if distances[i] < best_distance else best
+
+            candidates = self._gather_cells(self._ring_cells(center, ring))
+
+            if len(candidates):
+                distances = self._distances(candidates, point)
+                i = np.argmin(distances)
+
+                if distances[i] < best_distance:
+                    best, best_distance = candidates[i], distances[i]
+
+            # every ball outside of the rings searched
+            # so far is at least this far
+            if best_distance <= ring * self._cell_size:
+                break
+
+        return best
+
+    def query_radius(self, point, radius):
+        """
+        Finds balls within radius of point
+
+        :param point: Point of shape (2,) or (3,)
+        :param radius: Radius of query (m)
+        :return: Ball indices
+        """
+
+        if not len(self._order):
+            return np.zeros(0, dtype=np.int64)
+
+        point = np.asarray(point, dtype=float)
+
+        lo, hi = self._cell_coordinates(
+            np.array([point[:2] - radius, point[:2] + radius])
+        )
+        candidates = self._gather_block(lo, hi)
+
+        return candidates[self._distances(candidates, point) <= radius]
+
+    def query_box(self, xy_min, xy_max):
+        """
+        Finds balls whose xy position lies within a box
+
+        :param xy_min: Lowest corner of box (2,)
+        :param xy_max: Highest corner of box (2,)
+        :return: Ball indices
+        """
+
+        if not len(self._order):
+            return np.zeros(0, dtype=np.int64)
+
+        xy_min, xy_max = np.asarray(xy_min), np.asarray(xy_max)
+
+        lo, hi = self._cell_coordinates(np.array([xy_min, xy_max]))
+        candidates = self._gather_block(lo, hi)
+
+        xy = self._positions[candidates, :2]
+        inside = np.all((xy_min <= xy) & (xy <= xy_max), axis=1)
+
+        return candidates[inside]
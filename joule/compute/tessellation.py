@@ -0,0 +1,282 @@
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+
+
+class AdaptiveMesher:
+    def __init__(self, base_depth=4, max_depth=10, tolerance=2e-3):
+        """
+        Adaptive Mesher: Quadtree tessellation of a surface, refined
+        where a flat triangle would deviate from the function (large
+        second derivatives), and where the function becomes undefined
+
+        Cells are kept 2:1 balanced, so that every cell edge has at
+        most one extra vertex from its finer neighbour, and each cell
+        is triangulated as a fan around its center without cracks
+
+        :param base_depth: Initial uniform subdivision, 2^base_depth cells per axis
+        :param max_depth: Maximum subdivision, 2^max_depth cells per axis
+        :param tolerance: Maximum deviation, relative to the domain's extent
+
+        :return: AdaptiveMesher instance
+        """
+
+        self._base_depth = base_depth
+        self._max_depth = max_depth
+        self._tolerance = tolerance
+
+        # every vertex lies on an integer lattice, with cells of
+        # the maximum depth spanning two lattice units, so that
+        # cell centers are lattice points as well
+        self._lattice = 2 ** (max_depth + 1)
+
+    def _vertex_ids(self, x, y):
+        """
+        Packs lattice coordinates into vertex ids
+
+        :param x: Lattice x coordinates
+        :param y: Lattice y coordinates
+        :return: Vertex ids
+        """
+
+        return y * (self._lattice + 1) + x
+
+    def _to_world(self, x, y, x_domain, y_domain):
+        """
+        Lattice coordinates to world points
+
+        :param x: Lattice x coordinates of shape (n,)
+        :param y: Lattice y coordinates of shape (n,)
+        :param x_domain: x domain (min, max)
+        :param y_domain: y domain (min, max)
+        :return: Points of shape (n, 2)
+        """
+
+        u = np.stack((x, y), axis=1) / self._lattice
+        origin = np.array([np.min(x_domain), np.min(y_domain)])
+        extent = np.array([np.ptp(x_domain), np.ptp(y_domain)])
+
+        return origin + u * extent
+
+    def _split(self, x0, y0, s):
+        """
+        Splits cells into their four children
+
+        :param x0: Lattice x coordinates of lowest corner of shape (n,)
+        :param y0: Lattice y coordinates of lowest corner of shape (n,)
+        :param s: Lattice size of cells of shape (n,)
+        :return: x0, y0, s of children of shape (4 * n,)
+        """
+
+        h = s // 2
+        x0 = np.concatenate((x0, x0 + h, x0, x0 + h))
+        y0 = np.concatenate((y0, y0, y0 + h, y0 + h))
+
+        return x0, y0, np.tile(h, 4)
+
+    def _needs_refinement(self, calculus_engine, x0, y0, s, x_domain, y_domain):
+        """
+        Refinement criterion of cells
+
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :param x0: Lattice x coordinates of lowest corner of shape (n,)
+        :param y0: Lattice y coordinates of lowest corner of shape (n,)
+        :param s: Lattice size of cells of shape (n,)
+        :param x_domain: x domain (min, max)
+        :param y_domain: y domain (min, max)
+        :return: Mask of cells to refine of shape (n,)
+        """
+
+        n = len(x0)
+
+        # corners and center of every cell
+        dx = np.array([0, 1, 0, 1, 0.5])
+        dy = np.array([0, 0, 1, 1, 0.5])
+        x = (x0[:, np.newaxis] + dx * s[:, np.newaxis]).ravel()
+        y = (y0[:, np.newaxis] + dy * s[:, np.newaxis]).ravel()
+
+        f, _, _, fxx, fyy, fxy = calculus_engine.build_jet(
+            self._to_world(x, y, x_domain, y_domain)
+        ).reshape((6, n, 5))
+
+        # size of cells in world units
+        hx = s * np.ptp(x_domain) / self._lattice
+        hy = s * np.ptp(y_domain) / self._lattice
+
+        # error bound of linear interpolation over the cell, from
+        # the largest second derivatives at the samples (fmax
+        # ignores undefined samples)
+        curvature = (
+            np.fmax.reduce(np.abs(fxx), axis=1) * hx * hx
+            + 2 * np.fmax.reduce(np.abs(fxy), axis=1) * hx * hy
+            + np.fmax.reduce(np.abs(fyy), axis=1) * hy * hy
+        ) / 8
+
+        extent = max(np.ptp(x_domain), np.ptp(y_domain))
+        too_curved = curvature > self._tolerance * extent
+
+        # boundary of the domain of f (ie: sqrt of a negative)
+        # some, but not all, samples are undefined
+        defined = np.isfinite(f)
+        boundary = defined.any(axis=1) & ~defined.all(axis=1)
+
+        return too_curved | boundary
+
+    def _balance(self, x0, y0, s):
+        """
+        Splits cells until no cell neighbours a cell more than
+        twice smaller
+
+        :param x0: Lattice x coordinates of lowest corner of shape (n,)
+        :param y0: Lattice y coordinates of lowest corner of shape (n,)
+        :param s: Lattice size of cells of shape (n,)
+        :return: Balanced x0, y0, s
+        """
+
+        # quarter points along the four edges
+        qx = np.array([1, 3, 4, 4, 3, 1, 0, 0]) / 4
+        qy = np.array([0, 0, 1, 3, 4, 4, 3, 1]) / 4
+
+        while True:
+            vertices = self._corner_ids(x0, y0, s)
+
+            # a vertex at a quarter of an edge belongs to a neighbour
+            # at least four times smaller, only possible for cells
+            # four or more lattice units large
+            large = np.flatnonzero(s >= 4)
+            sl = s[large][:, np.newaxis]
+            quarter_ids = self._vertex_ids(
+                x0[large][:, np.newaxis] + (qx * sl).astype(np.int64),
+                y0[large][:, np.newaxis] + (qy * sl).astype(np.int64),
+            )
+            unbalanced = np.isin(quarter_ids, vertices).any(axis=1)
+
+            if not unbalanced.any():
+                return x0, y0, s
+
+            split = np.zeros(len(x0), dtype=bool)
+            split[large[unbalanced]] = True
+
+            children = self._split(x0[split], y0[split], s[split])
+            x0, y0, s = (
+                np.concatenate((keep[~split], child))
+                for keep, child in zip((x0, y0, s), children)
+            )
+
+    def _corner_ids(self, x0, y0, s):
+        """
+        Sorted unique vertex ids of the corners of cells
+
+        :param x0: Lattice x coordinates of lowest corner of shape (n,)
+        :param y0: Lattice y coordinates of lowest corner of shape (n,)
+        :param s: Lattice size of cells of shape (n,)
+        :return: Sorted vertex ids
+        """
+
+        x = np.concatenate((x0, x0 + s, x0, x0 + s))
+        y = np.concatenate((y0, y0, y0 + s, y0 + s))
+
+        return np.unique(self._vertex_ids(x, y))
+
+    def _triangulate(self, x0, y0, s):
+        """
+        Triangulates balanced cells as fans around their center,
+        including the midpoints of edges shared with finer cells
+
+        :param x0: Lattice x coordinates of lowest corner of shape (n,)
+        :param y0: Lattice y coordinates of lowest corner of shape (n,)
+        :param s: Lattice size of cells of shape (n,)
+        :return: Triangles of vertex ids of shape (k, 3)
+        """
+
+        h = s // 2
+        vertices = self._corner_ids(x0, y0, s)
+
+        center = self._vertex_ids(x0 + h, y0 + h)
+
+        # counterclockwise corners, and midpoints of edges
+        # from corner k to corner k + 1
+        corners = np.stack(
+            (
+                self._vertex_ids(x0, y0),
+                self._vertex_ids(x0 + s, y0),
+                self._vertex_ids(x0 + s, y0 + s),
+                self._vertex_ids(x0, y0 + s),
+            ),
+            axis=1,
+        )
+        midpoints = np.stack(
+            (
+                self._vertex_ids(x0 + h, y0),
+                self._vertex_ids(x0 + s, y0 + h),
+                self._vertex_ids(x0 + h, y0 + s),
+                self._vertex_ids(x0, y0 + h),
+            ),
+            axis=1,
+        )
+
+        # midpoints are vertices when the neighbour is finer
+        split_edge = np.isin(midpoints, vertices)
+
+        a, b = corners, np.roll(corners, -1, axis=1)
+        c = np.broadcast_to(center[:, np.newaxis], a.shape)
+
+        # one triangle per whole edge, two per split edge
+        first = np.stack((c, a, np.where(split_edge, midpoints, b)), axis=-1)
+        second = np.stack((c, midpoints, b), axis=-1)[split_edge]
+
+        return np.concatenate((first.reshape((-1, 3)), second))
+
+    def build(self, calculus_engine: CalculusEngine, x_domain, y_domain):
+        """
+        Tessellates base function of calculus engine over a domain
+
+        :param calculus_engine: Instance of joule.calculus.CalculusEngine
+        :param x_domain: x domain (min, max)
+        :param y_domain: y domain (min, max)
+        :return: points (m, 2), values (m,), normals (m, 3), triangles (k, 3)
+        """
+
+        # initial uniform grid of cells
+        n_base = 2**self._base_depth
+        s = self._lattice // n_base
+        cy, cx = np.mgrid[0:n_base, 0:n_base].reshape((2, -1)) * s
+        active = cx, cy, np.full(n_base * n_base, s)
+
+        leaves = []
+
+        # refine cells level by level, every level is
+        # evaluated for all of its cells at once
+        for _ in range(self._base_depth, self._max_depth):
+            refine = self._needs_refinement(calculus_engine, *active, x_domain, y_domain)
+
+            leaves.append([a[~refine] for a in active])
+            active = self._split(*(a[refine] for a in active))
+
+            if not len(active[0]):
+                break
+
+        leaves.append(active)
+
+        x0, y0, s = (np.concatenate(a) for a in zip(*leaves))
+        x0, y0, s = self._balance(x0, y0, s)
+
+        triangles = self._triangulate(x0, y0, s)
+
+        # compact vertex ids into indices of a vertex array
+        ids, triangles = np.unique(triangles, return_inverse=True)
+        triangles = triangles.reshape((-1, 3))
+
+        x, y = ids % (self._lattice + 1), ids // (self._lattice + 1)
+        points = self._to_world(x, y, x_domain, y_domain)
+
+        # values and normals at vertices
+        jet = calculus_engine.build_jet(points)
+        values = np.copy(jet[0])
+        normals = calculus_engine.normals_from_partials(jet[1], jet[2])
+
+        # drop triangles touching undefined vertices
+        defined = np.isfinite(values)
+        triangles = triangles[defined[triangles].all(axis=1)]
+
+        return points, values, normals, triangles.astype(np.uint32)
@@ -0,0 +1,148 @@
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    def __init__(self, on_error=None):
+        """
+        Background Worker: Runs long tasks (ie: differentiation
+        and sampling of a new function) on a separate thread, so
+        that the rendering loop keeps running meanwhile
+
+        Only the most recently submitted task matters: each
+        submission increments a generation counter, and results
+        of older generations are discarded. Tasks run one at a
+        time on a single thread, a task waiting to start is
+        replaced by newer submissions, and running tasks are
+        given a callable to check if they became stale, and
+        return early between their expensive stages
+
+        :param on_error: Callable turning an exception raised by a task
+            into its result, None to log it and give None
+
+        :return: BackgroundWorker instance
+        """
+
+        self._on_error = on_error
+
+        self._lock = threading.Lock()
+
+        # generation of most recently submitted task
+        self._generation = 0
+
+        # generation and result of most recently finished task
+        self._done = 0
+        self._result = None
+        self._pending = False
+
+        # most recently submitted task, until the thread picks it up
+        self._task = None
+
+        self._idle = threading.Condition(self._lock)
+        self._submitted = threading.Condition(self._lock)
+
+        # daemon, so that a long simplification never
+        # prevents the application from quitting
+        self._thread = threading.Thread(target=self._run_tasks, daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self):
+        """
+        Returns whether the most recent task is still running
+
+        :return: True if running
+        """
+
+        with self._lock:
+            return self._done != self._generation
+
+    def _is_stale(self, generation):
+        """
+        Checks if a task was superseded by a newer one
+
+        :param generation: Generation of task
+        :return: True if stale
+        """
+
+        return generation != self._generation
+
+    def _run_tasks(self):
+        """
+        Thread target: runs submitted tasks and stores their results
+        """
+
+        while True:
+            with self._lock:
+                while self._task is None:
+                    self._submitted.wait()
+
+                (generation, task, args), self._task = self._task, None
+
+            try:
+                result = task(lambda: self._is_stale(generation), *args)
+            except Exception as e:
+                if self._on_error is None:
+                    logger.error("task failed: %s", e, exc_info=True)
+                    result = None
+                else:
+                    result = self._on_error(e)
+
+            with self._lock:
+                # results of stale tasks are never seen
+                if not self._is_stale(generation):
+                    self._done = generation
+                    self._result = result
+                    self._pending = True
+
+                self._idle.notify_all()
+
+    def submit(self, task, *args):
+        """
+        Queues task, superseding any running or waiting task
+
+        Task is called as task(is_stale, *args), where is_stale()
+        returns True once a newer task was submitted
+
+        :param task: Task function
+        :param *args: Arguments of task
+        """
+
+        with self._lock:
+            self._generation += 1
+            self._pending = False
+
+            self._task = self._generation, task, args
+            self._submitted.notify()
+
+    def poll(self):
+        """
+        Returns result of most recent task once, when it is finished
+
+        :return: Result of task, None if still running or already polled
+        """
+
+        with self._lock:
+            if not self._pending:
+                return None
+
+            result, self._result = self._result, None
+            self._pending = False
+
+        return result
+
+    def wait(self):
+        """
+        Blocks until the most recent task is finished
+
+        :return: Result of task, None if already polled
+        """
+
+        with self._lock:
+            while self._done != self._generation:
+                self._idle.wait()
+
+        return self.poll()
@@ -0,0 +1,403 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from joule.compute.cache import ExpressionCache
+from joule.compute.calculus import CalculusEngine
+from joule.compute.mechanics import MechanicsEngine
+from joule.compute.parallel import chunk_ranges
+
+
+# per member arrays exchanged with workers: name -> (shape of member, dtype)
+# inputs are written by the parent, outputs by the workers
+INPUTS = {
+    "points": ((2,), np.float64),
+    "masses": ((), np.float64),
+    "gravity": ((), np.float64),
+    "friction": ((), np.float64),
+}
+OUTPUTS = {
+    "positions": ((3,), np.float64),
+    "velocities": ((3,), np.float64),
+    "settle_time": ((), np.float64),
+}
+
+# state of a worker process, set by _init_worker
+_worker = {}
+
+
+def _layout(n):
+    """
+    Packs all member arrays into one shared block, each
+    starting on a 64 bytes boundary
+
+    :param n: Number of members
+    :return: (size of block, name -> (offset, shape, dtype))
+    """
+
+    layout, offset = {}, 0
+
+    for name, (shape, dtype) in {**INPUTS, **OUTPUTS}.items():
+        shape = (n, *shape)
+        layout[name] = (offset, shape, dtype)
+
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset += -(-size // 64) * 64
+
+    return max(offset, 1), layout
+
+
+def _views(block, layout):
+    """
+    Numpy views of member arrays within a shared block
+
+    :param block: multiprocessing.shared_memory.SharedMemory instance
+    :param layout: name -> (offset, shape, dtype) from _layout
+    :return: Dictionary of name -> array
+    """
+
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+
+def _init_worker(expression, backend, cache_path, block_name, layout, settings):
+    """
+    Worker process initializer: compiles the surface's function
+    once, and attaches the shared block
+
+    :param expression: Textual expression of function f(x, y)
+    :param backend: Lambda backend of calculus engine: numpy, numba
+    :param cache_path: Expression cache holding derivatives from the parent
+    :param block_name: Name of shared block
+    :param layout: name -> (offset, shape, dtype) from _layout
+    :param settings: Dictionary of dt, steps, z_correction, settle_speed
+    """
+
+    # derivatives are loaded from the parent's cache, only
+    # the kernels are compiled again in every process
+    calculus_engine = CalculusEngine(
+        cache=ExpressionCache(path=cache_path), backend=backend
+    )
+    calculus_engine.update_function(expression)
+
+    block = shared_memory.SharedMemory(name=block_name)
+
+    _worker.update(
+        calculus_engine=calculus_engine,
+        block=block,
+        arrays=_views(block, layout),
+        **settings,
+    )
+
+
+def _run_shard(start, end):
+    """
+    Simulates members [start, end) of the ensemble, writing their
+    results into the shared block
+
+    All members of the shard are stepped together, as balls of a
+    single mechanics engine with their own gravity and friction
+
+    :param start: First member
+    :param end: Last member (exclusive)
+    :return: Number of members simulated
+    """
+
+    calculus_engine = _worker["calculus_engine"]
+    arrays = _worker["arrays"]
+    dt, steps = _worker["dt"], _worker["steps"]
+
+    # every ball is added with its own gravity and friction
+    mechanics_engine = MechanicsEngine(initial_gravity=0.0, initial_friction=0.0)
+
+    points = arrays["points"][start:end]
+    z = calculus_engine.build_values(points)
+    mechanics_engine.add_balls(
+        np.column_stack((points, z)),
+        arrays["masses"][start:end],
+        gravity=arrays["gravity"][start:end],
+        friction=arrays["friction"][start:end],
+    )
+
+    # last step every ball was still moving at
+    last_moving = np.zeros(end - start, dtype=np.int64)
+
+    for step in range(1, steps + 1):
+        mechanics_engine.update(
+            dt, calculus_engine, z_correction=_worker["z_correction"]
+        )
+
+        speed = np.linalg.norm(mechanics_engine.get_render_velocities(), axis=1)
+        last_moving[speed >= _worker["settle_speed"]] = step
+
+    # balls never removed: buffers are still in member order
+    arrays["positions"][start:end] = mechanics_engine.get_render_positions()
+    arrays["velocities"][start:end] = mechanics_engine.get_render_velocities()
+
+    # balls moving on the last step did not settle
+    settle_time = last_moving * dt
+    settle_time[last_moving == steps] = np.nan
+    arrays["settle_time"][start:end] = settle_time
+
+    return end - start
+
+
+def run_ensemble(
+    expression,
+    points,
+    masses,
+    gravity,
+    friction,
+    dt,
+    steps,
+    z_correction=True,
+    settle_speed=1e-2,
+    backend="numpy",
+    workers=None,
+    shard_size=None,
+):
+    """
+    Runs independent simulations of balls, each with its own
+    starting point, mass, gravity and friction, sharded across
+    a pool of processes
+
+    Members are exchanged with the workers through a single
+    shared memory block, and only shard bounds are sent
+
+    :param expression: Textual expression of function f(x, y)
+    :param points: Starting points of shape (n, 2)
+    :param masses: Masses of shape (n,) or scalar (kg)
+    :param gravity: Gravities of shape (n,) or scalar (m/s^2)
+    :param friction: Frictions of shape (n,) or scalar (kinetic)
+    :param dt: Integration time step (s)
+    :param steps: Number of integration steps
+    :param z_correction: Correct for vertical deviation over time
+    :param settle_speed: Speed under which a ball is at rest (m/s)
+    :param backend: Lambda backend of calculus engine: numpy, numba
+    :param workers: Number of processes, defaults to one per core
+    :param shard_size: Members per task, defaults to four tasks per process
+    :return: Dictionary of aggregated arrays of shape (n, ...)
+    """
+
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+
+    workers = workers or os.cpu_count() or 1
+    shard_size = shard_size or max(1, -(-n // (4 * workers)))
+
+    # parse and differentiate once, in the parent, into a cache
+    # file loaded by the workers
+    cache_dir = tempfile.TemporaryDirectory(prefix="joule-ensemble-")
+    cache_path = os.path.join(cache_dir.name, "expressions.pkl")
+
+    cache = ExpressionCache(path=cache_path)
+    parser_message = CalculusEngine(cache=cache, backend=backend).update_function(
+        expression
+    )
+    if parser_message != "Parsed sucessfully":
+        cache_dir.cleanup()
+        raise ValueError(parser_message)
+
+    cache.save()
+
+    size, layout = _layout(n)
+    block = shared_memory.SharedMemory(create=True, size=size)
+
+    try:
+        arrays = _views(block, layout)
+
+        arrays["points"][:] = points
+        arrays["masses"][:] = masses
+        arrays["gravity"][:] = gravity
+        arrays["friction"][:] = friction
+
+        settings = {
+            "dt": dt,
+            "steps": steps,
+            "z_correction": z_correction,
+            "settle_speed": settle_speed,
+        }
+        initargs = (expression, backend, cache_path, block.name, layout, settings)
+
+        shards = chunk_ranges(n, shard_size)
+
+        if workers == 1:
+            # no pool: same code path within this process
+            _init_worker(*initargs)
+            try:
+                for start, end in shards:
+                    _run_shard(start, end)
+            finally:
+                _worker.pop("block").close()
+                _worker.clear()
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=initargs
+            ) as pool:
+                # re-raise exceptions of shards
+                for future in [pool.submit(_run_shard, *shard) for shard in shards]:
+                    future.result()
+
+        # copy out of the shared block before releasing it
+        results = {name: np.copy(array) for name, array in arrays.items()}
+        del arrays
+    finally:
+        block.close()
+        block.unlink()
+        cache_dir.cleanup()
+
+    return results
+
+
+def sample_members(x_domain, y_domain, n, masses, gravity, friction, seed=None):
+    """
+    Samples ensemble members uniformly: starting points over the
+    domain, and parameters within their ranges
+
+    :param x_domain: x domain (min, max)
+    :param y_domain: y domain (min, max)
+    :param n: Number of members
+    :param masses: Mass range (min, max) (kg)
+    :param gravity: Gravity range (min, max) (m/s^2)
+    :param friction: Friction range (min, max) (kinetic)
+    :param seed: Random seed
+    :return: points (n, 2), masses (n,), gravity (n,), friction (n,)
+    """
+
+    rng = np.random.default_rng(seed)
+
+    points = rng.uniform(
+        [np.min(x_domain), np.min(y_domain)],
+        [np.max(x_domain), np.max(y_domain)],
+        (n, 2),
+    )
+
+    return (
+        points,
+        rng.uniform(*masses, n),
+        rng.uniform(*gravity, n),
+        rng.uniform(*friction, n),
+    )
+
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments of ensemble runner
+
+    :param argv: Arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m joule.ensemble",
+        description="Joule Monte-Carlo ensemble runner",
+    )
+
+    parser.add_argument("expression", help="function f(x, y), ie: 'sin(x + y)'")
+    parser.add_argument(
+        "--x-domain", nargs=2, type=float, default=[-np.pi, np.pi], metavar=("MIN", "MAX")
+    )
+    parser.add_argument(
+        "--y-domain", nargs=2, type=float, default=[-np.pi, np.pi], metavar=("MIN", "MAX")
+    )
+    parser.add_argument("-n", "--members", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+
+    # parameter ranges, a single value for equal bounds
+    parser.add_argument(
+        "--mass", nargs=2, type=float, default=[10.0, 10.0], metavar=("MIN", "MAX")
+    )
+    parser.add_argument(
+        "--gravity", nargs=2, type=float, default=[25.0, 25.0], metavar=("MIN", "MAX")
+    )
+    parser.add_argument(
+        "--friction", nargs=2, type=float, default=[0.2, 0.2], metavar=("MIN", "MAX")
+    )
+    parser.add_argument("--no-z-correction", action="store_true")
+
+    # integration
+    parser.add_argument("--dt", type=float, default=1 / 60, help="time step (s)")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument(
+        "--settle-speed", type=float, default=1e-2, help="speed at rest (m/s)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=CalculusEngine.BACKENDS,
+        default="numpy",
+        help="function evaluation backend",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="processes, one per core"
+    )
+
+    parser.add_argument(
+        "-o", "--output", default="ensemble.npz", help="output .npz file"
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Ensemble entrypoint called by python -m joule.ensemble
+
+    :param argv: Arguments, defaults to sys.argv
+    """
+
+    args = parse_args(argv)
+
+    points, masses, gravity, friction = sample_members(
+        args.x_domain,
+        args.y_domain,
+        args.members,
+        args.mass,
+        args.gravity,
+        args.friction,
+        seed=args.seed,
+    )
+
+    start = time.perf_counter()
+
+    results = run_ensemble(
+        args.expression,
+        points,
+        masses,
+        gravity,
+        friction,
+        args.dt,
+        args.steps,
+        z_correction=not args.no_z_correction,
+        settle_speed=args.settle_speed,
+        backend=args.backend,
+        workers=args.workers,
+    )
+
+    elapsed = time.perf_counter() - start
+    settled = np.isfinite(results["settle_time"]).sum()
+
+    print(
+        f"ensemble: {args.members} members, {args.steps} steps in {elapsed:.3f}s "
+        f"({args.members * args.steps / elapsed:.0f} ball steps/s), "
+        f"{settled} settled"
+    )
+
+    np.savez(
+        args.output,
+        expression=args.expression,
+        x_domain=args.x_domain,
+        y_domain=args.y_domain,
+        dt=args.dt,
+        **results,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,16 @@ import numpy as np
 from OpenGL.GL import GL_TRIANGLE_STRIP
 
 from joule.compute.calculus import CalculusEngine
+from joule.compute.collisions import ball_radii
 from joule.compute.linalg import column_wise
-from joule.graphics.vbo import create_vao, draw_vao, update_vbo
+from joule.graphics.vbo import (
+    create_instance_vbo,
+    create_vao,
+    draw_vao,
+    update_instance_vbo,
+    update_vbo,
+)
+from joule.profiler import PROFILER
 
 
 def generate_sphere_vertices_fast(radius, res):
@@ -52,15 +60,18 @@ def generate_sphere_vertices_fast(radius, res):
     return v.reshape((-1, 3))
 
 
-class Ball:
-    def __init__(self, initial_color, res=25):
+class SphereLOD:
+    def __init__(self, initial_color, res):
         """
-        Ball: Balls render element
+        Sphere LOD: Unit sphere mesh of one resolution, drawn
+        once per ball with instancing
 
-        :param initial_color: Balls initial color
-        :param res: Balls vertices resolution
+        :param initial_color: Sphere initial color
+        :param res: Sphere vertices resolution
         """
 
+        self.res = res
+
         # generate a unit sphere coordinates
         vertices = generate_sphere_vertices_fast(1, res)
         self.n = len(vertices)
@@ -75,26 +86,51 @@ class Ball:
         # build VAO and VBO for OpenGL
         self.vao, self.vbo = create_vao(self.data, return_vbo=True, store_normals=True)
 
-    def _draw_ball(self, r, s):
+        # per ball position and radius, to draw every
+        # ball from the same unit sphere in one call
+        self.instance_vbo = create_instance_vbo(self.vao)
+
+    def set_color(self, new_color):
         """
-        Draw a ball of radius r at position s
+        Update sphere color
 
-        :param r: Scalar radius of ball
-        :param s: Position of ball as vector of shape (3,)
+        :param new_color: New sphere color
         """
 
-        # TODO: Remove this redundant memcopy
-        # this is very slow, but it'll require a refactor of the
-        # whole rendering architecture, which I didn't have time to do
+        self.data[:, 3:6] = new_color
+        update_vbo(self.vbo, self.data)
 
-        # make a copy of the default buffer
-        data = np.copy(self.data)
-        # resize ball to new resize and translate
-        data[:, :3] = data[:, :3] * r + s
+    def draw(self, instances):
+        """
+        Draw sphere once per instance
+
+        :param instances: Translation and scale of instances of shape (n, 4)
+        """
+
+        update_instance_vbo(self.instance_vbo, instances)
+        draw_vao(self.vao, GL_TRIANGLE_STRIP, self.n, instances=len(instances))
+
+
+class Ball:
+    def __init__(self, initial_color, res=25, lod_res=(4, 8, 16)):
+        """
+        Ball: Balls render element
 
-        # update VBO and draw this ball
-        update_vbo(self.vbo, data)
-        draw_vao(self.vao, GL_TRIANGLE_STRIP, self.n)
+        Balls are drawn with one of several sphere resolutions,
+        depending on their size on screen, so that small balls
+        only cost a few dozen vertices
+
+        :param initial_color: Balls initial color
+        :param res: Balls vertices resolution, of the closest level of detail
+        :param lod_res: Vertices resolutions of coarser levels of detail
+        """
+
+        # levels of detail, from coarsest to finest
+        resolutions = sorted({*lod_res, res})
+        self.lods = [SphereLOD(initial_color, r) for r in resolutions]
+        self._lod_res = np.array(resolutions)
+
+        self.instances = np.zeros((0, 4), dtype=np.float32)
 
     def set_color(self, new_color):
         """
@@ -103,18 +139,39 @@ class Ball:
         :param new_color: New balls color
         """
 
-        # change default buffer's color, so that subsequent
-        # copies in self._draw_ball take this new color
-        self.data[:, 3:6] = new_color
-        update_vbo(self.vbo, self.data)
+        for lod in self.lods:
+            lod.set_color(new_color)
+
+    def _select_lods(self, radii, pixels_per_unit):
+        """
+        Select level of detail of every ball, from its radius on screen
+
+        :param radii: Radii of balls of shape (n,)
+        :param pixels_per_unit: Pixels per world unit, finest level of detail if None
+        :return: Level of detail indices of shape (n,)
+        """
+
+        if pixels_per_unit is None:
+            return np.full(len(radii), len(self.lods) - 1)
 
-    def draw(self, positions, masses, calculus_engine: CalculusEngine):
+        pixel_radii = np.maximum(radii * pixels_per_unit, 1e-6)
+
+        # a circle of radius r drawn with k segments deviates by
+        # r (1 - cos(pi / k)) at most, keep that under half a pixel
+        cos = np.clip(1 - 0.5 / pixel_radii, -1, 1)
+        required = np.pi / np.maximum(np.arccos(cos), 1e-6)
+
+        lods = np.searchsorted(self._lod_res, required)
+        return np.minimum(lods, len(self.lods) - 1)
+
+    def draw(self, positions, masses, calculus_engine: CalculusEngine, pixels_per_unit=None):
         """
         Draw all balls
 
         :param positions: Array of positions to draw ball of shape (n, 3)
         :param masses: Array of ball masses of shape (n,)
         :param calculus_engine: joule.compute.CalculusEngine instance
+        :param pixels_per_unit: Screen size of a unit length, finest level of detail if None
         """
 
         # skip draw if no balls
@@ -123,15 +180,33 @@ class Ball:
 
         # evaluate normals at the position of the balls
         point_mesh = positions[:, :2]
-        normals = calculus_engine.build_normals(point_mesh)
+        with PROFILER.scope("derivatives"):
+            normals = calculus_engine.build_normals(point_mesh)
 
         # calculate radius based on uniform density
-        # V=4pi r^3/3
-        radii = np.cbrt(3 * masses / (4 * np.pi)) * 0.08
+        radii = ball_radii(masses)
 
         # using the normals, place each ball tangential to the surface
-        positions += normals * column_wise(radii)
-
-        # draw each ball with its distinct radius
-        for pos, radius in zip(positions, radii):
-            self._draw_ball(radius, pos)
+        # (out of place, positions may be a view of the physics buffers)
+        positions = positions + normals * column_wise(radii)
+
+        # grow instance buffer if it is too small
+        n = len(positions)
+        if len(self.instances) < n:
+            size = max(n, 2 * len(self.instances))
+            self.instances = np.zeros((size, 4), dtype=np.float32)
+
+        # group balls by level of detail, so that
+        # every level is drawn in one call
+        lods = self._select_lods(radii, pixels_per_unit)
+        order = np.argsort(lods, kind="stable")
+        bounds = np.searchsorted(lods[order], np.arange(len(self.lods) + 1))
+
+        # translation and scale of unit sphere of every ball
+        instances = self.instances[:n]
+        instances[:, :3] = positions[order]
+        instances[:, 3] = radii[order]
+
+        for lod, start, end in zip(self.lods, bounds[:-1], bounds[1:]):
+            if end > start:
+                lod.draw(instances[start:end])
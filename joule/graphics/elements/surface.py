@@ -1,7 +1,7 @@
 import numpy as np
 from OpenGL.GL import *
 
-from joule.graphics.vbo import create_vao, draw_vao, update_vbo
+from joule.graphics.vbo import create_vao, draw_vao, update_ebo, update_vbo
 
 
 class Surface:
@@ -14,20 +14,29 @@ class Surface:
         """
 
         # prebuffer mesh and indices
+        self.res = res
         self._point_mesh = self._build_point_mesh(res)
         self._mesh_index = self._build_indices(res)
 
-        # preallocate data array with color
+        # preallocate data array with color, one vertex per
+        # point of the mesh, shared by the triangles around it
         self._n = len(self._mesh_index)
-        self._data = np.ones((self._n, 9), dtype=np.float32)
+        self._data = np.ones((res * res, 9), dtype=np.float32)
 
         self._data[:, 3:6] = initial_color
+        self._color = initial_color
 
-        # build VAO
+        # vertices and triangles of an adaptive mesh, None when
+        # drawing the uniform mesh, see self.update_mesh
+        self._adaptive_data = None
+        self._draw_type = GL_TRIANGLE_STRIP
+
+        # build VAO, with the strip indices copied once to an EBO
         self._vao, self._vbo = create_vao(
             self._data,
             return_vbo=True,
             store_normals=True,
+            indices=self._mesh_index,
         )
 
         self.ready = False
@@ -108,6 +117,104 @@ class Surface:
         # return point mesh
         return point_mesh
 
+    def snap_range(self, old_range, new_range):
+        """
+        Snaps a range onto the grid of a previous range, when their
+        extents differ by less than half a sample: the extent is kept,
+        and the minimum moved by a whole number of samples, so that
+        the new grid reuses samples of the old one (ie: slider values
+        panned by floats that never line up exactly)
+
+        :param old_range: Previous (x range, y range)
+        :param new_range: New (x range, y range)
+        :return: Snapped (x range, y range), new_range if extents differ
+        """
+
+        old_array, new_array = np.array(old_range), np.array(new_range)
+
+        old_extent = np.ptp(old_array, axis=1)
+        new_extent = np.ptp(new_array, axis=1)
+        spacing = old_extent / (self.res - 1)
+
+        if np.any(np.abs(new_extent - old_extent) > spacing / 2):
+            return new_range
+
+        # nearest whole number of samples from the old minimum
+        old_min = np.min(old_array, axis=1)
+        shift = np.round((np.min(new_array, axis=1) - old_min) / spacing)
+        new_min = old_min + shift * spacing
+        new_max = new_min + old_extent
+
+        x_range = [float(new_min[0]), float(new_max[0])]
+        y_range = [float(new_min[1]), float(new_max[1])]
+
+        return x_range, y_range
+
+    def get_grid_shift(self, old_range, new_range):
+        """
+        Finds the shift in samples between the grids of two
+        ranges, when the new grid reuses samples of the old one:
+        same extent, and offset by a whole number of samples, see
+        self.snap_range
+
+        :param old_range: Previous (x range, y range)
+        :param new_range: New (x range, y range)
+        :return: Shift (kx, ky) in samples, None if grids do not align
+        """
+
+        old_range, new_range = np.array(old_range), np.array(new_range)
+
+        old_extent = np.ptp(old_range, axis=1)
+        new_extent = np.ptp(new_range, axis=1)
+        if not np.allclose(old_extent, new_extent, rtol=1e-9, atol=0):
+            return None
+
+        # offset of the new grid, in samples of the old grid
+        spacing = old_extent / (self.res - 1)
+        shift = (np.min(new_range, axis=1) - np.min(old_range, axis=1)) / spacing
+        rounded = np.round(shift)
+
+        if not np.allclose(shift, rounded, atol=1e-6):
+            return None
+
+        # no overlap left
+        if np.any(np.abs(rounded) >= self.res):
+            return None
+
+        return rounded.astype(int)
+
+    def shift_samples(self, shift, old_samples, new_samples):
+        """
+        Copies samples of the old grid shared with the new grid,
+        see self.get_grid_shift
+
+        :param shift: Shift (kx, ky) in samples
+        :param old_samples: Arrays sampled on the old grid of shape (n, ...)
+        :param new_samples: Arrays sampled on the new grid of shape (n, ...)
+        :return: Mask of newly exposed samples, still to evaluate, of shape (n,)
+        """
+
+        res = self.res
+        kx, ky = shift
+
+        # range of new samples, along one axis, that
+        # were sampled on the old grid
+        overlap = lambda k: slice(max(0, -k), min(res, res - k))
+        new_x, new_y = overlap(kx), overlap(ky)
+        old_x = slice(new_x.start + kx, new_x.stop + kx)
+        old_y = slice(new_y.start + ky, new_y.stop + ky)
+
+        # points are row major with x varying fastest
+        for old, new in zip(old_samples, new_samples):
+            old = old.reshape((res, res, -1))
+            new = new.reshape((res, res, -1))
+            new[new_y, new_x] = old[old_y, old_x]
+
+        exposed = np.ones((res, res), dtype=bool)
+        exposed[new_y, new_x] = False
+
+        return exposed.ravel()
+
     def set_color(self, new_color):
         """
         Update surface' color
@@ -117,8 +224,29 @@ class Surface:
 
         # change default buffer's color, so that subsequent
         # updates in self.update_function take this new color
+        self._color = new_color
         self._data[:, 3:6] = new_color
-        update_vbo(self._vbo, self._data)
+
+        if self._adaptive_data is None:
+            update_vbo(self._vbo, self._data)
+        else:
+            self._adaptive_data[:, 3:6] = new_color
+            update_vbo(self._vbo, self._adaptive_data)
+
+    def _fill_data(self, scaled_mesh, values, normals):
+        """
+        Copy new function data into vertex buffer data
+
+        :param scaled_mesh: Mesh of points of shape (n, 2)
+        :param values: Array of f(x, y) function evaluations at points of shape (n,)
+        :param normals: Array of normals evaluted at points of shape (n, 3)
+        """
+
+        # in the order of the mesh, the EBO
+        # takes care of drawing order
+        self._data[:, :2] = scaled_mesh
+        self._data[:, 2] = values
+        self._data[:, -3:] = normals
 
     def update_function(
         self,
@@ -134,12 +262,42 @@ class Surface:
         :param normals: Array of normals evaluted at points of shape (n, 3)
         """
 
-        # copy new function data into buffers
-        self._data[:, :2] = scaled_mesh[self._mesh_index]
-        self._data[:, 2] = values[self._mesh_index]
-        self._data[:, -3:] = normals[self._mesh_index]
+        self._fill_data(scaled_mesh, values, normals)
+
+        # switch back from an adaptive mesh
+        resize = self._adaptive_data is not None
+        if resize:
+            self._adaptive_data = None
+            self._draw_type = GL_TRIANGLE_STRIP
+            self._n = len(self._mesh_index)
+            update_ebo(self._vao, self._mesh_index)
+
+        update_vbo(self._vbo, self._data, resize=resize)
+        self.ready = True
+
+    def update_mesh(self, points, values, normals, triangles):
+        """
+        Update with an arbitrary indexed triangle mesh,
+        ie: from joule.compute.tessellation.AdaptiveMesher
+
+        :param points: Mesh of points of shape (m, 2)
+        :param values: Array of f(x, y) function evaluations at points of shape (m,)
+        :param normals: Array of normals evaluted at points of shape (m, 3)
+        :param triangles: Vertex indices of triangles of shape (k, 3)
+        """
+
+        data = np.empty((len(points), 9), dtype=np.float32)
+        data[:, :2] = points
+        data[:, 2] = values
+        data[:, 3:6] = self._color
+        data[:, -3:] = normals
+
+        self._adaptive_data = data
+        self._draw_type = GL_TRIANGLES
+        self._n = triangles.size
 
-        update_vbo(self._vbo, self._data)
+        update_vbo(self._vbo, data, resize=True)
+        update_ebo(self._vao, triangles)
         self.ready = True
 
     def draw(self):
@@ -150,4 +308,4 @@ class Surface:
         if not self.ready:
             return
 
-        draw_vao(self._vao, GL_TRIANGLE_STRIP, self._n)
+        draw_vao(self._vao, self._draw_type, self._n, indexed=True)
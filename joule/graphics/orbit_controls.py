@@ -43,6 +43,7 @@ class CameraOrbitControls:
         self._view_angle = np.array(initial_view_angle)
         self._view_pan = np.zeros(2)
         self._view_box = np.zeros(2)
+        self._viewport_height = 1
         self._prev_mouse_pos = np.zeros(2)
 
         # store internal state
@@ -147,6 +148,7 @@ class CameraOrbitControls:
 
         # update the camera view coordinates with screen ratio
         self._view_box[:] = [-aspect_ratio, aspect_ratio]
+        self._viewport_height = max(height, 1)
 
     def get_camera_projection(self):
         """
@@ -165,6 +167,17 @@ class CameraOrbitControls:
 
         return p
 
+    def get_pixels_per_unit(self):
+        """
+        Computes the size on screen of a unit length, which is the
+        same everywhere with orthographic projection
+
+        :return: Pixels per world unit
+        """
+
+        # the projection spans 2 * zoom_level units vertically
+        return self._viewport_height / (2 * self._zoom_level)
+
     def get_camera_transform(self):
         """
         Computes the view transformation matrix
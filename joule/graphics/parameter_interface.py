@@ -1,8 +1,13 @@
+from array import array
+
 import imgui
 from imgui.integrations.glfw import GlfwRenderer
 
 import numpy as np
 
+from joule.compute.field import SampledField
+from joule.compute.integrators import INTEGRATORS
+
 
 def slider_domain_clamp(domain):
     """
@@ -62,6 +67,13 @@ class ParameterInterface:
         on_evaluate,
         on_change_ball_color,
         on_change_surface_color,
+        on_export_trace,
+        on_open_replay,
+        on_close_replay,
+        on_seek_replay,
+        on_save_snapshot,
+        on_load_snapshot,
+        on_change_physics,
     ):
         """
         Parameter Interface: Manages the state of the parameters
@@ -71,6 +83,14 @@ class ParameterInterface:
         :param on_evaluate: Callback for a new user function's evaluation call
         :param on_change_ball_color: Callback to change ball color
         :param on_change_surface_color: Callback to change surface color
+        :param on_export_trace: Callback to export profiler trace
+        :param on_open_replay: Callback to play back a recording
+        :param on_close_replay: Callback to stop playback
+        :param on_seek_replay: Callback to move playback cursor
+        :param on_save_snapshot: Callback to save simulation into a slot
+        :param on_load_snapshot: Callback to restore simulation from a slot
+        :param on_change_physics: Callback to apply a changed physics parameter
+            (gravity, friction, integrator) to all balls
         """
 
         # create DearImGui instance for ui drawing
@@ -84,13 +104,21 @@ class ParameterInterface:
         self.dt = 0.0
         self.n_bodies = 0
         self.buffer_size = 0
+        self.substeps = 0
+        self.compiling = False
         self.show_axes = True
+        self.profiler = False
+        self.profile_breakdown = {}
+        self.frame_times = np.zeros(0)
+
+        self._on_export_trace = on_export_trace
 
         # ui state variables of section: Expression
         self.expression_textbox = "sin(x + y)"
         self.parser_response = ""
         self.x_domain_slider = [-np.pi, np.pi]
         self.y_domain_slider = [-np.pi, np.pi]
+        self.adaptive_mesh = False
 
         self._on_evaluate = on_evaluate
 
@@ -99,12 +127,41 @@ class ParameterInterface:
         self.gravity_slider = 25.0
         self.friction_slider = 0.2
         self.z_correction = True
+        self.integrator_names = list(INTEGRATORS)
+        self.integrator_combo = 0
+        self.field_mode_names = ["symbolic", *SampledField.MODES]
+        self.field_mode_combo = 0
+        self.collisions = False
+        self.restitution_slider = 0.5
+        self.physics_rate_slider = 120
+        self.max_substeps_slider = 8
+
+        # ui state variables of section: Replay
+        self.replay_path = "recording"
+        self.replay_message = ""
+        self.replaying = False
+        self.replay_playing = True
+        self.replay_speed = 1.0
+        self.replay_time = 0.0
+        self.replay_range = (0.0, 0.0)
+
+        self._on_open_replay = on_open_replay
+        self._on_close_replay = on_close_replay
+        self._on_seek_replay = on_seek_replay
+
+        # ui state variables of section: Snapshots
+        self.snapshot_slots = 4
+        self.snapshot_message = ""
+
+        self._on_save_snapshot = on_save_snapshot
+        self._on_load_snapshot = on_load_snapshot
 
         # ui state variables of section: Render Parameters
         self.ball_color = [0.25, 0.25, 0.25]
         self._on_change_ball_color = on_change_ball_color
         self.surface_color = [1.0, 1.0, 1.0]
         self._on_change_surface_color = on_change_surface_color
+        self._on_change_physics = on_change_physics
 
         self.light_color = [1.0, 1.0, 1.0]
         self.background_color = [0.86, 0.87, 0.87]
@@ -126,18 +183,76 @@ class ParameterInterface:
     def want_mouse(self):
         return imgui.get_io().want_capture_mouse
 
-    def update_status(self, dt, n_bodies, buffer_size):
+    def update_status(self, dt, n_bodies, buffer_size, substeps, compiling=False):
         """
         Update data of section: Status
 
         :param dt: Time taken for frame render (s)
         :param n_bodies: Number of bodies currently rendering
         :param buffer_size: Number of bodies buffered by the physics engine
+        :param substeps: Number of physics steps taken on frame
+        :param compiling: Whether a new function is being compiled
         """
 
         self.dt = dt
         self.n_bodies = n_bodies
         self.buffer_size = buffer_size
+        self.substeps = substeps
+        self.compiling = compiling
+
+    def update_profile(self, breakdown, frame_times):
+        """
+        Update profiler data of section: Status
+
+        :param breakdown: Dictionary of phase name -> mean time per frame (ms)
+        :param frame_times: Recent frame times (ms)
+        """
+
+        self.profile_breakdown = breakdown
+        self.frame_times = frame_times
+
+    def update_replay(self, message, time=0.0, time_range=None, playing=False):
+        """
+        Update data of section: Replay
+
+        :param message: Textual response of recording reader
+        :param time: Time of playback cursor (s)
+        :param time_range: Times of first and last frame (s), None if not replaying
+        :param playing: Whether playback cursor moves
+        """
+
+        self.replay_message = message
+        self.replaying = time_range is not None
+        self.replay_time = time
+        self.replay_range = time_range or (0.0, 0.0)
+        self.replay_playing = playing
+
+    def update_snapshot(self, message):
+        """
+        Update data of section: Snapshots
+
+        :param message: Textual response of last save or load
+        """
+
+        self.snapshot_message = message
+
+    def update_physics(self, gravity, friction, integrator, collisions, restitution):
+        """
+        Update sliders of section: Physics Parameters, ie: from a
+        restored snapshot, so that they are not applied over it
+
+        :param gravity: Gravity (m/s^2)
+        :param friction: Friction (kinetic)
+        :param integrator: Name of integrator
+        :param collisions: Resolve ball-ball collisions
+        :param restitution: Restitution of collisions
+        """
+
+        self.gravity_slider = gravity
+        self.friction_slider = friction
+        self.integrator_combo = self.integrator_names.index(integrator)
+        self.collisions = collisions
+        self.restitution_slider = restitution
 
     def update_differentiation(self, parser_response, function_texts):
         """
@@ -150,6 +265,14 @@ class ParameterInterface:
         self.parser_response = parser_response
         self.function_texts = function_texts
 
+    @property
+    def integrator(self):
+        return self.integrator_names[self.integrator_combo]
+
+    @property
+    def field_mode(self):
+        return self.field_mode_names[self.field_mode_combo]
+
     @property
     def impl(self):
         return self._imgui_impl
@@ -166,8 +289,35 @@ class ParameterInterface:
             imgui.text(f"{1 / self.dt:.2f} fps")
 
         imgui.text(f"{self.n_bodies}/{self.buffer_size} bodies")
+        imgui.text(f"{self.substeps} physics steps/frame")
 
         _, self.show_axes = imgui.checkbox("show xyz axes", self.show_axes)
+        _, self.profiler = imgui.checkbox("profiler", self.profiler)
+
+        if self.profiler:
+            self._profile()
+
+    def _profile(self):
+        """
+        Draw profiler data of section: Status
+        """
+
+        # nested phases (ie: derivatives within physics)
+        # are included in the time of their parent
+        for name, ms in self.profile_breakdown.items():
+            imgui.text(f"{name}: {ms:.3f} ms")
+
+        if len(self.frame_times):
+            counts, edges = np.histogram(self.frame_times, bins=32)
+            imgui.plot_histogram(
+                "frame time",
+                array("f", counts.astype(np.float32)),
+                overlay_text=f"{edges[0]:.1f} - {edges[-1]:.1f} ms",
+                graph_size=(0, 60),
+            )
+
+        if imgui.button("export trace"):
+            self._on_export_trace()
 
     @ui_section("Expression")
     def _expression(self):
@@ -204,6 +354,9 @@ class ParameterInterface:
         )
         self.y_domain_slider = slider_domain_clamp(self.y_domain_slider)
 
+        # surface tessellation, refined where curved
+        _, self.adaptive_mesh = imgui.checkbox("adaptive mesh", self.adaptive_mesh)
+
         # function evaluate
         if imgui.button("Evaluate"):
             self._on_evaluate(
@@ -212,8 +365,61 @@ class ParameterInterface:
                 self.y_domain_slider,
             )
 
-        # parser response
-        imgui.text(self.parser_response)
+        # parser response, once the function is compiled
+        if self.compiling:
+            imgui.text("compiling...")
+        else:
+            imgui.text(self.parser_response)
+
+    @ui_section("Replay")
+    def _replay(self):
+        """
+        Draw section: Replay
+        """
+
+        # recording directory of python -m joule.sim --record
+        _, self.replay_path = imgui.input_text("recording", self.replay_path, 1024)
+
+        if not self.replaying:
+            if imgui.button("Open"):
+                self._on_open_replay(self.replay_path)
+
+            imgui.text(self.replay_message)
+            return
+
+        if imgui.button("Close"):
+            self._on_close_replay()
+
+        _, self.replay_playing = imgui.checkbox("play", self.replay_playing)
+        _, self.replay_speed = imgui.slider_float(
+            "speed", self.replay_speed, -4.0, 4.0
+        )
+
+        # scrubbing moves the cursor
+        changed, self.replay_time = imgui.slider_float(
+            "time (s)", self.replay_time, *self.replay_range
+        )
+        if changed:
+            self._on_seek_replay(self.replay_time)
+
+        imgui.text(self.replay_message)
+
+    @ui_section("Snapshots")
+    def _snapshots(self):
+        """
+        Draw section: Snapshots
+        """
+
+        # quick save slots, one row each
+        for slot in range(1, self.snapshot_slots + 1):
+            if imgui.button(f"save {slot}"):
+                self._on_save_snapshot(slot)
+
+            imgui.same_line()
+            if imgui.button(f"load {slot}"):
+                self._on_load_snapshot(slot)
+
+        imgui.text(self.snapshot_message)
 
     @ui_section("Physics Parameters")
     def _physics_parameters(self):
@@ -228,13 +434,15 @@ class ParameterInterface:
             0.0,
             100.0,
         )
-        _, self.gravity_slider = imgui.slider_float(
+        # gravity, friction and integrator are event based, so
+        # that they only overwrite per ball values when changed
+        gravity_changed, self.gravity_slider = imgui.slider_float(
             "gravity (m/s^2)",
             self.gravity_slider,
             0.0,
             100.0,
         )
-        _, self.friction_slider = imgui.slider_float(
+        friction_changed, self.friction_slider = imgui.slider_float(
             "friction (k)",
             self.friction_slider,
             0.0,
@@ -244,6 +452,60 @@ class ParameterInterface:
             "z integration correction", self.z_correction
         )
 
+        # derivatives evaluation for physics: symbolic lambdas,
+        # or interpolated from tables sampled on surface mesh
+        _, self.field_mode_combo = imgui.combo(
+            "field evaluation",
+            self.field_mode_combo,
+            self.field_mode_names,
+        )
+        # interpolation costs the same for every expression, but is
+        # slower than the lambdas of every expression benchmarked,
+        # see drafts/sampled_field_benchmark.py
+        if imgui.is_item_hovered():
+            imgui.set_tooltip(
+                "bilinear, bicubic: interpolated from tables sampled on the\n"
+                "surface, same cost for every expression, but slower than\n"
+                "symbolic on the example functions"
+            )
+
+        # ball-ball collisions
+        _, self.collisions = imgui.checkbox("ball collisions", self.collisions)
+        _, self.restitution_slider = imgui.slider_float(
+            "restitution",
+            self.restitution_slider,
+            0.0,
+            1.0,
+        )
+
+        # integration scheme of physics engine
+        integrator_changed, self.integrator_combo = imgui.combo(
+            "integrator",
+            self.integrator_combo,
+            self.integrator_names,
+        )
+
+        if gravity_changed:
+            self._on_change_physics("gravity", self.gravity_slider)
+        if friction_changed:
+            self._on_change_physics("friction", self.friction_slider)
+        if integrator_changed:
+            self._on_change_physics("integrator", self.integrator)
+
+        # fixed time step of physics, independent of frame rate
+        _, self.physics_rate_slider = imgui.slider_int(
+            "physics rate (Hz)",
+            self.physics_rate_slider,
+            30,
+            480,
+        )
+        _, self.max_substeps_slider = imgui.slider_int(
+            "max steps/frame",
+            self.max_substeps_slider,
+            1,
+            32,
+        )
+
     @ui_section("Render Parameters")
     def _render_parameters(self):
         """
@@ -326,6 +588,8 @@ class ParameterInterface:
         # draw individual sections
         self._status()
         self._expression()
+        self._replay()
+        self._snapshots()
         self._physics_parameters()
         self._render_parameters()
         self._functions()
@@ -157,6 +157,11 @@ class ShaderRenderer:
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         glEnable(GL_BLEND)
 
+        # identity instance (no translation, unit scale) for
+        # elements drawn without an instance buffer
+        # see joule/graphics/shaders/vertex.glsl
+        glVertexAttrib4f(3, 0.0, 0.0, 0.0, 1.0)
+
     def frame_setup(self, background_color):
         """
         Setup rendering pipeline on each frame
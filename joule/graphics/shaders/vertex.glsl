@@ -5,6 +5,11 @@ layout(location = 0) in vec3 position;
 layout(location = 1) in vec3 color;
 layout(location = 2) in vec3 normal;
 
+// per instance data: translation xyz, scale w
+// when not bound (ie: surface, axes), defaults to
+// (0, 0, 0, 1) which leaves vertices unchanged
+layout(location = 3) in vec4 instance;
+
 // transformation matrix constants
 uniform mat4 world_transform;
 uniform mat4 cam_projection;
@@ -16,11 +21,15 @@ out vec3 vertex_normal;
 out vec3 vertex_frag_pos;
 
 void main() {
+    // scale and translate vertex by instance,
+    // ie: the unit sphere into every ball
+    vec3 world_position = position * instance.w + instance.xyz;
+
     // modelview matrix taking into account
     // the camera's panning and rotations
     mat4 t = world_transform * cam_transform;
     // 3D points are transformed, then projected onto a 2D screen
-    gl_Position = vec4(position, 1.0) * t * cam_projection;
+    gl_Position = vec4(world_position, 1.0) * t * cam_projection;
 
     // pass these parameters down to the fragment shader
     // the color of each point
@@ -29,5 +38,5 @@ void main() {
     // transform the normal and position with respect to the
     // rendering coordinate system
     vertex_normal = vec3(vec4(normal, 1.0) * world_transform);
-    vertex_frag_pos = vec3(vec4(position, 1.0) * world_transform);
+    vertex_frag_pos = vec3(vec4(world_position, 1.0) * world_transform);
 }
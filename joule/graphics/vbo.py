@@ -1,3 +1,4 @@
+import numpy as np
 from OpenGL.GL import *
 
 
@@ -8,17 +9,23 @@ def create_vao(
     n_ptr=3,
     return_vbo=False,
     store_normals=False,
+    indices=None,
 ):
     """
     Create OpenGL Vertex Array Object (VAO), bind a
     Vertex Buffer Object (VBO) and copy data into it
 
+    Optionally bind an Element Buffer Object (EBO) of vertex
+    indices, so that vertices shared by several primitives
+    are only stored once; draw with draw_vao(..., indexed=True)
+
     :param data: Array of float32 to copy into VBO
     :param v_ptr: Vertex pointer size of 4 bytes (float32)
     :param c_ptr: Color pointer size of 4 bytes (float32)
     :param n_ptr: Normal pointer size of 4 bytes (float32)
     :param return_vbo: Return internal VBO object pointer
     :param store_normals: Use normal pointer
+    :param indices: Array of vertex indices to copy into EBO, None for no EBO
     :return: VAO or (VAO, VBO)
     """
 
@@ -72,7 +79,18 @@ def create_vao(
         #   layout(location = 2) in vec3 normal;
         glEnableVertexAttribArray(2)
 
+    if indices is not None:
+        # element buffer object binded to VAO, indices
+        # never change so they are copied once
+        ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
+
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
     # unbind VAO and VBO
+    # (the EBO binding is part of the VAO's state, so it
+    # must stay bound until the VAO is unbound)
     # to not have issues later on...
     # (found this one out the hard way!)
     glBindVertexArray(0)
@@ -85,44 +103,133 @@ def create_vao(
     return vao
 
 
+def create_instance_vbo(vao, location=3, i_ptr=4):
+    """
+    Create a per instance Vertex Buffer Object (VBO) bound to an
+    existing VAO: its attribute advances once per drawn instance,
+    instead of once per vertex
+
+    :param vao: OpenGL VAO
+    :param location: Attribute location in vertex shader
+    :param i_ptr: Instance pointer size of 4 bytes (float32)
+    :return: Instance VBO
+    """
+
+    glBindVertexArray(vao)
+
+    # instance buffer object binded to VAO, empty
+    # until the first update_instance_vbo
+    vbo = glGenBuffers(1)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+
+    # set instance pointer position
+    stride = i_ptr * np.dtype(np.float32).itemsize
+    glVertexAttribPointer(
+        location, i_ptr, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0)
+    )
+    # enable at pointer of index location
+    # see joule/graphics/shaders/vertex.glsl
+    # matches with:
+    #   layout(location = 3) in vec4 instance;
+    glEnableVertexAttribArray(location)
+
+    # advance once per instance
+    glVertexAttribDivisor(location, 1)
+
+    # unbind VAO and VBO
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    return vbo
+
+
+def update_instance_vbo(vbo, data):
+    """
+    Replace data of a per instance Vertex Buffer Object (VBO),
+    whose number of instances may change every frame
+
+    :param vbo: Instance VBO
+    :param data: Array of float32 to copy into VBO
+    """
+
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+
+    # reallocate storage, so that the driver does not
+    # wait for the previous frame's draw to finish
+    glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STREAM_DRAW)
+
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
 def update_vbo(
     vbo,
     data,
+    resize=False,
 ):
     """
     Update OpenGL Vertex Buffer Object (VBO) with new data
 
     :param data: Array of float32 to copy into VBO
+    :param resize: Reallocate VBO, when the number of vertices changes
     """
 
     # bind VBO
     glBindBuffer(GL_ARRAY_BUFFER, vbo)
 
     # change VBO data
-    glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+    if resize:
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+    else:
+        glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
 
     # unbind VBO
     glBindBuffer(GL_ARRAY_BUFFER, 0)
 
 
+def update_ebo(vao, indices):
+    """
+    Replace indices of the Element Buffer Object (EBO) of a VAO
+
+    :param vao: OpenGL VAO created with indices, see create_vao
+    :param indices: Array of vertex indices to copy into EBO
+    """
+
+    # the EBO binding is part of the VAO's state
+    glBindVertexArray(vao)
+
+    indices = np.ascontiguousarray(indices, dtype=np.uint32)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+    glBindVertexArray(0)
+
+
 def draw_vao(
     vao,
     draw_type,
     n,
+    indexed=False,
+    instances=None,
 ):
     """
     Draw OpenGL Vertex Array Object (VAO)
 
     :param vao: OpenGL VAO
     :param draw_type: OpenGL draw mode (ie: GL_TRIANGLES, GL_LINES, etc.)
-    :param n: Number of objects to draw
+    :param n: Number of objects to draw, or of indices if indexed
+    :param indexed: Draw through the VAO's EBO, see create_vao
+    :param instances: Number of instances to draw, see create_instance_vbo
     """
 
     # bind VAO
     glBindVertexArray(vao)
 
     # draw VBO of VAO
-    glDrawArrays(draw_type, 0, n)
+    if indexed:
+        glDrawElements(draw_type, n, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+    elif instances is not None:
+        glDrawArraysInstanced(draw_type, 0, n, instances)
+    else:
+        glDrawArrays(draw_type, 0, n)
 
     # unbind VAO
     glBindVertexArray(0)
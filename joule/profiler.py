@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+
+# shared do-nothing context of disabled profilers
+_NULL_SCOPE = nullcontext()
+
+
+class _Scope:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self._profiler._record(self._name, self._start, time.perf_counter_ns())
+
+
+class FrameProfiler:
+    def __init__(self, capacity=240, max_events=16384):
+        """
+        Frame Profiler: Named scoped timers of the phases of every
+        frame, kept in a ring buffer of the last frames
+
+        Disabled by default, then scopes are a shared null context,
+        so that instrumentation can stay in place at almost no cost
+
+        :param capacity: Number of frames kept
+        :param max_events: Number of scopes kept for trace export
+
+        :return: FrameProfiler instance
+        """
+
+        self._capacity = capacity
+        self.enabled = False
+
+        # phase name -> column of ring buffer
+        self._phases = {}
+
+        # time spent per frame and phase (ns), and frame time (ns)
+        self._phase_times = np.zeros((capacity, 0), dtype=np.int64)
+        self._frame_times = np.zeros(capacity, dtype=np.int64)
+
+        # next row of ring buffer, and number of rows filled
+        self._frame = 0
+        self._n_frames = 0
+        self._frame_start = None
+
+        # individual scopes (name, thread, start, end) for trace export
+        self._events = deque(maxlen=max_events)
+
+        # scopes are only recorded from the thread owning frames
+        self._thread = threading.get_ident()
+
+    def scope(self, name):
+        """
+        Times a phase of frame, as a context manager
+
+        :param name: Phase name
+        :return: Context manager
+        """
+
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return _Scope(self, name)
+
+    def _record(self, name, start, end):
+        """
+        Record a finished scope
+
+        :param name: Phase name
+        :param start: Start time (ns)
+        :param end: End time (ns)
+        """
+
+        # background threads (ie: function compilation)
+        # do not belong to any frame
+        if threading.get_ident() != self._thread:
+            return
+
+        if (column := self._phases.get(name)) is None:
+            column = self._phases[name] = len(self._phases)
+            self._phase_times = np.pad(self._phase_times, ((0, 0), (0, 1)))
+
+        # phases may be entered several times per frame
+        # (ie: per physics substep)
+        self._phase_times[self._frame, column] += end - start
+        self._events.append((name, start, end))
+
+    def begin_frame(self):
+        """
+        Marks start of frame
+        """
+
+        if not self.enabled:
+            self._frame_start = None
+            return
+
+        self._thread = threading.get_ident()
+        self._frame_start = time.perf_counter_ns()
+        self._phase_times[self._frame] = 0
+
+    def end_frame(self):
+        """
+        Marks end of frame, advancing ring buffer
+        """
+
+        if not self.enabled or self._frame_start is None:
+            return
+
+        end = time.perf_counter_ns()
+        self._frame_times[self._frame] = end - self._frame_start
+        self._events.append(("frame", self._frame_start, end))
+
+        self._frame = (self._frame + 1) % self._capacity
+        self._n_frames = min(self._n_frames + 1, self._capacity)
+
+    def _ordered(self, rows):
+        """
+        Rows of ring buffer from oldest to newest frame
+
+        :param rows: Ring buffer array of shape (capacity, ...)
+        :return: Filled rows in order
+        """
+
+        if self._n_frames < self._capacity:
+            return rows[: self._n_frames]
+
+        return np.roll(rows, -self._frame, axis=0)
+
+    def get_breakdown(self):
+        """
+        Returns mean time per frame of every phase
+
+        :return: Dictionary of phase name -> time (ms)
+        """
+
+        if not self._n_frames:
+            return {}
+
+        means = self._ordered(self._phase_times).mean(axis=0) / 1e6
+        return {name: means[column] for name, column in self._phases.items()}
+
+    def get_frame_times(self):
+        """
+        Returns frame times, from oldest to newest
+
+        :return: Frame times (ms) of shape (n,)
+        """
+
+        return self._ordered(self._frame_times) / 1e6
+
+    def reset(self):
+        """
+        Discards all recorded frames and scopes
+        """
+
+        self._phase_times[:] = 0
+        self._frame = self._n_frames = 0
+        self._events.clear()
+
+    def export_chrome_trace(self, path):
+        """
+        Writes recorded scopes as a Chrome trace, to be opened
+        with chrome://tracing or https://ui.perfetto.dev
+
+        :param path: Output JSON file
+        """
+
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1e3,
+                "dur": (end - start) / 1e3,
+                "pid": 0,
+                "tid": 0,
+            }
+            for name, start, end in self._events
+        ]
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+# profiler shared by the application and the engines
+PROFILER = FrameProfiler()
@@ -0,0 +1,390 @@
+import argparse
+import time
+
+import numpy as np
+
+from joule.compute.calculus import CalculusEngine
+from joule.compute.mechanics import MechanicsEngine
+from joule.compute.recorder import TrajectoryRecorder
+from joule.compute.snapshot import load_simulation, save_simulation
+
+
+def seed_grid(x_domain, y_domain, n_x, n_y):
+    """
+    Build a uniform grid of ball starting points over a domain,
+    excluding the domain's boundary
+
+    :param x_domain: x domain (min, max)
+    :param y_domain: y domain (min, max)
+    :param n_x: Number of balls along x
+    :param n_y: Number of balls along y
+    :return: Points of shape (n_x * n_y, 2)
+    """
+
+    # cell centered samples, so that no ball lies on the boundary
+    x = np.min(x_domain) + (np.arange(n_x) + 0.5) * np.ptp(x_domain) / n_x
+    y = np.min(y_domain) + (np.arange(n_y) + 0.5) * np.ptp(y_domain) / n_y
+
+    return np.stack(np.meshgrid(x, y), axis=-1).reshape((-1, 2))
+
+
+def simulate(
+    expression,
+    x_domain,
+    y_domain,
+    points,
+    masses,
+    dt,
+    steps,
+    gravity=25.0,
+    friction=0.2,
+    z_correction=True,
+    every=1,
+    backend="numpy",
+    recorder: TrajectoryRecorder = None,
+    checkpoint=None,
+    checkpoint_every=1000,
+    resume=None,
+):
+    """
+    Run the simulation without any rendering
+
+    :param expression: Textual expression of function f(x, y)
+    :param x_domain: x domain (min, max)
+    :param y_domain: y domain (min, max)
+    :param points: Ball starting points of shape (n, 2)
+    :param masses: Ball masses of shape (n,)
+    :param dt: Integration time step (s)
+    :param steps: Number of integration steps
+    :param gravity: Gravity of shape (n,) or scalar (m/s^2)
+    :param friction: Friction of shape (n,) or scalar (kinetic)
+    :param z_correction: Correct for vertical deviation over time
+    :param every: Record state every n steps
+    :param backend: Lambda backend of calculus engine: numpy, numba
+    :param recorder: Instance of joule.compute.recorder.TrajectoryRecorder,
+        to stream frames to disk instead of returning them
+    :param checkpoint: Snapshot file saved every checkpoint_every steps and at the end
+    :param checkpoint_every: Steps between checkpoints, 0 to only save at the end
+    :param resume: Snapshot file to resume from, instead of points and masses
+    :return: Dictionary of recorded arrays
+    """
+
+    # every ball is added with its own gravity and friction
+    calculus_engine = CalculusEngine(backend=backend)
+    mechanics_engine = MechanicsEngine(
+        initial_gravity=0.0,
+        initial_friction=0.0,
+    )
+
+    # same parser messages as in the user interface
+    parser_message = calculus_engine.update_function(expression)
+    if parser_message != "Parsed sucessfully":
+        raise ValueError(parser_message)
+
+    # resume an interrupted run, up to the same number of steps
+    first_step = 0
+    if resume is not None:
+        metadata = load_simulation(resume, mechanics_engine)
+
+        # snapshots saved from the app are not checkpoints of a run
+        if not {"step", "dt", "expression", "x_domain", "y_domain"} <= metadata.keys():
+            raise ValueError(f"Snapshot is not a checkpoint of joule.sim: {resume}")
+        first_step = metadata["step"]
+
+        # equivalent texts (ie: "sin(x + y)" and "sin(x+y)") are the same function
+        canonical = calculus_engine.canonical_form
+        if canonical(metadata["expression"]) != canonical(expression):
+            raise ValueError(f"Snapshot was simulated on: {metadata['expression']}")
+
+        # the time of recorded frames follows from the steps
+        # of the checkpoint and dt
+        if not np.isclose(metadata["dt"], dt, rtol=1e-12, atol=0):
+            raise ValueError(f"Snapshot was simulated with dt = {metadata['dt']}")
+
+        snapshot_domain = metadata["x_domain"], metadata["y_domain"]
+        if not np.allclose(snapshot_domain, (x_domain, y_domain)):
+            raise ValueError(
+                f"Snapshot was simulated on domain x = {metadata['x_domain']}, "
+                f"y = {metadata['y_domain']}"
+            )
+
+        if first_step > steps:
+            raise ValueError(
+                f"Snapshot is at step {first_step}, past the {steps} steps to simulate"
+            )
+    else:
+        add_balls(
+            calculus_engine,
+            mechanics_engine,
+            x_domain,
+            y_domain,
+            points,
+            masses,
+            gravity,
+            friction,
+        )
+
+    def save(step):
+        save_simulation(
+            checkpoint,
+            mechanics_engine,
+            expression=expression,
+            x_domain=list(x_domain),
+            y_domain=list(y_domain),
+            dt=dt,
+            step=step,
+        )
+
+    n_frames = (steps - first_step) // every + 1
+    results = {
+        "time": (first_step + np.arange(n_frames) * every) * dt,
+        "masses": np.copy(mechanics_engine.get_render_masses()),
+        "gravity": np.copy(mechanics_engine.get_render_gravity()),
+        "friction": np.copy(mechanics_engine.get_render_friction()),
+    }
+
+    # long runs are streamed to disk by the recorder, which
+    # records every n steps on its own, otherwise preallocate
+    # recorded frames
+    if recorder is not None:
+        recorder.record(first_step, first_step * dt, mechanics_engine)
+    else:
+        n = mechanics_engine.get_render_n()
+        positions = np.empty((n_frames, n, 3))
+        velocities = np.empty((n_frames, n, 3))
+
+        positions[0] = mechanics_engine.get_render_positions()
+        velocities[0] = mechanics_engine.get_render_velocities()
+
+    for step in range(first_step + 1, steps + 1):
+        mechanics_engine.update(dt, calculus_engine, z_correction=z_correction)
+
+        if recorder is not None:
+            recorder.record(step, step * dt, mechanics_engine)
+        elif (step - first_step) % every == 0:
+            frame = (step - first_step) // every
+            positions[frame] = mechanics_engine.get_render_positions()
+            velocities[frame] = mechanics_engine.get_render_velocities()
+
+        if checkpoint is not None and checkpoint_every and step % checkpoint_every == 0:
+            save(step)
+
+    if checkpoint is not None:
+        save(steps)
+
+    if recorder is not None:
+        return results
+
+    return {**results, "positions": positions, "velocities": velocities}
+
+
+def add_balls(
+    calculus_engine: CalculusEngine,
+    mechanics_engine: MechanicsEngine,
+    x_domain,
+    y_domain,
+    points,
+    masses,
+    gravity,
+    friction,
+):
+    """
+    Adds balls at starting points within the domain, on the surface
+
+    :param calculus_engine: Instance of joule.calculus.CalculusEngine
+    :param mechanics_engine: Instance of joule.compute.mechanics.MechanicsEngine
+    :param x_domain: x domain (min, max)
+    :param y_domain: y domain (min, max)
+    :param points: Ball starting points of shape (n, 2)
+    :param masses: Ball masses of shape (n,)
+    :param gravity: Gravity of shape (n,) or scalar (m/s^2)
+    :param friction: Friction of shape (n,) or scalar (kinetic)
+    """
+
+    # only keep balls within domain, like clicks in the app
+    x_min, x_max = np.min(x_domain), np.max(x_domain)
+    y_min, y_max = np.min(y_domain), np.max(y_domain)
+
+    x, y = points.T
+    inside = (x_min < x) & (x < x_max) & (y_min < y) & (y < y_max)
+    points, masses = points[inside], masses[inside]
+
+    # per ball parameters, ie: a sweep over friction values
+    # is stepped in a single batch
+    gravity = np.broadcast_to(gravity, len(inside))[inside]
+    friction = np.broadcast_to(friction, len(inside))[inside]
+
+    # evaluate function at starting points
+    z = calculus_engine.build_values(points)
+    mechanics_engine.add_balls(
+        np.column_stack((points, z)), masses, gravity=gravity, friction=friction
+    )
+
+
+def parse_args(argv=None):
+    """
+    Parse command line arguments of headless runner
+
+    :param argv: Arguments, defaults to sys.argv
+    :return: argparse.Namespace
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m joule.sim",
+        description="Joule headless simulation runner",
+    )
+
+    parser.add_argument("expression", help="function f(x, y), ie: 'sin(x + y)'")
+    parser.add_argument(
+        "--x-domain", nargs=2, type=float, default=[-np.pi, np.pi], metavar=("MIN", "MAX")
+    )
+    parser.add_argument(
+        "--y-domain", nargs=2, type=float, default=[-np.pi, np.pi], metavar=("MIN", "MAX")
+    )
+
+    # ball initial conditions
+    balls = parser.add_mutually_exclusive_group(required=True)
+    balls.add_argument(
+        "--ball",
+        nargs=2,
+        type=float,
+        action="append",
+        metavar=("X", "Y"),
+        help="starting point of a ball, can be repeated",
+    )
+    balls.add_argument(
+        "--grid",
+        nargs=2,
+        type=int,
+        metavar=("NX", "NY"),
+        help="uniform grid of balls over the domain",
+    )
+    balls.add_argument(
+        "--balls-file",
+        help="text file of rows: x y [mass]",
+    )
+    balls.add_argument(
+        "--resume",
+        metavar="SNAPSHOT",
+        help="resume from a checkpoint, with the same --dt and domains, "
+        "up to the same --steps",
+    )
+    parser.add_argument("--mass", type=float, default=10.0, help="ball mass (kg)")
+
+    # physics parameters
+    parser.add_argument("--gravity", type=float, default=25.0, help="(m/s^2)")
+    parser.add_argument("--friction", type=float, default=0.2, help="(kinetic)")
+    parser.add_argument("--no-z-correction", action="store_true")
+
+    # integration
+    parser.add_argument("--dt", type=float, default=1 / 60, help="time step (s)")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--every", type=int, default=1, help="record every n steps")
+    parser.add_argument(
+        "--backend",
+        choices=CalculusEngine.BACKENDS,
+        default="numpy",
+        help="function evaluation backend",
+    )
+
+    parser.add_argument(
+        "-o", "--output", default="trajectories.npz", help="output .npz file"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="SNAPSHOT",
+        help="save snapshots of the simulation, to --resume after interruption",
+    )
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=1000, help="steps between snapshots"
+    )
+    parser.add_argument(
+        "--record",
+        metavar="DIR",
+        help="stream frames to a recording directory instead of the .npz file",
+    )
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Headless entrypoint called by python -m joule.sim
+
+    :param argv: Arguments, defaults to sys.argv
+    """
+
+    args = parse_args(argv)
+
+    # build ball initial conditions
+    if args.grid:
+        points = seed_grid(args.x_domain, args.y_domain, *args.grid)
+        masses = np.full(len(points), args.mass)
+    elif args.balls_file:
+        table = np.atleast_2d(np.loadtxt(args.balls_file))
+        points = table[:, :2]
+        masses = table[:, 2] if table.shape[1] > 2 else np.full(len(table), args.mass)
+    elif args.ball:
+        points = np.array(args.ball)
+        masses = np.full(len(points), args.mass)
+    else:
+        # balls of the snapshot
+        points, masses = np.empty((0, 2)), np.empty(0)
+
+    recorder = None
+    if args.record:
+        metadata = {
+            "expression": args.expression,
+            "x_domain": args.x_domain,
+            "y_domain": args.y_domain,
+            "dt": args.dt,
+        }
+        recorder = TrajectoryRecorder(args.record, every=args.every, metadata=metadata)
+
+    start = time.perf_counter()
+
+    # frames recorded so far are written out, and the recording
+    # completed, even if the simulation fails
+    try:
+        results = simulate(
+            args.expression,
+            args.x_domain,
+            args.y_domain,
+            points,
+            masses,
+            args.dt,
+            args.steps,
+            gravity=args.gravity,
+            friction=args.friction,
+            z_correction=not args.no_z_correction,
+            every=args.every,
+            backend=args.backend,
+            recorder=recorder,
+            checkpoint=args.checkpoint,
+            checkpoint_every=args.checkpoint_every,
+            resume=args.resume,
+        )
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    elapsed = time.perf_counter() - start
+    n_balls = len(results["masses"])
+
+    print(f"sim: {n_balls} balls, {args.steps} steps in {elapsed:.3f}s")
+
+    if recorder is not None:
+        return
+
+    np.savez(
+        args.output,
+        expression=args.expression,
+        x_domain=args.x_domain,
+        y_domain=args.y_domain,
+        dt=args.dt,
+        **results,
+    )
+
+
+if __name__ == "__main__":
+    main()